@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ARCHIVE_ROOT = 'raw_archive'
+
+def loads(raw):
+    """ orjson이 설치되어 있으면 orjson으로, 없으면 표준 json으로 bytes를 디코딩한다 """
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def decompress(data, codec):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError("zstd로 저장된 payload를 읽으려면 zstandard 패키지가 필요합니다.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def read_object(path, codec):
+    """ 저장된 payload 파일 하나를 풀어 원본 bytes로. 프로세스 풀 worker에서도 부를 수 있다 """
+    with open(path, 'rb') as f:
+        return decompress(f.read(), codec)
+
+class PayloadArchive:
+    """
+    Riot API 원본 응답(match/timeline)을 압축해 내용 해시(sha256)로 저장하는 로컬 아카이브.
+    objects/ab/abcdef....json.zst|.json.gz 에 본문을, index.db 에 (kind, match_id) -> 해시를 둔다.
+    zstandard가 설치되어 있으면 zstd, 없으면 gzip으로 압축한다.
+    """
+    def __init__(self, root=ARCHIVE_ROOT, level=None):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        os.makedirs(self.objects, exist_ok=True)
+        self.codec = 'zst' if zstandard is not None else 'gz'
+        self.level = level if level is not None else (10 if self.codec == 'zst' else 6)
+        self.lock = threading.Lock()
+        # 수집기 fetch 스레드들에서 put을 부르므로 연결 하나를 lock으로 보호해 공유한다
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS payloads (
+                kind TEXT,
+                match_id TEXT,
+                digest TEXT,
+                codec TEXT,
+                raw_size INTEGER,
+                stored_size INTEGER,
+                stored_at INTEGER,
+                PRIMARY KEY (kind, match_id)
+            )
+        ''')
+        self.conn.commit()
+
+    def _path(self, digest, codec):
+        return os.path.join(self.objects, digest[:2], f"{digest}.json.{codec}")
+
+    def _compress(self, raw):
+        if self.codec == 'zst':
+            return zstandard.ZstdCompressor(level=self.level).compress(raw)
+        return gzip.compress(raw, compresslevel=self.level)
+
+    def put(self, kind, match_id, raw):
+        """ raw: 응답 본문 bytes. 같은 내용은 한 번만 저장된다. """
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._path(digest, self.codec)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = self._compress(raw)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        stored_size = os.path.getsize(path)
+
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO payloads (kind, match_id, digest, codec, raw_size, stored_size, stored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, match_id) DO UPDATE SET
+                    digest = excluded.digest, codec = excluded.codec, raw_size = excluded.raw_size,
+                    stored_size = excluded.stored_size, stored_at = excluded.stored_at
+            ''', (kind, match_id, digest, self.codec, len(raw), stored_size, int(time.time())))
+            self.conn.commit()
+        return digest
+
+    def get_raw(self, kind, match_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT digest, codec FROM payloads WHERE kind = ? AND match_id = ?", (kind, match_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return read_object(self._path(*row), row[1])
+
+    def get(self, kind, match_id):
+        raw = self.get_raw(kind, match_id)
+        return loads(raw) if raw is not None else None
+
+    def match_ids(self, kind):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT match_id FROM payloads WHERE kind = ? ORDER BY match_id", (kind,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def object_paths(self, kind):
+        """ match_id 순서의 (파일 경로, codec). 풀고 디코딩하는 일을 다른 프로세스에 넘길 때 쓴다 """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT digest, codec FROM payloads WHERE kind = ? ORDER BY match_id", (kind,)
+            ).fetchall()
+        return [(self._path(digest, codec), codec) for digest, codec in rows]
+
+    def iter_payloads(self, kind, decode=loads):
+        """
+        저장된 payload를 match_id 순서로 하나씩 풀어서 돌려준다 (전체를 메모리에 올리지 않는다).
+        decode에 schemas.decode_match 등을 주면 dict 대신 필요한 필드만 담은 객체로 디코딩한다
+        """
+        for path, codec in self.object_paths(kind):
+            yield decode(read_object(path, codec))
+
+    def stats(self):
+        with self.lock:
+            return self.conn.execute('''
+                SELECT kind, COUNT(*), SUM(raw_size), SUM(stored_size) FROM payloads GROUP BY kind
+            ''').fetchall()
+
+    def close(self):
+        self.conn.close()
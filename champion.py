@@ -1,66 +1,201 @@
-import sqlite3
+import numpy as np
 import pandas as pd
 
+import columnar
+from chunks import DEFAULT_CHUNKSIZE, read_chunks
+from db import connect
+from migrations import PICK_BAN_STATS_SQL
+from resultcache import cached
+
+BAN_SLOTS = [f'ban{i}' for i in range(1, 11)]
+
+# 카운터 테이블은 제자리에서 갱신되어 MAX(rowid)가 바뀌지 않으므로, 트리거의 원본 테이블로 fingerprint를 잡는다
+PICK_BAN_TABLES = ['match_participants', 'match_bans', 'match_summary']
+
+def add_bincount(counts, values, weights=None):
+    """ 지금까지의 counts에 values의 np.bincount를 더한다 (길이는 큰 쪽으로 늘어난다) """
+    chunk_counts = np.bincount(values, weights=weights, minlength=len(counts)).astype(np.int64)
+    chunk_counts[:len(counts)] += counts
+    return chunk_counts
+
 class ChampionAnalyzer:
-    def __init__(self, db_path):
+    def __init__(self, db_path, parquet_root=None, result_cache=None):
+        """
+        parquet_root를 주면 원본 테이블을 columnar.export로 내보낸 Parquet에서 필요한 컬럼만 읽는다.
+        result_cache(resultcache.ResultCache)를 주면 읽는 테이블이 그대로인 동안 집계 결과를 디스크에서 다시 읽는다.
+        """
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.conn = connect(db_path, readonly=True)
+        self.parquet_root = parquet_root
+        self.result_cache = result_cache
+
+    def read_columns(self, table, columns):
+        if self.parquet_root is not None:
+            return columnar.read_table(table, columns, root=self.parquet_root)
+        return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {table}", self.conn)
+
+    def read_chunks(self, table, columns, chunksize):
+        if self.parquet_root is not None:
+            return columnar.iter_batches(table, columns, chunksize, root=self.parquet_root)
+        return read_chunks(self.conn, f"SELECT {', '.join(columns)} FROM {table}", chunksize=chunksize)
+
+    def ban_arrays(self, chunksize):
+        """ match_bans의 ban1~ban10을 (행 수, 10) float 배열 chunk로 (NULL -> nan) """
+        if self.parquet_root is not None:
+            for chunk in self.read_chunks('match_bans', BAN_SLOTS, chunksize):
+                yield chunk.to_numpy(dtype=np.float64)
+            return
+        # SQLite에서는 DataFrame을 거치지 않고 fetchmany 튜플을 바로 배열로 만드는 편이 빠르다
+        cursor = self.conn.execute(f"SELECT {', '.join(BAN_SLOTS)} FROM match_bans")
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield np.array(rows, dtype=np.float64)
 
     def load_match_participants(self):
-        query = """
-        SELECT match_id, champion_id, champion_name, win
-        FROM match_participants
-        """
-        df = pd.read_sql_query(query, self.conn)
-        return df
+        return self.read_columns('match_participants', ['match_id', 'champion_id', 'champion_name', 'win'])
 
     def load_match_bans(self):
-        query = """
-        SELECT match_id, ban1, ban2, ban3, ban4, ban5
-        FROM match_bans
+        return self.read_columns('match_bans', ['match_id', *BAN_SLOTS])
+
+    def pick_stats(self, chunksize=DEFAULT_CHUNKSIZE):
+        """ match_participants를 chunksize행씩 한 번 훑어 챔피언별 픽/승리 수를 np.bincount로 센다 """
+        return cached(self.result_cache, self.conn, 'champion.pick_stats', {}, ['match_participants'],
+                      lambda: self.count_picks(chunksize), self.parquet_root)
+
+    def count_picks(self, chunksize):
+        picks = np.zeros(0, dtype=np.int64)
+        wins = np.zeros(0, dtype=np.int64)
+        names = {}
+        for chunk in self.read_chunks('match_participants', ['champion_id', 'champion_name', 'win'], chunksize):
+            chunk = chunk.dropna(subset=['champion_id'])
+            champion_ids = chunk['champion_id'].to_numpy(dtype=np.int64)
+            picks = add_bincount(picks, champion_ids)
+            wins = add_bincount(wins, champion_ids, chunk['win'].fillna(0).to_numpy(dtype=np.int64))
+            for champion_id, name in chunk.groupby('champion_id')['champion_name'].max().items():
+                names[champion_id] = max(names.get(champion_id, name), name)
+
+        champion_ids = np.flatnonzero(picks)
+        if len(wins) < len(picks):
+            wins = np.pad(wins, (0, len(picks) - len(wins)))
+        return pd.DataFrame({
+            'champion_id': champion_ids,
+            'champion_name': [names[champion_id] for champion_id in champion_ids],
+            'Pick Count': picks[champion_ids],
+            'Win Count': wins[champion_ids],
+            'Pick Rate (%)': 100.0 * picks[champion_ids] / picks.sum(),
+            'Win Rate (%)': 100.0 * wins[champion_ids] / picks[champion_ids],
+        })
+
+    def ban_stats(self, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        match_bans를 chunksize행씩 한 번 훑어 양 팀 ban1~ban10을 np.bincount로 센다 (-1/0/NULL은 밴 없음).
+        메모리는 chunksize와 최대 champion_id에만 비례한다. Ban Rate (%) = 밴 수 / 팀 수(match x 2).
+        """
+        return cached(self.result_cache, self.conn, 'champion.ban_stats', {}, ['match_bans'],
+                      lambda: self.count_bans(chunksize), self.parquet_root)
+
+    def count_bans(self, chunksize):
+        counts = np.zeros(0, dtype=np.int64)
+        matches = 0
+        for bans in self.ban_arrays(chunksize):
+            matches += len(bans)
+            counts = add_bincount(counts, bans[bans > 0].astype(np.int64))
+
+        champion_ids = np.flatnonzero(counts)
+        return pd.DataFrame({
+            'champion_id': champion_ids,
+            'Ban Count': counts[champion_ids],
+            'Ban Rate (%)': 100.0 * counts[champion_ids] / (2 * matches),
+        })
+
+    def recount_pick_ban_stats(self, chunksize=DEFAULT_CHUNKSIZE):
+        """ 원본 테이블을 chunk 단위로 다시 세어 pick_ban_stats()와 같은 표를 만든다 (카운터 검증용) """
+        result = self.pick_stats(chunksize).merge(self.ban_stats(chunksize), on='champion_id', how='left')
+        result['Ban Count'] = result['Ban Count'].fillna(0).astype(np.int64)
+        result['Ban Rate (%)'] = result['Ban Rate (%)'].fillna(0.0)
+        return result
+
+    def pick_ban_stats(self, game_version=None, position=None):
         """
-        df = pd.read_sql_query(query, self.conn)
-        return df
-
-    def analyze_champion_pick_and_ban(self):
-        participants = self.load_match_participants()
-        bans = self.load_match_bans()
-
-        total_players = participants.shape[0]
-        pick_counts = participants.groupby(['champion_id', 'champion_name']).size()
-        win_counts = participants[participants['win'] == 1].groupby(['champion_id', 'champion_name']).size()
-
-        pick_rate = (pick_counts / total_players) * 100
-        win_rate = (win_counts / pick_counts) * 100
-
-        ban_data = pd.melt(bans, id_vars=['match_id'], value_vars=['ban1', 'ban2', 'ban3', 'ban4', 'ban5'],
-                           var_name='ban_slot', value_name='champion_id')
-
-        total_teams = bans['match_id'].nunique()
-        ban_counts = ban_data['champion_id'].value_counts()
-        ban_rate = (ban_counts / total_teams) * 100
-
-        result = pd.DataFrame({
-            'Pick Count': pick_counts,
-            'Win Count': win_counts,
-            'Pick Rate (%)': pick_rate,
-            'Win Rate (%)': win_rate
-        }).fillna(0)
-
-        result = result.reset_index().set_index('champion_id')
-        result['Ban Count'] = ban_counts
-        result['Ban Rate (%)'] = ban_rate
-        result = result.fillna(0)
-        result = result.reset_index()
-
-        table_name = "champion_pick_ban_stats"
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
-            result.to_sql(table_name, conn, index=False, if_exists='replace')
-
-        print(f"\n[INFO] 분석 결과가 '{table_name}' 테이블로 저장되었습니다.")
+        수집 시 트리거로 갱신되는 카운터(champion_pick_counts/champion_ban_counts)에서 챔피언별 픽/승/밴을 읽는다.
+        game_version/position을 주면 그 패치/포지션만 집계한다 (밴은 포지션 구분이 없다).
+        """
+        pick_filter, ban_filter, pick_params, ban_params = '', '', [], []
+        if game_version is not None:
+            pick_filter += " AND game_version = ?"
+            ban_filter += " AND game_version = ?"
+            pick_params.append(game_version)
+            ban_params.append(game_version)
+        if position is not None:
+            pick_filter += " AND individual_position = ?"
+            pick_params.append(position)
+
+        query = PICK_BAN_STATS_SQL.format(pick_filter=pick_filter, ban_filter=ban_filter)
+        return cached(self.result_cache, self.conn, 'champion.pick_ban_stats',
+                      {'game_version': game_version, 'position': position}, PICK_BAN_TABLES,
+                      lambda: pd.read_sql_query(query, self.conn, params=pick_params + ban_params + ban_params))
+
+    def analyze_champion_pick_and_ban(self, game_version=None, position=None):
+        result = self.pick_ban_stats(game_version, position)
+
+        print("\n[INFO] champion_pick_ban_stats (수집 시 갱신되는 카운터 기준)")
         print(result[['champion_id', 'champion_name', 'Pick Rate (%)', 'Win Rate (%)', 'Pick Count', 'Ban Rate (%)', 'Ban Count']])
 
+def benchmark(n_matches=1000000, chunksize=100000):
+    """ 합성 match_bans에서 pd.melt + value_counts 와 스트리밍 bincount의 시간/피크 메모리를 비교한다 """
+    import os
+    import sqlite3
+    import tempfile
+    import time
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        conn.execute(f"CREATE TABLE match_bans (match_id TEXT PRIMARY KEY, {', '.join(f'{c} INTEGER' for c in BAN_SLOTS)})")
+        for start in range(0, n_matches, chunksize):
+            bans = rng.integers(1, 170, (min(chunksize, n_matches - start), 10))
+            bans[rng.random(bans.shape) < 0.1] = -1
+            conn.executemany(f"INSERT INTO match_bans VALUES (?{', ?' * 10})",
+                             ((f"KR_{start + i}", *map(int, row)) for i, row in enumerate(bans)))
+        conn.commit()
+        conn.close()
+
+        analyzer = ChampionAnalyzer(path)
+
+        def melt():
+            bans = analyzer.load_match_bans()
+            melted = pd.melt(bans, id_vars=['match_id'], value_vars=BAN_SLOTS, value_name='champion_id')
+            return melted[melted['champion_id'] > 0]['champion_id'].value_counts().sort_index()
+
+        def measure(fn):
+            # 시간은 tracemalloc 없이, 피크 메모리는 한 번 더 돌려서 잰다
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            tracemalloc.start()
+            result = fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result, elapsed, peak
+
+        melted, melt_time, melt_peak = measure(melt)
+        result, stream_time, stream_peak = measure(lambda: analyzer.ban_stats(chunksize))
+        analyzer.conn.close()
+
+    same = melted.to_numpy().tolist() == result['Ban Count'].tolist()
+    print(f"[BENCH] match_bans {n_matches}행")
+    print(f"[BENCH] pd.melt: {melt_time:.2f}초, 피크 {melt_peak / 1024 / 1024:.0f} MB")
+    print(f"[BENCH] bincount 스트리밍: {stream_time:.2f}초, 피크 {stream_peak / 1024 / 1024:.0f} MB, 결과 일치 {same}")
+
 if __name__ == "__main__":
-    analyzer = ChampionAnalyzer('riot_challenger.db')
-    analyzer.analyze_champion_pick_and_ban()
+    import sys
+
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        analyzer = ChampionAnalyzer('riot_challenger.db')
+        analyzer.analyze_champion_pick_and_ban()
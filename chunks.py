@@ -0,0 +1,26 @@
+import pandas as pd
+
+# chunk 하나에 올리는 행 수. 분석기의 메모리 상한은 이 값(과 한 match의 행 수)에 비례한다
+DEFAULT_CHUNKSIZE = 100000
+
+def read_chunks(conn, sql, params=(), chunksize=DEFAULT_CHUNKSIZE):
+    """ 쿼리 결과를 chunksize행씩 DataFrame으로 (커서 fetchmany라 전체를 메모리에 올리지 않는다) """
+    return pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+
+def match_aligned(chunks, key='match_id'):
+    """
+    key 순서로 정렬된 chunk들을 key 경계에 맞춰 다시 자른다.
+    각 chunk의 마지막 key 행은 다음 chunk 앞으로 넘겨서, 한 match의 행이 두 chunk에 나뉘지 않는다.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        tail = (chunk[key] == chunk[key].iat[-1]).to_numpy()
+        carry = chunk[tail]
+        if not tail.all():
+            yield chunk[~tail]
+    if carry is not None and not carry.empty:
+        yield carry
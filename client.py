@@ -0,0 +1,100 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (연결, 읽기) 타임아웃(초)
+DEFAULT_TIMEOUT = (3.05, 10)
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+def create_session(api_key=None, pool_size=20, retries=3, timeout=DEFAULT_TIMEOUT):
+    """
+    호스트별 커넥션 풀(keep-alive)을 재사용하는 세션을 만든다.
+    어댑터는 서버에 닿지 않은 연결 실패만 재시도한다. 응답(5xx/429)이나 읽기 타임아웃 뒤의 재시도는
+    서버가 요청으로 센 것이므로 RateLimitedRequester가 RateLimiter.acquire를 거쳐 다시 보낸다.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        # 0이면 urllib3가 읽기 타임아웃을 MaxRetryError로 감싸 ConnectionError가 된다. False면 ReadTimeout 그대로 올라온다
+        read=False,
+        status=0,
+        allowed_methods=frozenset(['GET']),
+        backoff_factor=0.5,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(pool_connections=10, pool_maxsize=pool_size,
+                                 max_retries=retry, timeout=timeout)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    if api_key is not None:
+        session.headers.update({'X-Riot-Token': api_key})
+    return session
+
+def benchmark(total=100):
+    """ 로컬 TLS 스텁 서버에서 매번 새 연결(requests.get)과 세션 재사용의 요청당 지연을 비교한다 """
+    import os
+    import ssl
+    import subprocess
+    import tempfile
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = b'{}'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = os.path.join(tmp, 'cert.pem'), os.path.join(tmp, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                        '-keyout', key, '-out', cert], check=True, capture_output=True)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"https://127.0.0.1:{server.server_address[1]}/lol/match/v5/matches/KR_1"
+
+        started = time.perf_counter()
+        for _ in range(total):
+            requests.get(url, verify=cert)
+        bare = (time.perf_counter() - started) / total
+
+        session = create_session('')
+        started = time.perf_counter()
+        for _ in range(total):
+            session.get(url, verify=cert)
+        pooled = (time.perf_counter() - started) / total
+        server.shutdown()
+
+    print(f"[BENCH] requests.get (매번 TCP+TLS 핸드셰이크): {bare * 1000:.2f} ms/req")
+    print(f"[BENCH] 세션 재사용 (keep-alive): {pooled * 1000:.2f} ms/req")
+    print(f"[BENCH] 요청당 절감: {(bare - pooled) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,356 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+from chunks import DEFAULT_CHUNKSIZE, read_chunks
+from db import DB_NAME, connect
+from migrations import schema_version
+from resultcache import CHANGES_VERSION
+
+EXPORT_ROOT = 'parquet'
+
+EXPORT_TABLES = ['match_summary', 'match_participants', 'match_teams', 'match_bans', 'match_events']
+
+# match_changes(migrations v12)에 적히는 원본 테이블 이름. match_events는 v3부터 match_events_compact 위의 뷰다
+SOURCE_TABLES = {'match_events': 'match_events_compact'}
+
+# match_events는 v3부터 뷰라 선언 타입이 없는 컬럼(사전 값, 어시스트 문자열)은 문자열로 둔다
+ARROW_TYPES = {'INTEGER': 'int64', 'REAL': 'float64'}
+
+# patch만 디렉터리로 나눈다. patch/date로 나누면 sync마다 날짜 수만큼 작은 파일이 생겨 SQLite보다 읽기가 느렸다.
+# date는 파일 안의 일반 컬럼이라 filter로 거르면 row group 통계로 건너뛴다
+PARTITIONING = ['patch']
+
+# patch 파티션 하나에 COMPACT_ROWS보다 행이 적은 파일이 COMPACT_FILES개를 넘으면 export 끝에 하나로 합친다.
+# 증분 sync는 patch마다 작은 파일을 하나씩 더하므로, 매번 합치면 큰 파일을 sync마다 다시 쓰게 된다
+COMPACT_ROWS = 1000000
+COMPACT_FILES = 8
+
+WRITE_OPTIONS = {'compression': 'zstd', 'use_dictionary': True}
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("columnar export/read에는 pyarrow 패키지가 필요합니다.")
+
+def arrow_schema(conn, table):
+    """ SQLite 선언 타입으로 파일의 Arrow 스키마를 만든다 (patch는 디렉터리). 문자열은 dictionary 인코딩한다 """
+    fields = []
+    for _, name, declared, *_ in conn.execute(f"PRAGMA table_info({table})"):
+        arrow_type = ARROW_TYPES.get(declared.upper())
+        if arrow_type is None:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, getattr(pa, arrow_type)()))
+    return pa.schema(fields + [pa.field('date', pa.string())])
+
+def partition_columns(game_version, game_creation):
+    """ patch: '15.1.2.3' -> '15.1', date: gameCreation(ms)의 UTC 날짜. 모르면 'unknown' """
+    patch = game_version.str.split('.').str[:2].str.join('.').fillna('unknown')
+    date = pd.to_datetime(game_creation, unit='ms', utc=True).dt.strftime('%Y-%m-%d').fillna('unknown')
+    return patch, date
+
+class Manifest:
+    """
+    root/manifest.db: 테이블마다 내보낸 match와 그 행이 든 파일 (match 하나의 행은 테이블마다 파일 하나에 있다),
+    원본 테이블의 match_changes seq를 어디까지 반영했는지(watermarks), 무언가 쓴 sync 목록(syncs)
+    """
+    def __init__(self, root):
+        self.conn = sqlite3.connect(os.path.join(root, 'manifest.db'))
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS exported (
+                table_name TEXT,
+                match_id TEXT,
+                path TEXT,
+                PRIMARY KEY (table_name, match_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_exported_path ON exported (table_name, path);
+            CREATE TABLE IF NOT EXISTS watermarks (
+                table_name TEXT,
+                source TEXT,
+                seq INTEGER,
+                PRIMARY KEY (table_name, source)
+            );
+            CREATE TABLE IF NOT EXISTS syncs (
+                sync_id INTEGER PRIMARY KEY,
+                finished_at INTEGER
+            );
+            CREATE TEMP TABLE selected (match_id TEXT PRIMARY KEY);
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def is_legacy(root):
+        """ patch/date 파티션 시절의 manifest(match_id만 적던 exported)인지 """
+        path = os.path.join(root, 'manifest.db')
+        if not os.path.exists(path):
+            return False
+        conn = sqlite3.connect(path)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(exported)")}
+        conn.close()
+        return bool(columns) and 'table_name' not in columns
+
+    def exported_ids(self, table):
+        return {row[0] for row in self.conn.execute("SELECT match_id FROM exported WHERE table_name = ?", (table,))}
+
+    def watermark(self, table, source):
+        row = self.conn.execute("SELECT seq FROM watermarks WHERE table_name = ? AND source = ?",
+                                (table, source)).fetchone()
+        return row[0] if row else 0
+
+    def set_watermarks(self, table, seqs):
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO watermarks (table_name, source, seq) VALUES (?, ?, ?)
+                ON CONFLICT (table_name, source) DO UPDATE SET seq = excluded.seq
+            ''', [(table, source, seq) for source, seq in seqs.items()])
+
+    def _select(self, match_ids):
+        self.conn.execute("DELETE FROM selected")
+        self.conn.executemany("INSERT OR IGNORE INTO selected (match_id) VALUES (?)", [(m,) for m in match_ids])
+
+    def paths(self, table, match_ids):
+        """ match_ids의 행이 든 파일들 (root 기준 상대 경로) """
+        self._select(match_ids)
+        return [row[0] for row in self.conn.execute('''
+            SELECT DISTINCT e.path FROM exported e JOIN selected s ON s.match_id = e.match_id
+            WHERE e.table_name = ? AND e.path IS NOT NULL
+        ''', (table,))]
+
+    def forget(self, table, match_ids):
+        with self.conn:
+            self._select(match_ids)
+            self.conn.execute("DELETE FROM exported WHERE table_name = ? AND match_id IN (SELECT match_id FROM selected)",
+                              (table,))
+
+    def add(self, table, locations):
+        """ locations: (match_id, path). 행이 없는 match는 path가 None이다 """
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO exported (table_name, match_id, path) VALUES (?, ?, ?)",
+                                  [(table, match_id, path) for match_id, path in locations])
+
+    def move(self, table, old_paths, new_path):
+        with self.conn:
+            self.conn.executemany("UPDATE exported SET path = ? WHERE table_name = ? AND path = ?",
+                                  [(new_path, table, path) for path in old_paths])
+
+    def add_sync(self, sync_id):
+        with self.conn:
+            self.conn.execute("INSERT INTO syncs (sync_id, finished_at) VALUES (?, ?)", (sync_id, int(time.time())))
+
+    def close(self):
+        self.conn.close()
+
+def _write_file(table, path):
+    """ 숨김 임시 파일에 쓴 뒤 바꿔 넣는다 (dataset은 '.'으로 시작하는 파일을 읽지 않는다) """
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, tmp, **WRITE_OPTIONS)
+    os.replace(tmp, path)
+
+def drop_matches(root, table, manifest, match_ids):
+    """ match_ids의 예전 행을 그 행이 든 파일에서 지우고 manifest에서도 뺀다 (다시 쓰기 전에 부른다) """
+    value_set = pa.array(sorted(match_ids), pa.string())
+    for path in manifest.paths(table, match_ids):
+        full_path = os.path.join(root, path)
+        if not os.path.exists(full_path):
+            continue
+        data = pq.ParquetFile(full_path).read()
+        kept = data.filter(pc.invert(pc.is_in(data['match_id'].cast(pa.string()), value_set=value_set)))
+        if kept.num_rows:
+            _write_file(kept, full_path)
+        else:
+            os.remove(full_path)
+    manifest.forget(table, match_ids)
+
+def changed_matches(conn, manifest, table):
+    """
+    지난 sync 뒤 match_changes에 바뀐 것으로 적힌 match와 그때의 seq. match_summary가 바뀌면
+    patch가 달라질 수 있으므로 모든 테이블에서 다시 쓴다
+    """
+    sources = list(dict.fromkeys([SOURCE_TABLES.get(table, table), 'match_summary']))
+    seqs, changed = {}, set()
+    for source in sources:
+        seqs[source] = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM match_changes WHERE table_name = ?",
+                                    (source,)).fetchone()[0]
+        changed.update(row[0] for row in conn.execute(
+            "SELECT match_id FROM match_changes WHERE table_name = ? AND seq > ? AND seq <= ?",
+            (source, manifest.watermark(table, source), seqs[source])))
+    return changed, seqs
+
+def export_table(conn, manifest, root, table, batch_matches, sync_id):
+    """ table에서 아직 내보내지 않았거나 바뀐 match를 batch_matches개씩 새 파일로 쓴다. (쓰거나 지운 match 수, 행 수) """
+    schema = arrow_schema(conn, table)
+    changed, seqs = changed_matches(conn, manifest, table)
+    exported = manifest.exported_ids(table)
+    changed &= exported
+    # 바뀐 match(지워진 match 포함)는 예전 행을 먼저 지운다. match_summary에 남아 있으면 아래에서 다시 쓴다
+    if changed:
+        drop_matches(root, table, manifest, changed)
+    pending = [row[0] for row in conn.execute("SELECT match_id FROM match_summary ORDER BY match_id")
+               if row[0] not in exported or row[0] in changed]
+    del exported
+    rows = 0
+
+    for start in range(0, len(pending), batch_matches):
+        batch = pending[start:start + batch_matches]
+        # 원본 DB는 읽기 전용(query_only)으로 열려 temp 테이블도 못 만든다. batch는 JSON 배열 하나로 넘긴다
+        query = f'''
+            SELECT t.*, s.game_version AS _game_version, s.game_creation AS _game_creation
+            FROM json_each(?) b
+            JOIN {table} t ON t.match_id = b.value
+            JOIN match_summary s ON s.match_id = t.match_id
+        '''
+        # batch 하나는 patch마다 파일 하나로 쓴다
+        writers, located = {}, {}
+        for chunk in read_chunks(conn, query, params=(json.dumps(batch),)):
+            if chunk.empty:
+                continue
+            patch, chunk['date'] = partition_columns(chunk.pop('_game_version'), chunk.pop('_game_creation'))
+            for value, part in chunk.groupby(patch.to_numpy(), sort=False):
+                if value not in writers:
+                    path = os.path.join(table, f"patch={value}", f"part-{sync_id}-{start}.parquet")
+                    os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+                    writers[value] = (pq.ParquetWriter(os.path.join(root, path), schema, **WRITE_OPTIONS), path)
+                writer, path = writers[value]
+                writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                located.update(dict.fromkeys(part['match_id'].unique(), path))
+            rows += len(chunk)
+        for writer, _ in writers.values():
+            writer.close()
+
+        manifest.add(table, [(match_id, located.get(match_id)) for match_id in batch])
+        print(f"[EXPORT] {table}: {min(start + batch_matches, len(pending))}/{len(pending)} match")
+
+    manifest.set_watermarks(table, seqs)
+    return len(changed.union(pending)), rows
+
+def compact(root, table, manifest, max_rows=COMPACT_ROWS, max_files=COMPACT_FILES):
+    """ patch 파티션마다 max_rows보다 행이 적은 파일이 max_files개를 넘으면 하나로 합친다. 합친 파일 수 """
+    table_root = os.path.join(root, table)
+    merged = 0
+    if not os.path.isdir(table_root):
+        return merged
+    for partition in sorted(os.listdir(table_root)):
+        directory = os.path.join(table_root, partition)
+        small = [name for name in sorted(os.listdir(directory))
+                 if name.endswith('.parquet') and pq.ParquetFile(os.path.join(directory, name)).metadata.num_rows < max_rows]
+        if len(small) <= max_files:
+            continue
+        data = pa.concat_tables([pq.ParquetFile(os.path.join(directory, name)).read() for name in small])
+        name = f"part-{int(time.time() * 1000)}-compact.parquet"
+        _write_file(data.combine_chunks(), os.path.join(directory, name))
+        manifest.move(table, [os.path.join(table, partition, old) for old in small], os.path.join(table, partition, name))
+        for old in small:
+            os.remove(os.path.join(directory, old))
+        merged += len(small)
+    return merged
+
+def export(db_name=DB_NAME, root=EXPORT_ROOT, batch_matches=5000, full=False):
+    """
+    match 테이블들을 root/<table>/patch=.../*.parquet 로 내보낸다 (zstd, dictionary 인코딩).
+    기본은 증분 sync: 테이블마다 아직 내보내지 않은 match와, 지난 sync 뒤 바뀐 match(나중에 들어온 timeline,
+    upsert로 다시 수집한 match)를 쓰고 바뀐 match의 예전 행은 지운다. 끝나면 patch마다 작은 파일을 합친다.
+    full=True면 처음부터 다시 쓴다. 테이블마다 (쓰거나 지운 match 수, 쓴 행 수)를 돌려준다.
+    db_name은 읽기 전용으로 열며, 스키마가 v12(match_changes)보다 오래됐으면 아무것도 쓰지 않고 RuntimeError.
+    """
+    _require_pyarrow()
+    conn = connect(db_name, readonly=True)
+    version = schema_version(conn)
+    if version < CHANGES_VERSION:
+        conn.close()
+        raise RuntimeError(f"{db_name}은(는) 스키마 v{version}입니다. columnar export에는 v{CHANGES_VERSION} 이상"
+                           f"(match_changes)이 필요하니 먼저 python migrations.py {db_name}로 마이그레이션하세요.")
+    if not full and Manifest.is_legacy(root):
+        print(f"[EXPORT] {root}/는 이전 형식(patch/date 파티션)이라 처음부터 다시 내보냅니다")
+        full = True
+    if full and os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root, exist_ok=True)
+
+    manifest = Manifest(root)
+    sync_id = int(time.time() * 1000)
+    started = time.perf_counter()
+    counts = {}
+    for table in EXPORT_TABLES:
+        counts[table] = export_table(conn, manifest, root, table, batch_matches, sync_id)
+        compact(root, table, manifest)
+    conn.close()
+
+    if any(matches for matches, _ in counts.values()):
+        manifest.add_sync(sync_id)
+    manifest.close()
+    summary = ", ".join(f"{table} match {matches}개/{rows}행" for table, (matches, rows) in counts.items())
+    print(f"[EXPORT] {summary}, {time.perf_counter() - started:.2f}초 -> {root}/")
+    return counts
+
+def dataset(table, root=EXPORT_ROOT):
+    _require_pyarrow()
+    # 타입 추론에 맡기면 patch='15.1'이 숫자로 읽힌다
+    partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in PARTITIONING]), flavor='hive')
+    return ds.dataset(os.path.join(root, table), format='parquet', partitioning=partitioning)
+
+def _plain(df):
+    # dictionary 컬럼은 category로 풀리므로 SQLite에서 읽은 것과 같은 object 컬럼으로 돌린다
+    for column in df.select_dtypes('category').columns:
+        df[column] = df[column].astype(object)
+    return df
+
+def read_table(table, columns=None, filter=None, root=EXPORT_ROOT):
+    """
+    내보낸 테이블에서 columns만 읽는다 (column projection). filter는 pyarrow 식,
+    예: ds.field('patch') == '15.1' 이면 그 파티션 디렉터리만 읽는다.
+    """
+    return _plain(dataset(table, root).to_table(columns=columns, filter=filter).to_pandas())
+
+def iter_batches(table, columns=None, batch_size=DEFAULT_CHUNKSIZE, filter=None, root=EXPORT_ROOT):
+    """ read_table을 batch_size행씩 DataFrame으로 나눠 돌려준다 (chunks.read_chunks의 Parquet판) """
+    for batch in dataset(table, root).to_batches(columns=columns, filter=filter, batch_size=batch_size):
+        yield _plain(batch.to_pandas())
+
+def benchmark(db_name=DB_NAME, root=EXPORT_ROOT):
+    """ 같은 DB를 내보낸 뒤 ping/champion 분석이 읽는 컬럼을 SQLite와 Parquet에서 읽는 시간과 크기를 비교한다 """
+    from champion import BAN_SLOTS
+    from ping import PING_COLUMNS
+
+    export(db_name, root)
+    conn = connect(db_name, readonly=True)
+    reads = {
+        'ping (match_participants)': ('match_participants', ['match_id', 'puuid', 'win', *PING_COLUMNS]),
+        'champion (match_participants)': ('match_participants', ['match_id', 'champion_id', 'champion_name', 'win']),
+        'champion (match_bans)': ('match_bans', ['match_id', *BAN_SLOTS]),
+    }
+    for name, (table, columns) in reads.items():
+        started = time.perf_counter()
+        sqlite_rows = len(pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {table}", conn))
+        sqlite_time = time.perf_counter() - started
+        started = time.perf_counter()
+        parquet_rows = len(read_table(table, columns, root=root))
+        parquet_time = time.perf_counter() - started
+        print(f"[BENCH] {name}: SQLite {sqlite_time:.3f}초 / Parquet {parquet_time:.3f}초 ({sqlite_rows}={parquet_rows}행)")
+    conn.close()
+
+    def size(path):
+        return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+    print(f"[BENCH] 크기: SQLite {os.path.getsize(db_name) / 1024 / 1024:.1f} MB / "
+          f"Parquet {sum(size(os.path.join(root, table)) for table in EXPORT_TABLES) / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    db_name = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else DB_NAME
+    if '--benchmark' in sys.argv:
+        benchmark(db_name)
+    else:
+        export(db_name, full='--full' in sys.argv)
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class CrawlStats:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.done}/{self.total} 완료 (실패 {self.failed}), "
+                f"{self.elapsed:.1f}초, {self.rate:.2f} req/s")
+
+class AsyncCrawler:
+    """
+    fetch(item)은 스레드 풀에서 동시에 최대 concurrency개까지 실행되고(요청 속도는 requester의 RateLimiter가 제한),
+    결과는 큐를 거쳐 이벤트 루프 스레드의 handle(idx, item, payload)로 한 번에 하나씩 전달된다.
+    sqlite 연결은 만든 스레드에서만 쓸 수 있으므로 DB 저장은 항상 handle에서 한다.
+    key(item)을 주면 key(지역)마다 작업 큐와 스레드 풀(concurrency개)을 따로 둔 파이프라인을 동시에 돌린다.
+    한 지역이 제한에 걸려 기다리는 동안에도 다른 지역 worker는 계속 요청하고, handle은 여전히 하나다.
+    """
+    def __init__(self, concurrency=10, queue_size=100, report_every=10.0):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.report_every = report_every
+
+    def run(self, items, fetch, handle, key=None):
+        groups = {}
+        for item in items:
+            groups.setdefault(key(item) if key is not None else None, []).append(item)
+        return asyncio.run(self._run(groups, fetch, handle))
+
+    async def _run(self, groups, fetch, handle):
+        total = sum(len(items) for items in groups.values())
+        stats = CrawlStats(total)
+        group_stats = {group: CrawlStats(len(items)) for group, items in groups.items()}
+        results = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        executors = {group: ThreadPoolExecutor(max_workers=self.concurrency) for group in groups}
+
+        async def worker(group, jobs):
+            while True:
+                try:
+                    item = jobs.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    payload = await loop.run_in_executor(executors[group], fetch, item)
+                except Exception as e:
+                    print(f"[ERROR] {item} 요청 중 예외: {e}")
+                    payload = None
+                await results.put((group, item, payload))
+
+        async def writer():
+            last_report = time.monotonic()
+            for idx in range(1, total + 1):
+                group, item, payload = await results.get()
+                for s in (stats, group_stats[group]):
+                    s.done += 1
+                    if payload is None:
+                        s.failed += 1
+                    if s.done == s.total:
+                        s.finished = time.monotonic()
+                handle(idx, item, payload)
+                if time.monotonic() - last_report >= self.report_every:
+                    print(f"[INFO] {stats}")
+                    last_report = time.monotonic()
+
+        workers = []
+        try:
+            for group, items in groups.items():
+                jobs = asyncio.Queue()
+                for item in items:
+                    jobs.put_nowait(item)
+                workers += [asyncio.create_task(worker(group, jobs)) for _ in range(self.concurrency)]
+            await writer()
+            await asyncio.gather(*workers)
+        finally:
+            for executor in executors.values():
+                executor.shutdown()
+
+        stats.finished = time.monotonic()
+        if len(groups) > 1:
+            for group, s in group_stats.items():
+                print(f"[INFO] {group}: {s}")
+        print(f"[INFO] 크롤링 종료: {stats}")
+        return stats
+
+def benchmark(total=200, latency=0.2, concurrency=20):
+    """ 인위적 지연을 넣은 로컬 모의 Riot 서버로 순차 수집과 비동기 수집의 처리량을 비교한다 """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from ratelimit import RateLimitedRequester, RateLimiter
+
+    class MockRiotHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = b'{"metadata": {}, "info": {}}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockRiotHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/lol/match/v5/matches/"
+
+    def fetch_with(requester):
+        return lambda match_id: requester.get(base + match_id).json()
+
+    match_ids = [f"KR_{i}" for i in range(total)]
+
+    requester = RateLimitedRequester('', RateLimiter("1000:1"))
+    started = time.monotonic()
+    for match_id in match_ids:
+        fetch_with(requester)(match_id)
+    sequential = total / (time.monotonic() - started)
+
+    requester = RateLimitedRequester('', RateLimiter("1000:1"))
+    stats = AsyncCrawler(concurrency).run(match_ids, fetch_with(requester), lambda idx, item, payload: None)
+    server.shutdown()
+
+    print(f"[BENCH] 지연 {latency * 1000:.0f}ms, {total}건")
+    print(f"[BENCH] 순차: {sequential:.2f} req/s, 비동기(동시 {concurrency}): {stats.rate:.2f} req/s")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,90 @@
+import time
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'  # queue_id != 420
+
+def seed(conn, stage, source_query, done_query):
+    """
+    source_query의 match_id 중 crawl_state에 없는 것만 추가한다.
+    이미 저장된 데이터(done_query)가 있는 ID는 바로 done으로 두어 기존 DB도 재수집하지 않는다.
+    """
+    cursor = conn.execute(f'''
+        INSERT OR IGNORE INTO crawl_state (stage, match_id, status, updated_at)
+        SELECT ?, match_id,
+               CASE WHEN match_id IN ({done_query}) THEN 'done' ELSE 'pending' END,
+               ?
+        FROM ({source_query})
+        WHERE match_id NOT IN (SELECT match_id FROM crawl_state WHERE stage = ?)
+    ''', (stage, int(time.time()), stage))
+    conn.commit()
+    return cursor.rowcount
+
+def pending_ids(conn, stage, max_attempts=5):
+    """ 아직 받지 않았거나, 실패 후 재시도 대기 시간이 지난 ID """
+    cursor = conn.execute('''
+        SELECT match_id FROM crawl_state
+        WHERE stage = ?
+          AND (status = 'pending' OR (status = 'failed' AND attempts < ? AND next_attempt_at <= ?))
+        ORDER BY match_id
+    ''', (stage, max_attempts, int(time.time())))
+    return [row[0] for row in cursor.fetchall()]
+
+def enqueue(conn, stage, match_id, priority=0, reset=False):
+    """
+    작업 하나를 pending으로 넣는다. 이미 있으면 그대로 두고, reset=True면 다시 pending으로 돌린다(매 실행 반복하는 ids 단계).
+    ids 단계에서는 match_id 자리에 puuid를 넣는다.
+    """
+    on_conflict = ("DO UPDATE SET status = 'pending', priority = excluded.priority, updated_at = excluded.updated_at"
+                   if reset else "DO NOTHING")
+    conn.execute(f'''
+        INSERT INTO crawl_state (stage, match_id, status, priority, updated_at)
+        VALUES (?, ?, 'pending', ?, ?)
+        ON CONFLICT (stage, match_id) {on_conflict}
+    ''', (stage, match_id, priority, int(time.time())))
+    conn.commit()
+
+def runnable_jobs(conn, max_attempts=5):
+    """ 모든 단계에서 지금 실행할 수 있는 (stage, match_id, priority) """
+    cursor = conn.execute('''
+        SELECT stage, match_id, priority FROM crawl_state
+        WHERE status = 'pending' OR (status = 'failed' AND attempts < ? AND next_attempt_at <= ?)
+    ''', (max_attempts, int(time.time())))
+    return cursor.fetchall()
+
+# 상태 갱신은 upsert다: enqueue 없이 바로 결과를 기록하는 작업(seed 이전 ID, 재시도 실패 등)도 행이 생긴다.
+# attempts는 실패 횟수다. mark_failed만 늘리고, 재시도 제한(max_attempts)과 백오프 지수가 이 값을 쓴다
+def _set_status(conn, stage, match_id, status, error=None):
+    conn.execute('''
+        INSERT INTO crawl_state (stage, match_id, status, last_error, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (stage, match_id) DO UPDATE SET
+            status = excluded.status, last_error = excluded.last_error, updated_at = excluded.updated_at
+    ''', (stage, match_id, status, error, int(time.time())))
+    conn.commit()
+
+# conn 자리에 BufferedWriter/WriterThread를 넘기면 데이터와 같은 flush 트랜잭션으로 커밋되어 둘이 어긋나지 않는다
+def mark_done(conn, stage, match_id):
+    _set_status(conn, stage, match_id, DONE)
+
+def mark_skipped(conn, stage, match_id):
+    _set_status(conn, stage, match_id, SKIPPED)
+
+def mark_failed(conn, stage, match_id, error, base_delay=60):
+    """ 이전 실패 횟수(attempts)에 따라 60초, 120초, 240초... 뒤에 재시도한다 """
+    now = int(time.time())
+    conn.execute('''
+        INSERT INTO crawl_state (stage, match_id, status, attempts, last_error, updated_at, next_attempt_at)
+        VALUES (?, ?, 'failed', 1, ?, ?, ? + ?)
+        ON CONFLICT (stage, match_id) DO UPDATE SET
+            status = 'failed', attempts = attempts + 1, last_error = excluded.last_error,
+            updated_at = excluded.updated_at, next_attempt_at = ? + ? * (1 << attempts)
+    ''', (stage, match_id, str(error), now, now, base_delay, now, base_delay))
+    conn.commit()
+
+def summary(conn, stage):
+    cursor = conn.execute('''
+        SELECT status, COUNT(*) FROM crawl_state WHERE stage = ? GROUP BY status
+    ''', (stage,))
+    return dict(cursor.fetchall())
@@ -0,0 +1,103 @@
+import queue
+import sqlite3
+import threading
+
+from dbwriter import BufferedWriter
+
+DB_NAME = 'riot_challenger.db'
+
+PRAGMAS = {
+    'journal_mode': 'WAL',       # 읽기(분석)와 쓰기(수집)가 서로 막지 않는다
+    'synchronous': 'NORMAL',     # WAL에서는 커밋마다 fsync하지 않아도 손상되지 않는다
+    'cache_size': -64000,        # 64MB (음수는 KiB 단위)
+    'mmap_size': 268435456,      # 256MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 30000,
+}
+
+def connect(db_name=DB_NAME, readonly=False, check_same_thread=True):
+    conn = sqlite3.connect(db_name, timeout=PRAGMAS['busy_timeout'] / 1000,
+                           check_same_thread=check_same_thread)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def db_path(conn):
+    """ 연결이 열고 있는 main DB 파일 경로 """
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+
+class WriterThread(threading.Thread):
+    """
+    DB 쓰기를 전담하는 스레드. write(key, ops)/execute(sql, params)는 큐에 넣기만 하고,
+    스레드가 자기 연결의 BufferedWriter로 batch_size개 match마다(또는 큐가 잠시 비면) 커밋한다.
+    쓰기 연결이 하나뿐이라 수집 중에 분석을 돌려도 "database is locked"가 나지 않는다.
+    """
+    def __init__(self, db_name=DB_NAME, batch_size=200, flush_interval=1.0, maxsize=10000):
+        super().__init__(daemon=True)
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+
+    def _put(self, item):
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, key, ops, stage=None):
+        self._put(('write', key, ops, stage))
+
+    def execute(self, sql, params=()):
+        self._put(('execute', sql, params))
+
+    def commit(self):
+        # crawlstate 등 conn처럼 쓰는 코드를 위한 것. 실제 커밋은 스레드의 flush가 한다.
+        pass
+
+    def run(self):
+        conn = connect(self.db_name)
+        writer = BufferedWriter(conn, self.batch_size)
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    writer.flush()
+                    continue
+                if item is None:
+                    break
+                kind, *args = item
+                if kind == 'write':
+                    writer.write(*args)
+                else:
+                    writer.execute(*args)
+            writer.flush()
+        except Exception as e:
+            self.error = e
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
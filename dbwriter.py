@@ -0,0 +1,139 @@
+import sqlite3
+
+import crawlstate
+
+class BufferedWriter:
+    """
+    여러 match의 행을 모아 batch_size개 match마다 한 트랜잭션으로 기록한다.
+    문장은 write/execute를 부른 순서 그대로 실행되고, 연달아 나오는 같은 SQL만 executemany 하나로 묶는다.
+    배치가 실패하면 되돌린 뒤 항목마다 따로 다시 기록해, 문제가 된 match만 빼고(stage가 있으면 crawl_state에
+    failed로 남기고) 나머지는 저장한다. with 블록을 빠져나갈 때(예외 포함) 완성된 match까지는 모두 flush된다.
+    """
+    def __init__(self, conn, batch_size=200):
+        self.conn = conn
+        self.batch_size = batch_size
+        # (key, stage, [(sql, [params, ...]), ...]) - 넣은 순서 그대로
+        self.entries = []
+        self.keys = set()
+        self.rows_written = 0
+        self.failed = []
+
+    def write(self, key, ops, stage=None):
+        """ ops: {sql: [params, ...]} - match 하나 분량. stage('match', 'timeline')를 주면 실패 시 crawl_state에 남긴다 """
+        self.entries.append((key, stage, [(sql, rows) for sql, rows in ops.items() if rows]))
+        self.keys.add(key)
+        if len(self.keys) >= self.batch_size:
+            self.flush()
+
+    def execute(self, sql, params=()):
+        """ match에 속하지 않는 문장(crawl_state 갱신 등)도 다음 flush 트랜잭션에 순서대로 싣는다 """
+        self.entries.append((None, None, [(sql, [params])]))
+
+    def commit(self):
+        # conn 대신 writer를 받는 코드(crawlstate 등)용. 실제 커밋은 flush에서 한다.
+        pass
+
+    def _runs(self, entries):
+        """ 항목들의 문장을 순서대로 펼치되, 바로 앞과 SQL이 같으면 행을 이어 붙인다 """
+        runs = []
+        for _, _, ops in entries:
+            for sql, rows in ops:
+                if runs and runs[-1][0] == sql:
+                    runs[-1][1].extend(rows)
+                else:
+                    runs.append((sql, list(rows)))
+        return runs
+
+    def _execute(self, entries):
+        with self.conn:
+            cursor = self.conn.cursor()
+            for sql, rows in self._runs(entries):
+                cursor.executemany(sql, rows)
+                self.rows_written += len(rows)
+
+    def flush(self):
+        if not self.entries:
+            return
+        entries, self.entries, self.keys = self.entries, [], set()
+        written = self.rows_written
+        try:
+            self._execute(entries)
+            return
+        except sqlite3.Error as e:
+            self.rows_written = written
+            print(f"[WARN] 배치 기록 실패({e}), 항목별로 다시 기록합니다.")
+
+        failed = []
+        for entry in entries:
+            try:
+                self._execute([entry])
+            except sqlite3.Error as e:
+                key, stage, _ = entry
+                print(f"[ERROR] {stage or 'write'} {key} 기록 실패: {e}")
+                failed.append((key, stage, e))
+        # 같은 배치에 뒤따른 mark_done보다 나중에 기록해야 failed가 남는다
+        for key, stage, e in failed:
+            if stage is not None and key is not None:
+                crawlstate.mark_failed(self.conn, stage, key, repr(e))
+        self.failed.extend(failed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+def benchmark(n_matches=10000, events_per_match=100, batch_size=200):
+    """ 합성 timeline 코퍼스로 기존 행 단위 INSERT+커밋 경로와 BufferedWriter의 rows/s를 비교한다 """
+    import os
+    import random
+    import tempfile
+    import time
+
+    import matchtime
+
+    def synthetic_timeline(idx):
+        events = []
+        for i in range(events_per_match):
+            events.append({
+                'type': random.choice(['WARD_PLACED', 'ITEM_PURCHASED', 'CHAMPION_KILL', 'ELITE_MONSTER_KILL']),
+                'timestamp': i * 1000,
+                'participantId': random.randint(1, 10),
+                'assistingParticipantIds': [random.randint(1, 10), random.randint(1, 10)],
+                'wardType': 'YELLOW_TRINKET',
+                'itemId': 3340,
+            })
+        return {'metadata': {'matchId': f"KR_{idx}"}, 'info': {'frames': [{'events': events}]}}
+
+    corpus = [synthetic_timeline(i) for i in range(n_matches)]
+    total_rows = n_matches * events_per_match
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = matchtime.create_connection_and_table(os.path.join(tmp, 'legacy.db'))
+        started = time.perf_counter()
+        for timeline_data in corpus:
+            # 기존 경로: 문장마다 execute, match마다 커밋
+            writer = BufferedWriter(conn)
+            matchtime.save_timeline_to_db(conn, timeline_data, writer)
+            for sql, rows in writer._runs(writer.entries):
+                for row in rows:
+                    conn.execute(sql, row)
+            conn.commit()
+        legacy = total_rows / (time.perf_counter() - started)
+        conn.close()
+
+        conn = matchtime.create_connection_and_table(os.path.join(tmp, 'batched.db'))
+        started = time.perf_counter()
+        with BufferedWriter(conn, batch_size) as writer:
+            for timeline_data in corpus:
+                matchtime.save_timeline_to_db(conn, timeline_data, writer)
+        batched = total_rows / (time.perf_counter() - started)
+        conn.close()
+
+    print(f"[BENCH] {n_matches} match x {events_per_match} events = {total_rows} rows")
+    print(f"[BENCH] 행 단위 INSERT + match별 커밋: {legacy:,.0f} rows/s")
+    print(f"[BENCH] executemany + {batch_size} match 단위 트랜잭션: {batched:,.0f} rows/s")
+
+if __name__ == "__main__":
+    benchmark()
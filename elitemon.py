@@ -1,165 +1,192 @@
-import sqlite3
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from db import connect
+from resultcache import cached
+
+# ELITE_MONSTER_KILL을 (match, team)별로 세어 match_teams와 SQL 안에서 join/집계한다.
+# pandas로는 kill 수/용 종류/오브젝트별로 몇 줄짜리 결과만 넘어온다.
+# 세 쿼리 모두 첫 두 인자가 match_key 구간이다. (type_id, match_key, timestamp) 인덱스의 범위 검색이라
+# 구간을 나눠 돌린 부분 집계를 더하면 전체 결과와 같다 (match 하나의 이벤트는 한 구간에만 있다)
+ELITE_KILLS_WHERE = """
+    e.type_id = (SELECT enum_id FROM event_enums WHERE value = 'ELITE_MONSTER_KILL')
+    AND e.match_key BETWEEN ? AND ?
+"""
+
+KILL_COUNT_WINRATE_SQL = f"""
+SELECT k.kills, SUM(t.win) AS wins, COUNT(*) AS total
+FROM (
+    SELECT e.match_key, e.team_id, COUNT(*) AS kills
+    FROM match_events_compact e
+    WHERE {ELITE_KILLS_WHERE}
+      AND e.monster_type_id = (SELECT enum_id FROM event_enums WHERE value = ?)
+    GROUP BY e.match_key, e.team_id
+) k
+JOIN match_keys m ON m.match_key = k.match_key
+JOIN match_teams t ON t.match_id = m.match_id AND t.team_id = k.team_id
+GROUP BY k.kills
+ORDER BY k.kills
+"""
+
+SUB_TYPE_WINRATE_SQL = f"""
+SELECT (SELECT value FROM event_enums WHERE enum_id = e.monster_sub_type_id) AS monster_sub_type,
+       SUM(t.win) AS wins, COUNT(*) AS total
+FROM match_events_compact e
+JOIN match_keys m ON m.match_key = e.match_key
+JOIN match_teams t ON t.match_id = m.match_id AND t.team_id = e.team_id
+WHERE {ELITE_KILLS_WHERE}
+  AND e.monster_type_id = (SELECT enum_id FROM event_enums WHERE value = ?)
+GROUP BY monster_sub_type
+"""
+
+OBJECTIVE_WINRATE_SQL = f"""
+SELECT (SELECT value FROM event_enums WHERE enum_id = o.monster_type_id) AS monster_type,
+       SUM(t.win) AS wins, COUNT(*) AS total
+FROM (
+    SELECT DISTINCT e.match_key, e.team_id, e.monster_type_id
+    FROM match_events_compact e
+    WHERE {ELITE_KILLS_WHERE}
+      AND e.monster_type_id IN (SELECT enum_id FROM event_enums WHERE value IN ({{placeholders}}))
+) o
+JOIN match_keys m ON m.match_key = o.match_key
+JOIN match_teams t ON t.match_id = m.match_id AND t.team_id = o.team_id
+GROUP BY monster_type
+"""
+
+# chunksize 없이 한 번에 집계할 때의 match_key 구간
+ALL_MATCH_KEYS = (-2 ** 63, 2 ** 63 - 1)
+
+# last 다음부터 match_key 순으로 n개 match의 (첫 key, 마지막 key). 남은 match가 없으면 (None, None)
+MATCH_KEY_RANGE_SQL = """
+SELECT MIN(match_key), MAX(match_key)
+FROM (SELECT match_key FROM match_keys WHERE match_key > ? ORDER BY match_key LIMIT ?)
+"""
+
+OBJECTIVE_MONSTERS = ['BARON_NASHOR', 'RIFTHERALD', 'ATAKHAN']
+
+# 위 쿼리들이 읽는 테이블. resultcache.fingerprint가 본다
+EVENT_TABLES = ['match_events_compact', 'match_teams']
+
 class EpicMonsterAnalyzer:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
-
-    def load_elite_monster_kills(self):
-        query = """
-        SELECT match_id, team_id, monster_type, monster_sub_type, timestamp
-        FROM match_events
-        WHERE type = 'ELITE_MONSTER_KILL'
-        ORDER BY match_id, timestamp ASC
+    def __init__(self, db_path, result_cache=None, chunksize=None):
+        """
+        result_cache(resultcache.ResultCache)를 주면 이벤트/팀 테이블이 그대로인 동안 집계를 디스크에서 다시 읽는다.
+        chunksize를 주면 match_key 순으로 chunksize개 match씩 집계해 더한다 (결과는 같다). SQLite가 (match, team)
+        중간 결과를 메모리(temp_store)에 쌓는 양이 전체 match 수 대신 chunksize에 비례한다.
         """
-        df = pd.read_sql_query(query, self.conn)
+        self.conn = connect(db_path, readonly=True)
+        self.result_cache = result_cache
+        self.chunksize = chunksize
+        # 같은 세션에서 같은 집계를 다시 요청하면 DB를 다시 읽지 않는다
+        self.cache = {}
+
+    def query(self, sql, params=()):
+        key = (sql, tuple(params))
+        if key not in self.cache:
+            self.cache[key] = cached(self.result_cache, self.conn, 'elitemon.query', [sql, list(params)], EVENT_TABLES,
+                                     lambda: self.aggregate(sql, params))
+        return self.cache[key]
+
+    def match_key_ranges(self):
+        last = ALL_MATCH_KEYS[0]
+        while True:
+            first, last = self.conn.execute(MATCH_KEY_RANGE_SQL, (last, self.chunksize)).fetchone()
+            if first is None:
+                return
+            yield first, last
+
+    def aggregate(self, sql, params):
+        """ 첫 컬럼별 (wins, total). chunk 모드에서는 구간마다 집계한 행을 첫 컬럼으로 다시 더한다 """
+        if self.chunksize is None:
+            return pd.read_sql_query(sql, self.conn, params=(*ALL_MATCH_KEYS, *params))
+        parts = [pd.read_sql_query(sql, self.conn, params=(first, last, *params))
+                 for first, last in self.match_key_ranges()]
+        parts = [part for part in parts if not part.empty]
+        if not parts:
+            return pd.read_sql_query(sql, self.conn, params=(*ALL_MATCH_KEYS, *params))
+        df = pd.concat(parts)
+        return df.groupby(df.columns[0], sort=True, dropna=False)[['wins', 'total']].sum().reset_index()
+
+    def kill_count_winrates(self, monster_type):
+        """ monster_type을 n번 잡은 팀들의 승리 수/전체 수. index: kills """
+        df = self.query(KILL_COUNT_WINRATE_SQL, (monster_type,)).set_index('kills')
+        df['winrate'] = df['wins'] / df['total'] * 100
         return df
 
-    def load_team_wins(self):
-        query = """
-        SELECT match_id, team_id, win
-        FROM match_teams
-        """
-        df = pd.read_sql_query(query, self.conn)
+    def sub_type_winrates(self, monster_type):
+        """ monster_type 처치 이벤트의 sub_type별 (처치한 팀 기준) 승리 수/전체 수. index: monster_sub_type """
+        df = self.query(SUB_TYPE_WINRATE_SQL, (monster_type,)).set_index('monster_sub_type')
+        df['winrate'] = df['wins'] / df['total'] * 100
         return df
 
-    def add_labels_ratio(self, ax, wins, total_counts):
-        """ bar plot 위에 승리/전체 n/m 형태 표시 """
-        for p, win, total in zip(ax.patches, wins, total_counts):
-            height = p.get_height()
-            label = f"{win}/{total}"
-            ax.text(p.get_x() + p.get_width() / 2., height + 0.02, label, ha="center", fontsize=9)
+    def objective_winrates(self, monster_types):
+        """ monster_types 각각을 한 번 이상 잡은 팀의 승리 수/전체 수. 처치 기록이 없는 몬스터는 빠진다 """
+        sql = OBJECTIVE_WINRATE_SQL.format(placeholders=', '.join('?' * len(monster_types)))
+        df = self.query(sql, tuple(monster_types)).set_index('monster_type')
+        df = df.reindex([monster for monster in monster_types if monster in df.index])
+        df['winrate'] = df['wins'] / df['total'] * 100
+        return df
 
     def analyze_horde_kills_vs_winrate(self):
-        kills_df = self.load_elite_monster_kills()
-        wins_df = self.load_team_wins()
-
-        horde_df = kills_df[kills_df['monster_type'] == 'HORDE']
-        horde_counts = horde_df.groupby(['match_id', 'team_id']).size().reset_index(name='horde_kills')
-
-        merged = pd.merge(horde_counts, wins_df, on=['match_id', 'team_id'])
-
-        total_counts = merged.groupby('horde_kills')['win'].count()
-        win_counts = merged.groupby('horde_kills')['win'].sum()
-        winrates = (win_counts / total_counts) * 100
-
-        total_counts = total_counts.sort_index()
-        win_counts = win_counts.sort_index()
-        winrates = winrates.sort_index()
-
-        plt.figure(figsize=(10,6))
-        ax = winrates.plot(kind='bar', color='purple')
-        self.add_labels_ratio(ax, win_counts, total_counts)
-        plt.title('Number of Horde (Void Grub) Kills vs Win Rate')
-        plt.xlabel('Number of Horde Kills')
-        plt.ylabel('Win Rate (%)')
-        plt.ylim(0, 100)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_horde_kills(self.kill_count_winrates('HORDE'))
         plt.show()
 
     def analyze_dragon_kills_vs_winrate(self):
-        kills_df = self.load_elite_monster_kills()
-        wins_df = self.load_team_wins()
-
-        dragon_df = kills_df[kills_df['monster_type'] == 'DRAGON']
-        dragon_counts = dragon_df.groupby(['match_id', 'team_id']).size().reset_index(name='dragon_kills')
-
-        merged = pd.merge(dragon_counts, wins_df, on=['match_id', 'team_id'])
-
-        total_counts = merged.groupby('dragon_kills')['win'].count()
-        win_counts = merged.groupby('dragon_kills')['win'].sum()
-        winrates = (win_counts / total_counts) * 100
-
-        total_counts = total_counts.sort_index()
-        win_counts = win_counts.sort_index()
-        winrates = winrates.sort_index()
-
-        plt.figure(figsize=(10,6))
-        ax = winrates.plot(kind='bar', color='skyblue')
-        self.add_labels_ratio(ax, win_counts, total_counts)
-        plt.title('Number of Dragon Kills vs Win Rate')
-        plt.xlabel('Number of Dragon Kills')
-        plt.ylabel('Win Rate (%)')
-        plt.ylim(0, 100)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_dragon_kills(self.kill_count_winrates('DRAGON'))
         plt.show()
 
     def analyze_dragon_type_vs_winrate(self):
-        kills_df = self.load_elite_monster_kills()
-        wins_df = self.load_team_wins()
-
-        dragon_df = kills_df[kills_df['monster_type'] == 'DRAGON']
-        dragon_types = dragon_df[['match_id', 'team_id', 'monster_sub_type']]
-
-        merged = pd.merge(dragon_types, wins_df, on=['match_id', 'team_id'])
-
-        total_counts = merged.groupby('monster_sub_type')['win'].count()
-        win_counts = merged.groupby('monster_sub_type')['win'].sum()
-        winrates = (win_counts / total_counts) * 100
-
-        winrates = winrates.sort_values()
-        total_counts = total_counts.reindex(winrates.index)
-        win_counts = win_counts.reindex(winrates.index)
-
-        plt.figure(figsize=(10,6))
-        ax = winrates.plot(kind='bar', color='orange')
-        self.add_labels_ratio(ax, win_counts, total_counts)
-        plt.title('Dragon Type vs Win Rate')
-        plt.xlabel('Dragon Type')
-        plt.ylabel('Win Rate (%)')
-        plt.ylim(0, 100)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_dragon_types(self.sub_type_winrates('DRAGON'))
         plt.show()
 
     def analyze_objective_kills_vs_winrate(self):
-        kills_df = self.load_elite_monster_kills()
-        wins_df = self.load_team_wins()
-
-        target_monsters = ['BARON_NASHOR', 'RIFTHERALD', 'ATAKHAN']
-        objective_df = kills_df[kills_df['monster_type'].isin(target_monsters)]
-
-        objective_flags = objective_df.drop_duplicates(subset=['match_id', 'team_id', 'monster_type'])
-        objective_flags['kill_flag'] = 1
-
-        pivot = objective_flags.pivot_table(index=['match_id', 'team_id'],
-                                            columns='monster_type',
-                                            values='kill_flag',
-                                            fill_value=0).reset_index()
-
-        merged = pd.merge(pivot, wins_df, on=['match_id', 'team_id'])
-
-        results = []
-
-        for monster in target_monsters:
-            if monster in merged.columns:
-                temp = merged[merged[monster] == 1]
-                total = temp.shape[0]
-                win = temp['win'].sum()
-                winrate = (win / total) * 100 if total > 0 else 0
-                results.append((monster, winrate, win, total))
-
-        result_df = pd.DataFrame(results, columns=['Monster', 'Win Rate', 'Win Count', 'Total Count'])
-        result_df = result_df.set_index('Monster')
-
-        plt.figure(figsize=(10,6))
-        ax = plt.bar(result_df.index, result_df['Win Rate'], color='lightgreen')
-
-        for rect, (win, total) in zip(ax, zip(result_df['Win Count'], result_df['Total Count'])):
-            height = rect.get_height()
-            plt.text(rect.get_x() + rect.get_width()/2.0, height + 1, f'{int(win)}/{int(total)}', ha='center', va='bottom', fontsize=9)
-
-        plt.title('Objective Kills vs Win Rate')
-        plt.xlabel('Objective (Baron, Rift Herald, Atakan)')
-        plt.ylabel('Win Rate (%)')
-        plt.ylim(0, 100)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_objectives(self.objective_winrates(OBJECTIVE_MONSTERS))
         plt.show()
 
+# 아래 plot_* 함수는 집계 결과만 받아 현재 figure에 그린다 (report.py가 프로세스 풀에서 호출한다)
+
+def add_labels_ratio(ax, wins, total_counts):
+    """ bar plot 위에 승리/전체 n/m 형태 표시 """
+    for p, win, total in zip(ax.patches, wins, total_counts):
+        height = p.get_height()
+        label = f"{win}/{total}"
+        ax.text(p.get_x() + p.get_width() / 2., height + 0.02, label, ha="center", fontsize=9)
+
+def plot_winrate_bars(stats, color, title, xlabel):
+    plt.figure(figsize=(10,6))
+    ax = stats['winrate'].plot(kind='bar', color=color)
+    add_labels_ratio(ax, stats['wins'], stats['total'])
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel('Win Rate (%)')
+    plt.ylim(0, 100)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+
+def plot_horde_kills(stats):
+    plot_winrate_bars(stats, 'purple', 'Number of Horde (Void Grub) Kills vs Win Rate', 'Number of Horde Kills')
+
+def plot_dragon_kills(stats):
+    plot_winrate_bars(stats, 'skyblue', 'Number of Dragon Kills vs Win Rate', 'Number of Dragon Kills')
+
+def plot_dragon_types(stats):
+    plot_winrate_bars(stats.sort_values('winrate'), 'orange', 'Dragon Type vs Win Rate', 'Dragon Type')
+
+def plot_objectives(stats):
+    plt.figure(figsize=(10,6))
+    ax = plt.bar(stats.index, stats['winrate'], color='lightgreen')
+
+    for rect, (win, total) in zip(ax, zip(stats['wins'], stats['total'])):
+        height = rect.get_height()
+        plt.text(rect.get_x() + rect.get_width()/2.0, height + 1, f'{int(win)}/{int(total)}', ha='center', va='bottom', fontsize=9)
+
+    plt.title('Objective Kills vs Win Rate')
+    plt.xlabel('Objective (Baron, Rift Herald, Atakan)')
+    plt.ylabel('Win Rate (%)')
+    plt.ylim(0, 100)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+
 if __name__ == "__main__":
     analyzer = EpicMonsterAnalyzer('riot_challenger.db')
 
@@ -0,0 +1,210 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from db import DB_NAME, connect
+from resultcache import fingerprint as changes_fingerprint
+
+STORE_ROOT = 'event_store'
+
+# match_events_compact의 숫자 컬럼. *_id로 끝나는 문자열 컬럼은 event_enums의 enum_id 그대로 둔다
+COLUMNS = [
+    'timestamp', 'type_id', 'actor_id', 'assist_mask', 'victim_id',
+    'ward_type_id', 'skill_slot', 'item_id', 'team_id', 'feat_type', 'feat_value',
+    'lane_type_id', 'monster_type_id', 'monster_sub_type_id', 'building_type_id', 'tower_type_id', 'winning_team',
+]
+
+# NULL은 -1로 저장한다 (모든 값이 0 이상이다)
+NULL = -1
+DTYPE = np.dtype('<i4')
+
+# 이 type의 이벤트가 있는 match 번호를 빌드 때 따로 저장한다 (분석이 전체 type_id 컬럼을 훑지 않게)
+INDEXED_TYPES = ['FEAT_UPDATE']
+
+# 정렬은 (match_id, timestamp). match_keys의 match_id 인덱스를 따라 match마다 (match_key, timestamp) 인덱스로 읽는다
+BUILD_SQL = f'''
+SELECT k.match_id, {", ".join(f"IFNULL(e.{column}, {NULL})" for column in COLUMNS)}
+FROM match_keys k
+JOIN match_events_compact e ON e.match_key = k.match_key
+ORDER BY k.match_id, e.timestamp, e.event_id
+'''
+
+def fingerprint(conn):
+    """
+    이벤트가 추가/재수집되면 바뀌는 값. 저장소가 DB보다 오래됐는지 판단한다. resultcache와 같은 키
+    (match_changes의 MAX(seq))라서 마지막 match의 timeline을 같은 이벤트 수로 다시 저장해도 바뀐다.
+    v12 이전 DB는 변경을 알 수 없어 None이고, 저장소는 늘 오래된 것으로 본다.
+    """
+    return changes_fingerprint(conn, ['match_events_compact'])
+
+def build(db_name=DB_NAME, root=STORE_ROOT, batch_rows=200000):
+    """
+    match_events_compact를 (match_id, timestamp) 순으로 정렬해 컬럼마다 int32 .npy 파일로 쓴다.
+    offsets.npy[i]:offsets.npy[i + 1]이 match_ids.npy[i]의 이벤트 구간이다. batch_rows행씩 memmap에 바로 써서
+    테이블 전체를 메모리에 올리지 않는다. INDEXED_TYPES마다 그 이벤트가 있는 match 번호를 matches.<type>.npy로 쓴다.
+    """
+    started = time.perf_counter()
+    conn = connect(db_name, readonly=True)
+    # 행 수, 이벤트, fingerprint를 한 스냅샷에서 읽는다 (빌드 중 수집이 써도 어긋나지 않는다)
+    conn.execute("BEGIN")
+    enums = dict(conn.execute("SELECT value, enum_id FROM event_enums"))
+    indexed = {value: [] for value in INDEXED_TYPES}
+    n_rows = conn.execute("SELECT COUNT(*) FROM match_events_compact").fetchone()[0]
+    tmp = f"{root}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+
+    arrays = {column: np.lib.format.open_memmap(os.path.join(tmp, f"{column}.npy"), mode='w+', dtype=DTYPE,
+                                                shape=(n_rows,))
+              for column in COLUMNS}
+    match_ids, counts = [], []
+    position = 0
+    cursor = conn.execute(BUILD_SQL)
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        batch_ids, *values = zip(*rows)
+        for column, column_values in zip(COLUMNS, values):
+            arrays[column][position:position + len(rows)] = column_values
+        # 정렬되어 있으므로 match 경계는 id가 바뀌는 곳이다. 앞 batch의 마지막 match가 이어질 수 있다
+        batch_ids = np.array(batch_ids, dtype=object)
+        boundaries = np.concatenate(([True], batch_ids[1:] != batch_ids[:-1]))
+        starts = np.flatnonzero(boundaries)
+        sizes = np.diff(np.append(starts, len(batch_ids))).tolist()
+        first = len(match_ids)
+        if match_ids and match_ids[-1] == batch_ids[0]:
+            counts[-1] += sizes.pop(0)
+            starts = starts[1:]
+            first -= 1
+        # 행마다 전체 match 번호
+        row_matches = first + np.cumsum(boundaries) - 1
+        type_ids = arrays['type_id'][position:position + len(rows)]
+        for value, found in indexed.items():
+            found.append(np.unique(row_matches[type_ids == enums.get(value, NULL)]))
+        position += len(rows)
+        match_ids.extend(batch_ids[starts].tolist())
+        counts.extend(sizes)
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    np.save(os.path.join(tmp, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp, 'match_ids.npy'), np.array(match_ids, dtype=str))
+    for value, found in indexed.items():
+        # batch 경계에 걸친 match는 두 batch에 모두 나온다
+        matches = np.unique(np.concatenate(found)) if found else np.zeros(0)
+        np.save(os.path.join(tmp, f"matches.{value}.npy"), matches.astype(np.int64))
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'rows': position,
+            'fingerprint': fingerprint(conn),
+            'enums': enums,
+        }, f)
+    conn.close()
+
+    # 다 쓴 뒤에 바꿔 끼워서, 빌드 중에도 읽는 쪽은 이전 저장소를 온전히 본다
+    if os.path.exists(root):
+        old = f"{root}.old"
+        os.replace(root, old)
+        os.replace(tmp, root)
+        for name in os.listdir(old):
+            os.remove(os.path.join(old, name))
+        os.rmdir(old)
+    else:
+        os.replace(tmp, root)
+    print(f"[EVENTSTORE] match {len(match_ids)}개, 이벤트 {position}개, {time.perf_counter() - started:.2f}초 -> {root}/")
+
+class EventStore:
+    """
+    build()로 만든 저장소를 memory-map으로 연다. 여는 비용은 파일 크기와 상관없이 거의 없고,
+    match 하나의 이벤트는 컬럼마다 연속 구간이라 events(i)는 복사 없는 view를 돌려준다.
+    """
+    def __init__(self, root=STORE_ROOT):
+        self.root = root
+        with open(os.path.join(root, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.fingerprint = meta['fingerprint']
+        self.enums = meta['enums']
+        self.offsets = np.load(os.path.join(root, 'offsets.npy'))
+        self.match_ids = np.load(os.path.join(root, 'match_ids.npy'), mmap_mode='r')
+        self.columns = {}
+        self._index = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def column(self, name):
+        if name not in self.columns:
+            self.columns[name] = np.load(os.path.join(self.root, f"{name}.npy"), mmap_mode='r')
+        return self.columns[name]
+
+    def enum_id(self, value):
+        """ 'FEAT_UPDATE' -> type_id 등. 저장소에 없는 값이면 NULL(-1)이라 어떤 행과도 같지 않다 """
+        return self.enums.get(value, NULL)
+
+    def matches_with(self, value):
+        """ value(INDEXED_TYPES 중 하나) 이벤트가 있는 match 번호들, 오름차순 """
+        return np.load(os.path.join(self.root, f"matches.{value}.npy"))
+
+    def index(self, match_id):
+        if self._index is None:
+            self._index = {match_id: i for i, match_id in enumerate(self.match_ids.tolist())}
+        return self._index[match_id]
+
+    def events(self, i, columns=COLUMNS):
+        """ i번째 match의 이벤트. {컬럼: int32 view}, timestamp 순 """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {name: self.column(name)[start:end] for name in columns}
+
+    def is_stale(self, conn):
+        current = fingerprint(conn)
+        return current is None or current != self.fingerprint
+
+def open_store(db_name=DB_NAME, root=STORE_ROOT, rebuild=True):
+    """ 저장소가 없거나 DB보다 오래됐으면(rebuild=True일 때) 다시 만든 뒤 연다 """
+    if rebuild:
+        stale = not os.path.exists(os.path.join(root, 'meta.json'))
+        if not stale:
+            conn = connect(db_name, readonly=True)
+            stale = EventStore(root).is_stale(conn)
+            conn.close()
+        if stale:
+            build(db_name, root)
+    return EventStore(root)
+
+def benchmark(db_name=DB_NAME, root=STORE_ROOT):
+    """ FeatAnalyzer.completion_times를 전체 match에 구하는 시간: DB에서 읽어 groupby vs 저장소 match 구간 """
+    from feat import FeatAnalyzer
+
+    analyzer = FeatAnalyzer(db_name)
+    started = time.perf_counter()
+    df = analyzer.load_events()
+    load_time = time.perf_counter() - started
+    started = time.perf_counter()
+    grouped = analyzer.completion_times(df)
+    group_time = time.perf_counter() - started
+
+    open_store(db_name, root)
+    started = time.perf_counter()
+    store = EventStore(root)
+    open_time = time.perf_counter() - started
+    started = time.perf_counter()
+    sliced = FeatAnalyzer(db_name, store=store).completion_times()
+    slice_time = time.perf_counter() - started
+
+    same = grouped.sort_index().equals(sliced.sort_index().astype(grouped.dtypes))
+    print(f"[BENCH] DataFrame: 읽기 {load_time:.2f}초 + match {len(grouped)}개 groupby {group_time:.2f}초")
+    print(f"[BENCH] 저장소: 열기 {open_time:.3f}초 + match {len(sliced)}개 구간 {slice_time:.2f}초, "
+          f"결과 {'같음' if same else '다름'}")
+
+if __name__ == "__main__":
+    db_name = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else DB_NAME
+    if '--benchmark' in sys.argv:
+        benchmark(db_name)
+    else:
+        build(db_name)
@@ -1,88 +1,120 @@
-import sqlite3
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from db import connect
+from featcore import FEAT_MODES, iter_feat_events, load_feat_events, match_completion_times
+
 class FeatAnalyzer:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path, chunksize=None, store=None):
+        """
+        chunksize를 주면 이벤트를 chunksize행씩 match 단위로 나눠 읽는다 (결과는 같다).
+        store(eventstore.EventStore)를 주면 DB 대신 match별 이벤트 구간을 차례로 돈다.
+        """
+        self.conn = connect(db_path, readonly=True)
+        self.chunksize = chunksize
+        self.store = store
 
     def load_events(self):
-        query = """
-        SELECT match_id, team_id, feat_type, feat_value, timestamp
-        FROM match_events
-        WHERE type = 'FEAT_UPDATE'
-        ORDER BY match_id, timestamp ASC
-        """
-        df = pd.read_sql_query(query, self.conn)
-        df['feat_type'] = df['feat_type'].astype(int)
-        df['feat_value'] = df['feat_value'].astype(int)
-        return df
+        return load_feat_events(self.conn)
 
     def analyze_mode(self, df, match_id, mode='current'):
-        match_df = df[df['match_id'] == match_id]
-
-        if mode == 'current':
-            match_df = match_df[((match_df['feat_type'] == 0) & (match_df['feat_value'] == 3)) |
-                                 ((match_df['feat_type'] == 1) & (match_df['feat_value'] == 1)) |
-                                 ((match_df['feat_type'] == 2) & (match_df['feat_value'] == 3))]
-        elif mode == 'previous':
-            match_df = match_df[((match_df['feat_type'] == 0) & (match_df['feat_value'] == 1)) |
-                                 ((match_df['feat_type'] == 1) & (match_df['feat_value'] == 1)) |
-                                 ((match_df['feat_type'] == 2) & (match_df['feat_value'] == 3))]
-
-        team_counts = match_df['team_id'].value_counts()
-
-        for team_id, count in team_counts.items():
-            if count >= 2:
-                team_df = match_df[match_df['team_id'] == team_id]
-                sorted_team_df = team_df.sort_values('timestamp')
-                second_timestamp = sorted_team_df.iloc[1]['timestamp']
-                return second_timestamp
-
-        return None
+        """ match 하나의 2-feat 완료 시각 (없으면 None). 여러 match는 completion_times()로 한 번에 구한다 """
+        times = match_completion_times(df[df['match_id'] == match_id], mode)
+        return int(times[match_id]) if match_id in times.index else None
+
+    def analyze_events(self, store, events, mode='current'):
+        """ match_completion_times와 같은 규칙으로 match 하나의 저장소 구간(timestamp 순 view)에서 구한다 """
+        targets = [feat_type * 16 + feat_value for feat_type, feat_value in FEAT_MODES[mode]]
+        done = ((events['type_id'] == store.enum_id('FEAT_UPDATE')) &
+                np.isin(events['feat_type'] * 16 + events['feat_value'], targets))
+        teams = events['team_id'][done]
+        if len(teams) < 2:
+            return None
+        # value_counts 순서: 많이 완료한 팀, 같으면 먼저 나온 팀
+        team_ids, first, counts = np.unique(teams, return_index=True, return_counts=True)
+        best = np.lexsort((first, -counts))[0]
+        if counts[best] < 2:
+            return None
+        return events['timestamp'][done][teams == team_ids[best]][1]
+
+    def store_completion_times(self):
+        """ completion_times()를 저장소의 match 구간마다 돌려 구한다 (빌드 때 색인한 FEAT_UPDATE가 있는 match만) """
+        store = self.store
+        match_ids = []
+        times = {'current': {}, 'previous': {}}
+        for i in store.matches_with('FEAT_UPDATE'):
+            events = store.events(i, ['timestamp', 'type_id', 'team_id', 'feat_type', 'feat_value'])
+            match_id = str(store.match_ids[i])
+            match_ids.append(match_id)
+            for mode, completed in times.items():
+                timestamp = self.analyze_events(store, events, mode)
+                if timestamp is not None:
+                    completed[match_id] = int(timestamp)
+        # completion_times()와 같은 모양: 완료 못 한 match는 reindex로 NaN
+        return pd.DataFrame({mode: pd.Series(completed, dtype='int64').reindex(match_ids)
+                             for mode, completed in times.items()}, index=match_ids)
+
+    def completion_times(self, df=None):
+        """ match_id 순서대로 current/previous 모드의 2-feat 완료 시각 (완료 못 한 match는 NaN) """
+        if df is None and self.store is not None:
+            return self.store_completion_times()
+        if df is None and self.chunksize is not None:
+            # match별 결과라 chunk마다 구해서 이어 붙이면 된다
+            parts = [self.completion_times(chunk) for chunk in iter_feat_events(self.conn, self.chunksize)]
+            return pd.concat(parts).sort_index() if parts else pd.DataFrame({'current': [], 'previous': []})
+        if df is None:
+            df = self.load_events()
+        # 이벤트는 match_key 순서로 읽히므로 match_id 순서는 여기서 맞춘다
+        match_ids = np.sort(df['match_id'].unique())
+
+        current = match_completion_times(df, mode='current').reindex(match_ids)
+        previous = match_completion_times(df, mode='previous').reindex(match_ids)
+        return pd.DataFrame({'current': current, 'previous': previous}, index=match_ids)
 
     def compare_modes_all(self):
-        df = self.load_events()
-        match_ids = df['match_id'].unique()
-
-        results = []
-
-        for match_id in match_ids:
-            current_time = self.analyze_mode(df, match_id, mode='current')
-            previous_time = self.analyze_mode(df, match_id, mode='previous')
+        times = self.completion_times()
+
+        lines = []
+        for match_id, current_time, previous_time in zip(times.index, times['current'].tolist(), times['previous'].tolist()):
+            current_time = None if pd.isna(current_time) else int(current_time)
+            previous_time = None if pd.isna(previous_time) else int(previous_time)
+            lines.append(f"\nMatch ID: {match_id}")
+            lines.append(f"Current System Completion Time: {current_time}")
+            lines.append(f"Previous System Completion Time: {previous_time}")
+            if current_time is not None and previous_time is not None:
+                lines.append(f"Difference (Current - Previous): {current_time - previous_time} ms")
+        print("\n".join(lines))
 
-            print(f"\nMatch ID: {match_id}")
-            print(f"Current System Completion Time: {current_time}")
-            print(f"Previous System Completion Time: {previous_time}")
+        both = times.dropna()
+        if not both.empty:
+            print(f"\nAverage Current System Completion Time: {both['current'].mean() / 1000:.2f} sec")
+            print(f"Average Previous System Completion Time: {both['previous'].mean() / 1000:.2f} sec")
 
-            if current_time is not None and previous_time is not None:
-                diff = current_time - previous_time
-                print(f"Difference (Current - Previous): {diff} ms")
-                results.append((match_id, current_time, previous_time, diff))
-
-        if results:
-            current_times = [item[1]/1000 for item in results]  
-            previous_times = [item[2]/1000 for item in results]  
-            avg_current = sum(current_times) / len(current_times)
-            avg_previous = sum(previous_times) / len(previous_times)
-            print(f"\nAverage Current System Completion Time: {avg_current:.2f} sec")
-            print(f"Average Previous System Completion Time: {avg_previous:.2f} sec")
-
-            plt.figure(figsize=(14,7))
-            plt.scatter(range(len(current_times)), current_times, label='Current System (3 kills)', color='blue', alpha=0.6)
-            plt.scatter(range(len(previous_times)), previous_times, label='Previous System (1 kill)', color='green', alpha=0.6)
-
-            plt.axhline(y=avg_current, color='blue', linestyle='--', label=f'Current Avg: {avg_current:.1f} sec')
-            plt.axhline(y=avg_previous, color='green', linestyle='--', label=f'Previous Avg: {avg_previous:.1f} sec')
-
-            plt.title('Comparison of 2-Feat Completion Times (Current vs Previous System)')
-            plt.xlabel('Game Number')
-            plt.ylabel('Completion Timestamp (sec)')
-            plt.legend()
-            plt.grid(True)
-            plt.tight_layout()
+            plot_completion_times(both)
             plt.show()
 
-# Usage
-analyzer = FeatAnalyzer('riot_challenger.db')
-analyzer.compare_modes_all()
+def plot_completion_times(both):
+    """ both: 두 모드 모두 완료된 match의 completion_times() 행 (report.py가 프로세스 풀에서 호출한다) """
+    current_times = (both['current'] / 1000).tolist()
+    previous_times = (both['previous'] / 1000).tolist()
+    avg_current = sum(current_times) / len(current_times)
+    avg_previous = sum(previous_times) / len(previous_times)
+
+    plt.figure(figsize=(14,7))
+    plt.scatter(range(len(current_times)), current_times, label='Current System (3 kills)', color='blue', alpha=0.6)
+    plt.scatter(range(len(previous_times)), previous_times, label='Previous System (1 kill)', color='green', alpha=0.6)
+
+    plt.axhline(y=avg_current, color='blue', linestyle='--', label=f'Current Avg: {avg_current:.1f} sec')
+    plt.axhline(y=avg_previous, color='green', linestyle='--', label=f'Previous Avg: {avg_previous:.1f} sec')
+
+    plt.title('Comparison of 2-Feat Completion Times (Current vs Previous System)')
+    plt.xlabel('Game Number')
+    plt.ylabel('Completion Timestamp (sec)')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+
+if __name__ == "__main__":
+    analyzer = FeatAnalyzer('riot_challenger.db')
+    analyzer.compare_modes_all()
@@ -1,23 +1,19 @@
-import sqlite3
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+from db import connect
+from featcore import (FEAT_EVENTS_WITH_WINS_SQL, iter_feat_events, load_feat_events,
+                      second_feat_times_with_wins)
+
 class FeatAnalyzer:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path, chunksize=None):
+        """ chunksize를 주면 이벤트를 chunksize행씩 match 단위로 나눠 읽는다 (결과는 같다) """
+        self.conn = connect(db_path, readonly=True)
+        self.chunksize = chunksize
 
     def load_events(self):
-        query = """
-        SELECT match_id, team_id, feat_type, feat_value, timestamp
-        FROM match_events
-        WHERE type = 'FEAT_UPDATE'
-        ORDER BY match_id, timestamp ASC
-        """
-        df = pd.read_sql_query(query, self.conn)
-        df['feat_type'] = df['feat_type'].astype(int)
-        df['feat_value'] = df['feat_value'].astype(int)
-        return df
+        return load_feat_events(self.conn)
 
     def load_team_wins(self):
         query = """
@@ -27,68 +23,89 @@ class FeatAnalyzer:
         team_wins = pd.read_sql_query(query, self.conn)
         return team_wins
 
-    def analyze_success_and_win(self):
-        df = self.load_events()
-        team_wins = self.load_team_wins()
-        match_ids = df['match_id'].unique()
-
-        results = []
+    def analyze_success_and_win(self, df=None, team_wins=None):
+        """ df/team_wins: 이미 읽어 둔 이벤트/승패가 있으면 넘겨서 다시 읽지 않는다 """
+        if df is None:
+            df = self.load_events()
+        if team_wins is None:
+            team_wins = self.load_team_wins()
 
-        for match_id in match_ids:
-            match_df = df[df['match_id'] == match_id]
-            match_df = match_df[((match_df['feat_type'] == 0) & (match_df['feat_value'] == 3)) |
-                                 ((match_df['feat_type'] == 1) & (match_df['feat_value'] == 1)) |
-                                 ((match_df['feat_type'] == 2) & (match_df['feat_value'] == 3))]
+        merged = second_feat_times_with_wins(df, team_wins, mode='current')
+        results = list(merged[['match_id', 'team_id', 'timestamp', 'win']].itertuples(index=False, name=None))
 
-            team_counts = match_df['team_id'].value_counts()
+        return results
 
-            for team_id, count in team_counts.items():
-                if count >= 2:
-                    team_df = match_df[match_df['team_id'] == team_id]
-                    sorted_team_df = team_df.sort_values('timestamp')
-                    second_timestamp = sorted_team_df.iloc[1]['timestamp']
+    def cumulative_win_rates(self, df=None):
+        """ 완료 시각 기준 100초 단위 누적 승률. 마지막 값은 전체 승률. 완료 기록이 없으면 None """
+        if df is None and self.chunksize is not None:
+            parts = []
+            for chunk in iter_feat_events(self.conn, self.chunksize, FEAT_EVENTS_WITH_WINS_SQL):
+                team_wins = chunk[['match_id', 'team_id', 'win']].drop_duplicates()
+                results = self.analyze_success_and_win(chunk, team_wins)
+                if results:
+                    parts.append(win_time_histogram(results))
+        else:
+            results = self.analyze_success_and_win(df)
+            parts = [win_time_histogram(results)] if results else []
+
+        if not parts:
+            return None
+
+        counts, wins, max_time = merge_histograms(parts)
+
+        # 임계값 t초까지 완료한 팀의 승률 = t 이하 구간까지의 누적 승리 수 / 누적 팀 수
+        thresholds = np.arange(100, int(max_time) + 100, 100)
+        cumulative_counts = np.cumsum(counts)[:len(thresholds)]
+        cumulative_wins = np.cumsum(wins)[:len(thresholds)]
+        with np.errstate(invalid='ignore'):
+            cumulative_win_rates = (cumulative_wins / cumulative_counts).tolist()
+
+        total_win_rate = wins.sum() / counts.sum()
+        thresholds = np.append(thresholds, max_time + 100) 
+        cumulative_win_rates.append(total_win_rate)
 
-                    win_row = team_wins[(team_wins['match_id'] == match_id) & (team_wins['team_id'] == team_id)]
-                    if not win_row.empty:
-                        win = win_row['win'].values[0]
-                        results.append((match_id, team_id, second_timestamp, win))
-
-        return results
+        return thresholds, cumulative_win_rates
 
     def plot_cumulative_success_vs_win(self):
-        results = self.analyze_success_and_win()
+        rates = self.cumulative_win_rates()
 
-        if not results:
+        if rates is None:
             print("No successful feats found.")
             return
 
-        timestamps = [r[2]/1000 for r in results]  
-        wins = [r[3] for r in results]
-        data = pd.DataFrame({'time_sec': timestamps, 'win': wins})
-
-        thresholds = np.arange(100, int(data['time_sec'].max()) + 100, 100)
-
-        cumulative_win_rates = []
-        for t in thresholds:
-            subset = data[data['time_sec'] <= t]
-            if len(subset) > 0:
-                cumulative_win_rates.append(subset['win'].mean())
-            else:
-                cumulative_win_rates.append(np.nan)  
-
-        total_win_rate = data['win'].mean()
-        thresholds = np.append(thresholds, data['time_sec'].max() + 100) 
-        cumulative_win_rates.append(total_win_rate)
-
-        plt.figure(figsize=(10,6))
-        plt.plot(thresholds, cumulative_win_rates, marker='o')
-        plt.title('Cumulative Feat Completion Time vs Win Rate')
-        plt.xlabel('Feat Completion Time Threshold (sec)')
-        plt.ylabel('Win Rate')
-        plt.ylim(0, 1)
-        plt.grid(True)
-        plt.tight_layout()
+        plot_cumulative_win_rates(*rates)
         plt.show()
 
-analyzer = FeatAnalyzer('riot_challenger.db')
-analyzer.plot_cumulative_success_vs_win()
+def win_time_histogram(results):
+    """
+    analyze_success_and_win 결과를 완료 시각 100초 구간별 (팀 수, 승리 수)와 최대 완료 시각(초)으로 줄인다.
+    구간 k는 100*k < time_sec <= 100*(k+1) (0초는 구간 0). chunk별 결과를 merge_histograms로 더할 수 있다.
+    """
+    time_sec = np.array([r[2] for r in results], dtype=np.int64) / 1000
+    wins = np.array([r[3] for r in results], dtype=np.int64)
+    bins = np.maximum(np.ceil(time_sec / 100).astype(np.int64) - 1, 0)
+    return np.bincount(bins), np.bincount(bins, weights=wins).astype(np.int64), time_sec.max()
+
+def merge_histograms(parts):
+    size = max(len(counts) for counts, _, _ in parts)
+    counts = np.zeros(size, dtype=np.int64)
+    wins = np.zeros(size, dtype=np.int64)
+    for part_counts, part_wins, _ in parts:
+        counts[:len(part_counts)] += part_counts
+        wins[:len(part_wins)] += part_wins
+    return counts, wins, max(max_time for _, _, max_time in parts)
+
+def plot_cumulative_win_rates(thresholds, cumulative_win_rates):
+    """ report.py가 프로세스 풀에서 집계 결과만 넘겨 그린다 """
+    plt.figure(figsize=(10,6))
+    plt.plot(thresholds, cumulative_win_rates, marker='o')
+    plt.title('Cumulative Feat Completion Time vs Win Rate')
+    plt.xlabel('Feat Completion Time Threshold (sec)')
+    plt.ylabel('Win Rate')
+    plt.ylim(0, 1)
+    plt.grid(True)
+    plt.tight_layout()
+
+if __name__ == "__main__":
+    analyzer = FeatAnalyzer('riot_challenger.db')
+    analyzer.plot_cumulative_success_vs_win()
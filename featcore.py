@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from chunks import match_aligned, read_chunks
+
+# match_events 뷰 대신 압축 테이블을 바로 읽는다: idx_match_events_compact_type (type_id, match_key, timestamp)
+# 순서 그대로 나와서 임시 정렬이 없다. match_key 순서는 match_id 순서와 다르므로 match별 결과는 pandas에서 정렬한다
+FEAT_EVENTS_SQL = """
+SELECT k.match_id, e.team_id, e.feat_type, e.feat_value, e.timestamp
+FROM match_events_compact e
+JOIN match_keys k ON k.match_key = e.match_key
+WHERE e.type_id = (SELECT enum_id FROM event_enums WHERE value = 'FEAT_UPDATE')
+ORDER BY e.match_key, e.timestamp ASC
+"""
+
+# 스트리밍 모드에서 chunk마다 승패를 붙이기 위해 match_teams를 SQL에서 join한다
+FEAT_EVENTS_WITH_WINS_SQL = """
+SELECT k.match_id, e.team_id, e.feat_type, e.feat_value, e.timestamp, t.win
+FROM match_events_compact e
+JOIN match_keys k ON k.match_key = e.match_key
+JOIN match_teams t ON t.match_id = k.match_id AND t.team_id = e.team_id
+WHERE e.type_id = (SELECT enum_id FROM event_enums WHERE value = 'FEAT_UPDATE')
+ORDER BY e.match_key, e.timestamp ASC
+"""
+
+# 모드별 "완료"로 보는 (feat_type, feat_value)
+# feat_type 0: 첫 킬 관련(현재 3킬, 이전 1킬), 1: 첫 포탑, 2: 에픽 몬스터 3마리
+FEAT_MODES = {
+    'current': [(0, 3), (1, 1), (2, 3)],
+    'previous': [(0, 1), (1, 1), (2, 3)],
+}
+
+def load_feat_events(conn, sql=FEAT_EVENTS_SQL):
+    df = pd.read_sql_query(sql, conn)
+    df['feat_type'] = df['feat_type'].astype(int)
+    df['feat_value'] = df['feat_value'].astype(int)
+    return df
+
+def iter_feat_events(conn, chunksize, sql=FEAT_EVENTS_SQL):
+    """ load_feat_events와 같은 행을 match 경계에 맞춘 chunk로 나눠 돌려준다 """
+    for chunk in match_aligned(read_chunks(conn, sql, chunksize=chunksize)):
+        chunk['feat_type'] = chunk['feat_type'].astype(int)
+        chunk['feat_value'] = chunk['feat_value'].astype(int)
+        yield chunk
+
+def completed_feats(df, mode='current'):
+    codes = df['feat_type'].to_numpy() * 16 + df['feat_value'].to_numpy()
+    targets = [feat_type * 16 + feat_value for feat_type, feat_value in FEAT_MODES[mode]]
+    return df[np.isin(codes, targets)]
+
+def second_feat_times(df, mode='current'):
+    """
+    한 번의 정렬 + groupby로 (match_id, team_id)별 완료 feat 수, 첫 완료 시각, 두 번째 완료 시각(timestamp)을 구한다.
+    완료 feat이 2개 이상인 팀만 남는다.
+    """
+    done = completed_feats(df, mode)[['match_id', 'team_id', 'timestamp']]
+    done = done.sort_values(['match_id', 'team_id', 'timestamp'], kind='stable')
+    grouped = done.groupby(['match_id', 'team_id'], sort=False)
+
+    stats = grouped['timestamp'].agg(count='size', first_time='first').reset_index()
+    second = done[grouped.cumcount().to_numpy() == 1]
+    return stats.merge(second, on=['match_id', 'team_id'])
+
+def match_completion_times(df, mode='current'):
+    """
+    match별로 완료 feat이 가장 많은 팀(같으면 먼저 완료를 시작한 팀)의 두 번째 완료 시각.
+    완료 feat이 2개 이상인 팀이 없는 match는 빠진다.
+    """
+    per_team = second_feat_times(df, mode)
+    per_team = per_team.sort_values(['match_id', 'count', 'first_time'],
+                                    ascending=[True, False, True], kind='stable')
+    return per_team.drop_duplicates('match_id').set_index('match_id')['timestamp']
+
+def second_feat_times_with_wins(df, team_wins, mode='current'):
+    """ 완료 feat이 2개 이상인 모든 팀의 두 번째 완료 시각에 승패를 한 번의 join으로 붙인다 """
+    per_team = second_feat_times(df, mode)
+    return per_team.merge(team_wins[['match_id', 'team_id', 'win']], on=['match_id', 'team_id'])
+
+def benchmark(n_matches=5000, events_per_team=8, legacy_limit=1000):
+    """ 합성 FEAT_UPDATE 이벤트로 match별 boolean 마스킹 루프와 groupby 한 번의 처리 시간을 비교한다 """
+    import time
+
+    rng = np.random.default_rng(0)
+    n = n_matches * 2 * events_per_team
+    df = pd.DataFrame({
+        'match_id': np.repeat([f"KR_{i:07d}" for i in range(n_matches)], 2 * events_per_team),
+        'team_id': np.tile(np.repeat([100, 200], events_per_team), n_matches),
+        'feat_type': rng.integers(0, 3, n),
+        'feat_value': rng.integers(1, 4, n),
+        'timestamp': rng.integers(0, 1800000, n),
+    }).sort_values(['match_id', 'timestamp'], kind='stable').reset_index(drop=True)
+
+    def legacy(df, match_id, mode):
+        match_df = df[df['match_id'] == match_id]
+        match_df = completed_feats(match_df, mode)
+        for team_id, count in match_df['team_id'].value_counts().items():
+            if count >= 2:
+                return match_df[match_df['team_id'] == team_id].sort_values('timestamp').iloc[1]['timestamp']
+        return None
+
+    match_ids = df['match_id'].unique()[:legacy_limit]
+    started = time.perf_counter()
+    legacy_result = {match_id: legacy(df, match_id, 'current') for match_id in match_ids}
+    legacy_time = (time.perf_counter() - started) * n_matches / len(match_ids)
+
+    started = time.perf_counter()
+    result = match_completion_times(df, 'current')
+    vector_time = time.perf_counter() - started
+
+    mismatches = sum(1 for match_id, value in legacy_result.items() if value != result.get(match_id))
+    print(f"[BENCH] {n_matches} match, {n} events")
+    print(f"[BENCH] match별 마스킹 루프: {legacy_time:.2f}초 ({len(match_ids)} match 측정 후 환산)")
+    print(f"[BENCH] groupby 한 번: {vector_time:.3f}초, 결과 불일치 {mismatches}건")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+# participantFrames에서 저장하는 값: (컬럼 이름, JSON 경로)
+FRAME_FIELDS = [
+    ('total_gold', ('totalGold',)),
+    ('current_gold', ('currentGold',)),
+    ('xp', ('xp',)),
+    ('level', ('level',)),
+    ('minions_killed', ('minionsKilled',)),
+    ('jungle_minions_killed', ('jungleMinionsKilled',)),
+    ('position_x', ('position', 'x')),
+    ('position_y', ('position', 'y')),
+]
+FIELD_INDEX = {name: i for i, (name, _) in enumerate(FRAME_FIELDS)}
+
+PARTICIPANTS = 10
+FRAME_DTYPE = np.dtype('<i4')
+# 필드 하나의 프레임 하나 = 참가자 10명 x int32
+FRAME_BYTES = PARTICIPANTS * FRAME_DTYPE.itemsize
+
+# data BLOB은 (필드, 프레임, 참가자) 순서의 int32 배열이다.
+# 필드마다 연속이라 substr로 필요한 필드의 바이트만 읽을 수 있다
+INSERT_FRAMES_SQL = '''
+    INSERT OR REPLACE INTO match_frames (match_key, n_frames, frame_interval, data)
+    VALUES ((SELECT match_key FROM match_keys WHERE match_id = ?), ?, ?, ?)
+'''
+
+FIELD_SQL = f'''
+SELECT k.match_id, f.n_frames, t.win, substr(f.data, 1 + ? * f.n_frames * {FRAME_BYTES}, f.n_frames * {FRAME_BYTES})
+FROM match_frames f
+JOIN match_keys k ON k.match_key = f.match_key
+LEFT JOIN match_teams t ON t.match_id = k.match_id AND t.team_id = 100
+ORDER BY f.match_key
+'''
+
+def pack_frames(frames):
+    """ timeline의 frames -> (필드, 프레임, 참가자) int32 배열의 bytes. 값이 없으면 0 """
+    values = [0] * (len(FRAME_FIELDS) * len(frames) * PARTICIPANTS)
+    stride = len(frames) * PARTICIPANTS
+    for f, frame in enumerate(frames):
+        for participant_id, participant_frame in frame.get('participantFrames', {}).items():
+            p = int(participant_id) - 1
+            if not 0 <= p < PARTICIPANTS:
+                continue
+            for i, (_, path) in enumerate(FRAME_FIELDS):
+                value = participant_frame
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if value:
+                    values[i * stride + f * PARTICIPANTS + p] = int(value)
+    return np.array(values, dtype=FRAME_DTYPE).tobytes()
+
+def frame_rows(timeline_data):
+    """ match 하나의 participantFrames -> INSERT_FRAMES_SQL 행. 프레임이 없으면 빈 목록 """
+    info = timeline_data['info']
+    frames = info.get('frames', [])
+    if not frames:
+        return []
+    return [(timeline_data['metadata']['matchId'], len(frames), info.get('frameInterval'), pack_frames(frames))]
+
+def struct_frame_rows(timeline):
+    """ frame_rows와 같은 행을 schemas.Timeline에서 만든다. 값 순서는 FRAME_FIELDS 순서다 """
+    frames = timeline.info.frames
+    if not frames:
+        return []
+    values = np.zeros((len(FRAME_FIELDS), len(frames), PARTICIPANTS), dtype=FRAME_DTYPE)
+    for f, frame in enumerate(frames):
+        for participant_id, pf in frame.participant_frames.items():
+            p = int(participant_id) - 1
+            if not 0 <= p < PARTICIPANTS:
+                continue
+            position = pf.position
+            values[:, f, p] = (pf.total_gold, pf.current_gold, pf.xp, pf.level, pf.minions_killed,
+                               pf.jungle_minions_killed, position.x if position else 0, position.y if position else 0)
+    return [(timeline.metadata.match_id, len(frames), timeline.info.frame_interval, values.tobytes())]
+
+def load_field(conn, field):
+    """
+    모든 match의 field 하나를 (전체 프레임 수, 10) int32 배열 하나로 읽는다.
+    match i의 프레임은 values[offsets[i]:offsets[i + 1]] 이고, blue_wins[i]는 100팀 승리 여부다.
+    match마다 BLOB 하나를 받아 이어 붙이므로 (match, 분, 참가자)마다 파이썬 객체가 생기지 않는다.
+    """
+    rows = conn.execute(FIELD_SQL, (FIELD_INDEX[field],)).fetchall()
+    if not rows:
+        return [], np.zeros(1, dtype=np.int64), np.zeros((0, PARTICIPANTS), dtype=FRAME_DTYPE), np.zeros(0)
+    match_ids, n_frames, blue_wins, blobs = zip(*rows)
+    values = np.frombuffer(b''.join(blobs), dtype=FRAME_DTYPE).reshape(-1, PARTICIPANTS)
+    offsets = np.zeros(len(n_frames) + 1, dtype=np.int64)
+    np.cumsum(n_frames, out=offsets[1:])
+    return list(match_ids), offsets, values, np.array(blue_wins, dtype=float)
+
+def frame_minutes(offsets):
+    """ 프레임마다 match 안에서의 순번(= 분, frameInterval 60초 기준) """
+    counts = np.diff(offsets)
+    return np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+
+def diff_curve(conn, field='total_gold', max_minute=40):
+    """
+    분마다 블루(1~5) 합 - 레드(6~10) 합의 평균과, 이긴 팀 기준 차이(승리팀 - 패배팀)의 평균.
+    예: diff_curve(conn, 'total_gold')는 골드 차이 곡선, 'xp'는 경험치 차이 곡선
+    """
+    _, offsets, values, blue_wins = load_field(conn, field)
+    diff = values[:, :5].sum(axis=1, dtype=np.int64) - values[:, 5:].sum(axis=1, dtype=np.int64)
+    minute = frame_minutes(offsets)
+    # 승패를 모르는 match(match_teams 없음)는 승리팀 기준 평균에서 뺀다
+    sign = np.repeat(np.where(np.isnan(blue_wins), 0.0, np.where(blue_wins == 1, 1.0, -1.0)), np.diff(offsets))
+
+    keep = minute < max_minute
+    minute, diff, sign = minute[keep], diff[keep], sign[keep]
+    frames = np.bincount(minute, minlength=max_minute)
+    known = np.bincount(minute, weights=np.abs(sign), minlength=max_minute)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'matches': frames,
+            'blue_minus_red': np.bincount(minute, weights=diff, minlength=max_minute) / frames,
+            'winner_minus_loser': np.bincount(minute, weights=diff * sign, minlength=max_minute) / known,
+        }).rename_axis('minute')
+
+def benchmark(n_matches=100000, n_frames=30, batch_size=1000):
+    """ 합성 participantFrames를 n_matches개 저장한 뒤 골드/경험치 차이 곡선을 읽는 시간을 잰다 """
+    import os
+    import tempfile
+    import time
+
+    import matchtime
+    from dbwriter import BufferedWriter
+
+    rng = np.random.default_rng(0)
+    base = np.arange(n_frames)[:, None] * np.array([400, 100, 450, 0, 7, 1, 0, 0])[None, :]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = matchtime.create_connection_and_table(os.path.join(tmp, 'frames.db'))
+        started = time.perf_counter()
+        with BufferedWriter(conn, batch_size) as writer:
+            for i in range(n_matches):
+                match_id = f"KR_{i}"
+                values = base[None, :, :] + rng.integers(0, 300, (PARTICIPANTS, n_frames, len(FRAME_FIELDS)))
+                blob = np.ascontiguousarray(values.transpose(2, 1, 0), dtype=FRAME_DTYPE).tobytes()
+                writer.write(match_id, {
+                    matchtime.INSERT_MATCH_KEY_SQL: [(match_id,)],
+                    INSERT_FRAMES_SQL: [(match_id, n_frames, 60000, blob)],
+                    "INSERT INTO match_teams (match_id, team_id, win) VALUES (?, ?, ?)": [(match_id, 100, i % 2)],
+                })
+        write_time = time.perf_counter() - started
+        size = os.path.getsize(os.path.join(tmp, 'frames.db'))
+
+        for field in ('total_gold', 'xp'):
+            started = time.perf_counter()
+            curve = diff_curve(conn, field)
+            elapsed = time.perf_counter() - started
+            print(f"[BENCH] {field} 차이 곡선: {elapsed:.2f}초 ({int(curve['matches'].iat[0])} match, "
+                  f"{n_matches * n_frames * PARTICIPANTS:,} 값)")
+        conn.close()
+
+    print(f"[BENCH] {n_matches} match x {n_frames} 프레임 저장 {write_time:.1f}초, DB {size / 1024 / 1024:.0f} MB "
+          f"(match당 {len(FRAME_FIELDS) * n_frames * FRAME_BYTES} bytes)")
+
+if __name__ == "__main__":
+    benchmark()
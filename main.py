@@ -1,95 +1,119 @@
-import requests
-import sqlite3
+import sys
 import time
-import datetime
-
-class RateLimitedRequester:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.request_count = 0
-
-    def get(self, url):
-        self.request_count += 1
-
-        if self.request_count % 100 == 0:
-            print(f"[INFO] 100개 요청 완료, 2분간 대기...")
-            time.sleep(120)  # 2분(120초) 대기
-
-        elif self.request_count % 20 == 0:
-            print(f"[INFO] 20개 요청 완료, 1초간 대기...")
-            time.sleep(1)  
-
-        headers = {"X-Riot-Token": self.api_key}
-        response = requests.get(url, headers=headers)
-        return response
-
-def create_connection_and_table(db_name='riot_challenger.db'):
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS challenger_puuid (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            puuid TEXT UNIQUE
-        )
-    ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS challenger_matchid (
-            match_id TEXT PRIMARY KEY
-        )
-    ''')
-    conn.commit()
+
+from crawler import AsyncCrawler
+from db import DB_NAME, connect
+from migrations import migrate
+from regions import DEFAULT_PLATFORMS, PLATFORM_REGIONS, RANKED_SOLO_QUEUE, RegionalRequester, platform_host, region_host
+
+def create_connection_and_table(db_name=DB_NAME):
+    conn = connect(db_name)
+    migrate(conn)
     return conn
 
-def fetch_and_store_challenger_puuids(api_key, conn):
-    url = f"https://kr.api.riotgames.com/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5?api_key={api_key}"
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        entries = response.json()['entries']
-        cursor = conn.cursor()
-        for idx, entry in enumerate(entries, 1):
-            puuid = entry['puuid']
-            cursor.execute("INSERT OR IGNORE INTO challenger_puuid (puuid) VALUES (?)", (puuid,))
-            print(f"[{idx}/{len(entries)}] 챌린저 puuid 저장 중...")
-        conn.commit()
-        print(f"총 저장된 ID 수: {len(entries)}")
-    else:
-        print(f"[ERROR] Riot API 응답 실패: {response.status_code}")
-
-def fetch_and_store_match_id(api_key, conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT puuid FROM challenger_puuid")
-    puuids = [row[0] for row in cursor.fetchall()]
-
-    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
-    weekago = datetime.datetime.now() - datetime.timedelta(days=7)
-    start = int(weekago.replace(hour=0,minute=0,second=0,microsecond=0).timestamp())
-    end = int(yesterday.replace(hour=23,minute=59,second=59,microsecond=999999).timestamp())
-
-    total_matches = set()
-    requester = RateLimitedRequester(api_key)
-    
-    for idx,puuid in enumerate(puuids,1):
-        url = f"https://asia.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids?startTime={start}&endTime={end}&api_key={api_key}"
-        response = requester.get(url)
-        
-        if response.status_code == 200:
-            match_ids = response.json()
-            total_matches.update(match_ids)
-            print(f"[{idx}/{len(puuids)}] {len(match_ids)}개 match ID 수집 완료 (누적 {len(total_matches)}개)")
+def fetch_and_store_challenger_puuids(api_key, conn, platforms=DEFAULT_PLATFORMS, requester=None):
+    requester = requester or RegionalRequester(api_key)
+
+    def fetch(platform):
+        url = f"{platform_host(platform)}/lol/league/v4/challengerleagues/by-queue/RANKED_SOLO_5x5"
+        return requester.get(url)
+
+    def handle(idx, platform, response):
+        if response is not None and response.status_code == 200:
+            entries = response.json()['entries']
+            cursor = conn.cursor()
+            for entry in entries:
+                cursor.execute('''
+                    INSERT INTO challenger_puuid (puuid, platform) VALUES (?, ?)
+                    ON CONFLICT (puuid) DO UPDATE SET platform = excluded.platform
+                ''', (entry['puuid'], platform))
+            conn.commit()
+            print(f"[{platform}] 챌린저 puuid {len(entries)}개 저장")
         else:
-            print(f"[ERROR] {idx}번째 puuid 요청 실패: {response.status_code}")
-    
-    for match_id in total_matches:
-        cursor.execute("INSERT OR IGNORE INTO challenger_matchid (match_id) VALUES (?)", (match_id,))
-    conn.commit()
-    print(f"최종 저장된 match ID 수: {len(total_matches)}")
+            status = response.status_code if response is not None else None
+            print(f"[ERROR] {platform} Riot API 응답 실패: {status}")
+
+    AsyncCrawler(concurrency=1).run(platforms, fetch, handle, key=lambda platform: platform)
+
+# 처음 보는 puuid는 최근 7일을 받는다
+INITIAL_LOOKBACK = 7 * 24 * 3600
+
+# 지난 조회 때 진행 중이던 게임은 그 뒤에 목록에 나타나므로 high-water mark보다 1시간 앞에서부터 다시 본다 (중복은 거른다)
+WATERMARK_OVERLAP = 3600
+
+# match-v5 by-puuid ids의 count 최댓값
+MATCH_IDS_PAGE = 100
+
+def discovery_window(last_seen=None, now=None):
+    """ last_seen(지난 조회의 endTime, epoch 초)부터 now까지. 없으면 최근 INITIAL_LOOKBACK """
+    now = int(time.time()) if now is None else now
+    start = now - INITIAL_LOOKBACK if last_seen is None else last_seen - WATERMARK_OVERLAP
+    return start, now
+
+def match_ids_url(puuid, platform, start_time, end_time, start=0, count=MATCH_IDS_PAGE):
+    # queue를 서버에서 거르므로 솔로 랭크가 아닌 match는 ID조차 받지 않는다
+    return (f"{region_host(PLATFORM_REGIONS[platform])}/lol/match/v5/matches/by-puuid/{puuid}/ids"
+            f"?startTime={start_time}&endTime={end_time}&queue={RANKED_SOLO_QUEUE}&start={start}&count={count}")
+
+def fetch_match_ids(requester, puuid, platform, start_time, end_time):
+    """ 기간 안의 match ID를 페이지가 빌 때까지(count보다 적게 올 때까지) 모두 받는다. 실패하면 None """
+    match_ids = []
+    start = 0
+    while True:
+        response = requester.get(match_ids_url(puuid, platform, start_time, end_time, start))
+        if response.status_code != 200:
+            print(f"[ERROR] puuid {puuid} match ID 요청 실패: {response.status_code}")
+            return None
+        page = response.json()
+        match_ids.extend(page)
+        if len(page) < MATCH_IDS_PAGE:
+            return match_ids
+        start += MATCH_IDS_PAGE
+
+def fetch_and_store_match_id(api_key, conn, concurrency=10, platforms=DEFAULT_PLATFORMS, requester=None):
+    """
+    puuid마다 지난 조회 시각(last_seen_at) 이후만 받아 이미 아는 match ID를 걸러 저장한다.
+    활동 중인 플레이어도 보통 요청 한 번이면 된다. 지역마다 따로 제한이 걸리므로 지역별 파이프라인으로 나눠 동시에 받는다.
+    """
+    placeholders = ', '.join('?' * len(platforms))
+    puuids = conn.execute(f"SELECT puuid, platform, last_seen_at FROM challenger_puuid WHERE platform IN ({placeholders})",
+                          platforms).fetchall()
+    known = {row[0] for row in conn.execute("SELECT match_id FROM challenger_matchid")}
+
+    now = int(time.time())
+    new_matches = 0
+    requester = requester or RegionalRequester(api_key)
+
+    def fetch(item):
+        puuid, platform, last_seen = item
+        return fetch_match_ids(requester, puuid, platform, *discovery_window(last_seen, now))
+
+    def handle(idx, item, match_ids):
+        nonlocal new_matches
+        if match_ids is None:
+            print(f"[ERROR] {idx}번째 puuid 요청 실패")
+            return
+        new = [match_id for match_id in dict.fromkeys(match_ids) if match_id not in known]
+        known.update(new)
+        new_matches += len(new)
+        # 새 ID와 high-water mark를 한 트랜잭션으로: 중간에 멈춰도 다음 실행이 빠진 구간을 다시 받는다
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO challenger_matchid (match_id) VALUES (?)", [(match_id,) for match_id in new])
+            conn.execute("UPDATE challenger_puuid SET last_seen_at = ? WHERE puuid = ?", (now, item[0]))
+        print(f"[{idx}/{len(puuids)}] {len(match_ids)}개 중 새 match ID {len(new)}개 (누적 {new_matches}개)")
+
+    crawler = AsyncCrawler(concurrency)
+    crawler.run(puuids, fetch, handle, key=lambda item: PLATFORM_REGIONS[item[1]])
+    print(f"최종 저장된 새 match ID 수: {new_matches}")
 
 def main():
     api_key = ''
+    # python main.py KR EUW1 NA1: 플랫폼마다 독립된 제한으로 동시에 수집한다
+    platforms = sys.argv[1:] or DEFAULT_PLATFORMS
     conn = create_connection_and_table()
-    fetch_and_store_challenger_puuids(api_key, conn)
-    fetch_and_store_match_id(api_key,conn)
+    requester = RegionalRequester(api_key)
+    fetch_and_store_challenger_puuids(api_key, conn, platforms, requester)
+    fetch_and_store_match_id(api_key, conn, platforms=platforms, requester=requester)
     conn.close()
 
 if __name__ == "__main__":
@@ -1,148 +1,88 @@
-import requests
-import sqlite3
-import time
-import datetime
-
-class RateLimitedRequester:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.request_count = 0
-
-    def get(self, url):
-        self.request_count += 1
-
-        if self.request_count % 100 == 0:
-            print(f"[INFO] 100개 요청 완료, 2분간 대기...")
-            time.sleep(120)  
-        elif self.request_count % 20 == 0:
-            print(f"[INFO] 20개 요청 완료, 1초간 대기...")
-            time.sleep(1)  
-
-        headers = {"X-Riot-Token": self.api_key}
-        response = requests.get(url, headers=headers)
-        return response
-
-def create_connection_and_table(db_name='riot_challenger.db'):
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
+import gzip
+import json
+import os
+import sys
 
-    # match_summary 테이블
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS match_summary(
-            match_id TEXT PRIMARY KEY,
-            game_mode TEXT,
-            game_version TEXT,
-            game_type TEXT,
-            map_id INTEGER,
-            queue_id INTEGER,
-            game_duration INTEGER
-        )
-    ''')
-
-    # match_participants 테이블
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS match_participants(
-            match_id TEXT,
-            puuid TEXT,
-            riot_id_game_name TEXT,
-            champion_name TEXT,
-            champion_id INTEGER,
-            individual_position TEXT,
-            lane TEXT,
-            item0 INTEGER,
-            item1 INTEGER,
-            item2 INTEGER,
-            item3 INTEGER,
-            item4 INTEGER,
-            item5 INTEGER,
-            item6 INTEGER,
-            kills INTEGER,
-            deaths INTEGER,
-            assists INTEGER,
-            all_in_pings INTEGER,
-            assist_me_pings INTEGER,
-            basic_pings INTEGER,
-            command_pings INTEGER,
-            danger_pings INTEGER,
-            enemy_vision_pings INTEGER,
-            enemy_missing_pings INTEGER,
-            get_back_pings INTEGER,
-            hold_pings INTEGER,
-            need_vision_pings INTEGER,
-            retreat_pings INTEGER,
-            on_my_way_pings INTEGER,
-            push_pings INTEGER,
-            vision_cleared_pings INTEGER,
-            detector_wards_placed INTEGER,
-            wards_killed INTEGER,
-            ward_placed INTEGER,
-            vision_score INTEGER,
-            win INTEGER,
-            PRIMARY KEY (match_id, puuid)
-        )
-    ''')
-
-    # match_teams 테이블
-    cursor.execute('DROP TABLE IF EXISTS match_teams')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS match_teams(
-            match_id TEXT,
-            team_id INTEGER,
-            win INTEGER,
-            feats_epic_monster_kill INTEGER,
-            feats_first_blood INTEGER,
-            feats_first_turret INTEGER,
-            champion_first INTEGER,
-            champion_kill INTEGER,
-            dragon_first INTEGER,
-            dragon_kill INTEGER,
-            horde_first INTEGER,
-            horde_kill INTEGER,
-            rift_herald_first INTEGER,
-            rift_herald_kill INTEGER,
-            atakhan_first INTEGER,
-            atakhan_kill INTEGER,
-            baron_first INTEGER,
-            baron_kill INTEGER,
-            tower_first INTEGER,
-            tower_kill INTEGER,
-            inhibitor_first INTEGER,
-            inhibitor_kill INTEGER,
-            PRIMARY KEY (match_id, team_id)
-        )
-    ''')
-
-    # match_bans 테이블
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS match_bans(
-            match_id TEXT PRIMARY KEY,
-            ban1 INTEGER,
-            ban2 INTEGER,
-            ban3 INTEGER,
-            ban4 INTEGER,
-            ban5 INTEGER,
-            ban6 INTEGER,
-            ban7 INTEGER,
-            ban8 INTEGER,
-            ban9 INTEGER,
-            ban10 INTEGER
-        )
-    ''')
+import crawlstate
+from archive import PayloadArchive
+from crawler import AsyncCrawler
+from db import DB_NAME, WriterThread, connect, db_path
+from dbwriter import BufferedWriter
+from migrations import migrate
+from regions import RegionalRequester, match_region, match_url
+from schemas import decode_match, msgspec
 
-    conn.commit()
+def create_connection_and_table(db_name=DB_NAME):
+    conn = connect(db_name)
+    migrate(conn)
     return conn
 
-def fetch_match_data(requester, match_id):
-    url = f"https://asia.api.riotgames.com/lol/match/v5/matches/{match_id}"
+def fetch_match_data(requester, match_id, archive=None):
+    url = match_url(match_id)
     response = requester.get(url)
     if response.status_code == 200:
-        return response.json()
+        if archive is not None:
+            archive.put('match', match_id, response.content)
+        return decode_match(response.content)
     else:
         print(f"[ERROR] match_id {match_id} 요청 실패: {response.status_code}")
         return None
 
-def save_match_to_db(conn, match_data):
-    cursor = conn.cursor()
+SUMMARY_COLUMNS = [
+    'match_id', 'game_mode', 'game_version', 'game_type',
+    'map_id', 'queue_id', 'game_duration', 'game_creation',
+]
+
+PARTICIPANT_COLUMNS = [
+    'match_id', 'puuid', 'riot_id_game_name', 'champion_name', 'champion_id',
+    'individual_position', 'lane', 'item0', 'item1', 'item2', 'item3', 'item4', 'item5', 'item6',
+    'kills', 'deaths', 'assists',
+    'all_in_pings', 'assist_me_pings', 'basic_pings', 'command_pings', 'danger_pings',
+    'enemy_vision_pings', 'enemy_missing_pings', 'get_back_pings', 'hold_pings',
+    'need_vision_pings', 'retreat_pings', 'on_my_way_pings', 'push_pings',
+    'vision_cleared_pings', 'detector_wards_placed', 'wards_killed', 'ward_placed',
+    'vision_score', 'win',
+]
+
+TEAM_COLUMNS = [
+    'match_id', 'team_id', 'win',
+    'feats_epic_monster_kill', 'feats_first_blood', 'feats_first_turret',
+    'champion_first', 'champion_kill',
+    'dragon_first', 'dragon_kill',
+    'horde_first', 'horde_kill',
+    'rift_herald_first', 'rift_herald_kill',
+    'atakhan_first', 'atakhan_kill',
+    'baron_first', 'baron_kill',
+    'tower_first', 'tower_kill',
+    'inhibitor_first', 'inhibitor_kill',
+]
+
+BAN_COLUMNS = [
+    'match_id', 'ban1', 'ban2', 'ban3', 'ban4', 'ban5', 'ban6', 'ban7', 'ban8', 'ban9', 'ban10',
+]
+
+def upsert_sql(table, columns, key):
+    """ 같은 키가 있으면 나머지 컬럼을 새 값으로 덮어쓴다 (재수집/재구축 시 오래된 행 갱신) """
+    updates = ",\n        ".join(f"{column} = excluded.{column}" for column in columns if column not in key)
+    return f'''
+    INSERT INTO {table} ({", ".join(columns)})
+    VALUES ({", ".join("?" * len(columns))})
+    ON CONFLICT ({", ".join(key)}) DO UPDATE SET
+        {updates}
+'''
+
+INSERT_SUMMARY_SQL = upsert_sql('match_summary', SUMMARY_COLUMNS, ['match_id'])
+
+INSERT_PARTICIPANT_SQL = upsert_sql('match_participants', PARTICIPANT_COLUMNS, ['match_id', 'puuid'])
+
+INSERT_TEAM_SQL = upsert_sql('match_teams', TEAM_COLUMNS, ['match_id', 'team_id'])
+
+INSERT_BANS_SQL = upsert_sql('match_bans', BAN_COLUMNS, ['match_id'])
+
+def match_rows(match_data):
+    """ match 하나(dict 또는 schemas.Match)를 {sql: [params, ...]}로 펼친다. 솔로 랭크(420)가 아니면 None """
+    if not isinstance(match_data, dict):
+        return struct_match_rows(match_data)
     info = match_data['info']
     metadata = match_data['metadata']
     match_id = metadata['matchId']
@@ -150,36 +90,22 @@ def save_match_to_db(conn, match_data):
     queue_id = info.get('queueId')
     if queue_id != 420:
         print(f"[SKIP] match_id {match_id}는 queue_id {queue_id}입니다 (건너뜀)")
-        return
-  
-    cursor.execute('''
-        INSERT OR IGNORE INTO match_summary (
-            match_id, game_mode, game_version, game_type,
-            map_id, queue_id, game_duration
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
+        return None
+
+    summary = [(
         match_id,
         info.get('gameMode'),
         info.get('gameVersion'),
         info.get('gameType'),
         info.get('mapId'),
         info.get('queueId'),
-        info.get('gameDuration')
-    ))
+        info.get('gameDuration'),
+        info.get('gameCreation')
+    )]
 
+    participants = []
     for p in info['participants']:
-        cursor.execute('''
-            INSERT OR IGNORE INTO match_participants (
-                match_id, puuid, riot_id_game_name, champion_name, champion_id,
-                individual_position, lane, item0, item1, item2, item3, item4, item5, item6,
-                kills, deaths, assists,
-                all_in_pings, assist_me_pings, basic_pings, command_pings, danger_pings,
-                enemy_vision_pings, enemy_missing_pings, get_back_pings, hold_pings,
-                need_vision_pings, retreat_pings, on_my_way_pings, push_pings,
-                vision_cleared_pings, detector_wards_placed, wards_killed, ward_placed,
-                vision_score, win
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        participants.append((
             match_id,
             p.get('puuid'),
             p.get('riotIdGameName'),
@@ -217,22 +143,10 @@ def save_match_to_db(conn, match_data):
             p.get('visionScore'),
             int(p.get('win'))
         ))
-   
+
+    teams = []
     for team in info['teams']:
-        cursor.execute('''
-            INSERT OR IGNORE INTO match_teams (
-                match_id, team_id, win,
-                feats_epic_monster_kill,feats_first_blood,feats_first_turret,
-                champion_first, champion_kill,
-                dragon_first, dragon_kill,
-                horde_first, horde_kill,
-                rift_herald_first, rift_herald_kill,
-                atakhan_first, atakhan_kill,
-                baron_first, baron_kill,
-                tower_first, tower_kill,
-                inhibitor_first, inhibitor_kill
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,?,?,?)
-        ''', (
+        teams.append((
             match_id,
             team.get('teamId'),
             int(team.get('win')),
@@ -256,39 +170,131 @@ def save_match_to_db(conn, match_data):
             int(team['objectives']['inhibitor']['first']),
             team['objectives']['inhibitor']['kills']
         ))
-    
+
     bans = []
     for team in info['teams']:
         for ban in team.get('bans', []):
             bans.append(ban.get('championId', 0))
 
-    cursor.execute('''
-        INSERT OR IGNORE INTO match_bans (
-            match_id, ban1, ban2, ban3, ban4, ban5, ban6, ban7, ban8, ban9, ban10
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (match_id, *bans))
-    
-    
-    conn.commit()
+    return {
+        INSERT_SUMMARY_SQL: summary,
+        INSERT_PARTICIPANT_SQL: participants,
+        INSERT_TEAM_SQL: teams,
+        INSERT_BANS_SQL: [(match_id, *bans)],
+    }
+
+def struct_match_rows(match):
+    """ match_rows와 같은 행을 schemas.Match에서 만든다. Participant 필드 순서가 PARTICIPANT_COLUMNS 순서다 """
+    info = match.info
+    match_id = match.metadata.match_id
+
+    if info.queue_id != 420:
+        print(f"[SKIP] match_id {match_id}는 queue_id {info.queue_id}입니다 (건너뜀)")
+        return None
+
+    summary = [(
+        match_id, info.game_mode, info.game_version, info.game_type,
+        info.map_id, info.queue_id, info.game_duration, info.game_creation,
+    )]
+    astuple = msgspec.structs.astuple
+    participants = [(match_id, *astuple(p)[:-1], int(p.win)) for p in info.participants]
+
+    teams = []
+    bans = []
+    for team in info.teams:
+        feats = team.feats
+        objectives = team.objectives
+        row = [match_id, team.team_id, int(team.win), feats.epic_monster_kill.feat_state,
+               feats.first_blood.feat_state, feats.first_turret.feat_state]
+        for objective in astuple(objectives):
+            row += (int(objective.first), objective.kills)
+        teams.append(tuple(row))
+        bans.extend(ban.champion_id for ban in team.bans)
+
+    return {
+        INSERT_SUMMARY_SQL: summary,
+        INSERT_PARTICIPANT_SQL: participants,
+        INSERT_TEAM_SQL: teams,
+        INSERT_BANS_SQL: [(match_id, *bans)],
+    }
+
+def save_match_to_db(conn, match_data, writer=None):
+    """ writer(BufferedWriter)가 주어지면 배치에 쌓고, 없으면 바로 한 트랜잭션으로 기록한다. 건너뛰면 False """
+    ops = match_rows(match_data)
+    if ops is None:
+        return False
+
+    if writer is not None:
+        writer.write(ops[INSERT_SUMMARY_SQL][0][0], ops, 'match')
+        return True
 
-def process_all_matches(api_key, conn):
-    requester = RateLimitedRequester(api_key)
     cursor = conn.cursor()
-    cursor.execute("SELECT match_id FROM challenger_matchid")
-    match_ids = [row[0] for row in cursor.fetchall()]
+    for sql, rows in ops.items():
+        cursor.executemany(sql, rows)
+    conn.commit()
+    return True
+
+def process_all_matches(api_key, conn, concurrency=10, batch_size=200, archive=None):
+    requester = RegionalRequester(api_key)
+    archive = archive or PayloadArchive()
+    crawlstate.seed(conn, 'match', "SELECT match_id FROM challenger_matchid", "SELECT match_id FROM match_summary")
+    match_ids = crawlstate.pending_ids(conn, 'match')
+    print(f"[INFO] 수집 대상 match ID {len(match_ids)}개 {crawlstate.summary(conn, 'match')}")
 
-    for idx, match_id in enumerate(match_ids, 1):
-        match_data = fetch_match_data(requester, match_id)
-        if match_data:
-            save_match_to_db(conn, match_data)
+    def handle(idx, match_id, match_data):
+        if not match_data:
+            crawlstate.mark_failed(writer, 'match', match_id, "match 요청 실패")
+            print(f"[{idx}/{len(match_ids)}] match_id {match_id} 저장 실패")
+            return
+        try:
+            saved = save_match_to_db(conn, match_data, writer)
+        except Exception as e:
+            crawlstate.mark_failed(writer, 'match', match_id, repr(e))
+            print(f"[{idx}/{len(match_ids)}] match_id {match_id} 저장 실패: {e}")
+            return
+        if saved:
+            crawlstate.mark_done(writer, 'match', match_id)
             print(f"[{idx}/{len(match_ids)}] match_id {match_id} 저장 완료")
         else:
-            print(f"[{idx}/{len(match_ids)}] match_id {match_id} 저장 실패")
+            crawlstate.mark_skipped(writer, 'match', match_id)
+
+    crawler = AsyncCrawler(concurrency)
+    with WriterThread(db_path(conn), batch_size) as writer:
+        crawler.run(match_ids, lambda match_id: fetch_match_data(requester, match_id, archive), handle,
+                    key=match_region)
+
+def iter_payload_files(path):
+    """ 디렉터리의 match 원본 JSON(.json / .json.gz)을 하나씩 읽는다 """
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if name.endswith('.json.gz'):
+            with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+                yield json.load(f)
+        elif name.endswith('.json'):
+            with open(file_path, encoding='utf-8') as f:
+                yield json.load(f)
+
+def rebuild_match_tables(conn, payloads, batch_size=200):
+    """ API 호출 없이 원본 payload로 match_summary/participants/teams/bans를 upsert로 다시 채운다 """
+    saved = 0
+    with BufferedWriter(conn, batch_size) as writer:
+        for idx, match_data in enumerate(payloads, 1):
+            if save_match_to_db(conn, match_data, writer):
+                saved += 1
+            if idx % 1000 == 0:
+                print(f"[INFO] {idx}개 payload 처리 (저장 {saved}개)")
+    print(f"[INFO] 재구축 완료: {saved}개 match")
+    return saved
 
 def main():
     api_key = ''
     conn = create_connection_and_table()
-    process_all_matches(api_key, conn)
+    if len(sys.argv) > 2 and sys.argv[1] == '--rebuild':
+        rebuild_match_tables(conn, iter_payload_files(sys.argv[2]))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--rebuild':
+        rebuild_match_tables(conn, PayloadArchive().iter_payloads('match', decode_match))
+    else:
+        process_all_matches(api_key, conn)
     conn.close()
 
 if __name__ == "__main__":
@@ -1,82 +1,98 @@
-import sqlite3
-import requests
-import time
 import json
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-class RateLimitedRequester:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.request_count = 0
-
-    def get(self, url):
-        self.request_count += 1
-
-        if self.request_count % 100 == 0:
-            print(f"[INFO] 100개 요청 완료, 2분간 대기...")
-            time.sleep(120)
-        elif self.request_count % 20 == 0:
-            print(f"[INFO] 20개 요청 완료, 1초간 대기...")
-            time.sleep(1)
-
-        headers = {"X-Riot-Token": self.api_key}
-        response = requests.get(url, headers=headers)
-        return response
-
-def create_connection_and_table(db_name='riot_challenger.db'):
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS match_events (
-            match_id TEXT,
-            timestamp INTEGER,
-            type TEXT,
-            actor_id INTEGER,
-            assisting_participant_ids TEXT,
-            victim_id INTEGER,
-            ward_type TEXT,
-            skill_slot INTEGER,
-            item_id INTEGER,
-            team_id INTEGER,
-            feat_type TEXT,
-            feat_value INTEGER,
-            lane_type TEXT,
-            monster_type TEXT,
-            monster_sub_type TEXT,
-            building_type TEXT,
-            tower_type TEXT,
-            winning_team INTEGER
-        )
-    ''')
+import crawlstate
+from archive import PayloadArchive, read_object
+from crawler import AsyncCrawler
+from db import DB_NAME, WriterThread, connect, db_path
+from dbwriter import BufferedWriter
+from frames import INSERT_FRAMES_SQL, frame_rows, struct_frame_rows
+from migrations import migrate
+from regions import RegionalRequester, match_region, match_url
+from schemas import decode_timeline
 
-    conn.commit()
+def create_connection_and_table(db_name=DB_NAME):
+    conn = connect(db_name)
+    migrate(conn)
     return conn
 
-def fetch_timeline_data(requester, match_id):
-    url = f"https://asia.api.riotgames.com/lol/match/v5/matches/{match_id}/timeline"
+def fetch_timeline_data(requester, match_id, archive=None):
+    url = match_url(match_id, '/timeline')
     response = requester.get(url)
     if response.status_code == 200:
-        return response.json()
+        if archive is not None:
+            archive.put('timeline', match_id, response.content)
+        return decode_timeline(response.content)
     else:
         print(f"[ERROR] match_id {match_id} timeline 요청 실패: {response.status_code}")
         return None
 
-def save_timeline_to_db(conn, timeline_data):
-    cursor = conn.cursor()
-    match_id = timeline_data['metadata']['matchId']
+# match_events는 migrations v3부터 match_events_compact 위의 호환 뷰이므로 쓰기는 압축 테이블에 직접 한다
+INSERT_MATCH_KEY_SQL = "INSERT OR IGNORE INTO match_keys (match_id) VALUES (?)"
 
-    cursor.execute("DELETE FROM match_events WHERE match_id = ?", (match_id,))
-    conn.commit()
+INSERT_ENUM_SQL = "INSERT OR IGNORE INTO event_enums (value) VALUES (?)"
+
+DELETE_EVENTS_SQL = "DELETE FROM match_events_compact WHERE match_key = (SELECT match_key FROM match_keys WHERE match_id = ?)"
+
+# 숫자 값은 모두 0 이상이라, timeline_columns가 NULL 대신 넣는 -1은 NULLIF로 다시 NULL이 된다
+INSERT_EVENT_SQL = '''
+    INSERT INTO match_events_compact (
+        match_key, timestamp, type_id, actor_id, assist_mask, victim_id,
+        ward_type_id, skill_slot, item_id, team_id, feat_type, feat_value,
+        lane_type_id, monster_type_id, monster_sub_type_id, building_type_id, tower_type_id, winning_team
+    ) VALUES (
+        (SELECT match_key FROM match_keys WHERE match_id = ?), NULLIF(?, -1),
+        (SELECT enum_id FROM event_enums WHERE value = ?), NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1),
+        (SELECT enum_id FROM event_enums WHERE value = ?),
+        NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1), NULLIF(?, -1),
+        (SELECT enum_id FROM event_enums WHERE value = ?),
+        (SELECT enum_id FROM event_enums WHERE value = ?),
+        (SELECT enum_id FROM event_enums WHERE value = ?),
+        (SELECT enum_id FROM event_enums WHERE value = ?),
+        (SELECT enum_id FROM event_enums WHERE value = ?), NULLIF(?, -1)
+    )
+'''
+
+# match_events_compact에는 행 트리거가 없으므로 (migrations v12) timeline을 쓸 때마다 match_changes에 한 번 적는다
+LOG_EVENTS_SQL = '''
+    INSERT INTO match_changes (table_name, match_id, seq)
+    VALUES ('match_events_compact', ?,
+            (SELECT COALESCE(MAX(seq), 0) + 1 FROM match_changes WHERE table_name = 'match_events_compact'))
+    ON CONFLICT (table_name, match_id) DO UPDATE SET seq = excluded.seq
+'''
+
+# timeline_rows 행에서 event_enums로 사전 인코딩되는 문자열 컬럼 위치
+# (type, ward_type, lane_type, monster_type, monster_sub_type, building_type, tower_type)
+ENUM_COLUMNS = (2, 6, 12, 13, 14, 15, 16)
+
+# timeline_rows 행에서 match_id 뒤의 컬럼 수 (timeline_columns의 배열 수)
+EVENT_COLUMNS = 17
 
+def assist_mask(assisting_ids):
+    """ [1, 3, 4] -> 0b1101. participantId 1~10을 비트 0~9에 둔다 """
+    if not assisting_ids:
+        return None
+    mask = 0
+    for participant_id in assisting_ids:
+        mask |= 1 << (participant_id - 1)
+    return mask
+
+def timeline_rows(timeline_data):
+    match_id = timeline_data['metadata']['matchId']
     frames = timeline_data['info']['frames']
+    rows = []
 
     for frame in frames:
         events = frame.get('events', [])
         for event in events:
             event_type = event.get('type')
             actor_id = event.get('participantId') or event.get('killerId') or event.get('creatorId')
-            assisting_ids = event.get('assistingParticipantIds')
-            assisting_ids_str = ",".join(map(str, assisting_ids)) if assisting_ids else None
+            assisting_mask = assist_mask(event.get('assistingParticipantIds'))
             victim_id = event.get('victimId')
             ward_type = event.get('wardType')
             skill_slot = event.get('skillSlot')
@@ -91,18 +107,12 @@ def save_timeline_to_db(conn, timeline_data):
             tower_type = event.get('towerType')
             winning_team = event.get('winningTeam')
 
-            cursor.execute('''
-                INSERT INTO match_events (
-                    match_id, timestamp, type, actor_id, assisting_participant_ids, victim_id,
-                    ward_type, skill_slot, item_id, team_id, feat_type, feat_value,
-                    lane_type, monster_type, monster_sub_type, building_type, tower_type, winning_team
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            rows.append((
                 match_id,
                 event.get('timestamp'),
                 event_type,
                 actor_id,
-                assisting_ids_str,
+                assisting_mask,
                 victim_id,
                 ward_type,
                 skill_slot,
@@ -118,26 +128,247 @@ def save_timeline_to_db(conn, timeline_data):
                 winning_team
             ))
 
-    conn.commit()
+    return rows
+
+def struct_timeline_rows(timeline):
+    """ timeline_rows와 같은 행을 schemas.Timeline에서 만든다 """
+    match_id = timeline.metadata.match_id
+    return [(
+        match_id,
+        event.timestamp,
+        event.type,
+        event.participant_id or event.killer_id or event.creator_id,
+        assist_mask(event.assisting_participant_ids),
+        event.victim_id,
+        event.ward_type,
+        event.skill_slot,
+        event.item_id,
+        event.team_id or event.killer_team_id,
+        event.feat_type,
+        event.feat_value,
+        event.lane_type,
+        event.monster_type,
+        event.monster_sub_type,
+        event.building_type,
+        event.tower_type,
+        event.winning_team
+    ) for frame in timeline.info.frames for event in frame.events]
+
+def timeline_parts(timeline_data):
+    """ timeline 하나(dict 또는 schemas.Timeline) -> (match_id, 이벤트 행, match_frames 행) """
+    if isinstance(timeline_data, dict):
+        return timeline_data['metadata']['matchId'], timeline_rows(timeline_data), frame_rows(timeline_data)
+    return timeline_data.metadata.match_id, struct_timeline_rows(timeline_data), struct_frame_rows(timeline_data)
+
+def timeline_ops(timeline_data):
+    """ timeline 하나(dict 또는 schemas.Timeline)를 {sql: [params, ...]}로 펼친다 """
+    match_id, rows, frames = timeline_parts(timeline_data)
+    enums = {row[i] for row in rows for i in ENUM_COLUMNS if row[i] is not None}
+    return match_id, {
+        INSERT_MATCH_KEY_SQL: [(match_id,)],
+        INSERT_ENUM_SQL: [(value,) for value in enums],
+        DELETE_EVENTS_SQL: [(match_id,)],
+        INSERT_EVENT_SQL: rows,
+        LOG_EVENTS_SQL: [(match_id,)],
+        INSERT_FRAMES_SQL: frames,
+    }
+
+def save_timeline_to_db(conn, timeline_data, writer=None):
+    """ writer(BufferedWriter)가 주어지면 배치에 쌓고, 없으면 match 하나를 한 트랜잭션으로 바로 기록한다 """
+    match_id, ops = timeline_ops(timeline_data)
+
+    if writer is not None:
+        writer.write(match_id, ops, 'timeline')
+        return
 
-def process_all_timelines(api_key, conn):
-    requester = RateLimitedRequester(api_key)
     cursor = conn.cursor()
-    cursor.execute("SELECT match_id FROM match_summary")
-    match_ids = [row[0] for row in cursor.fetchall()]
-
-    for idx, match_id in enumerate(match_ids, 1):
-        timeline_data = fetch_timeline_data(requester, match_id)
-        if timeline_data:
-            save_timeline_to_db(conn, timeline_data)
-            print(f"[{idx}/{len(match_ids)}] match_id {match_id} timeline 저장 완료")
-        else:
+    for sql, rows in ops.items():
+        cursor.executemany(sql, rows)
+    conn.commit()
+
+def process_all_timelines(api_key, conn, concurrency=10, batch_size=200, archive=None):
+    requester = RegionalRequester(api_key)
+    archive = archive or PayloadArchive()
+    crawlstate.seed(conn, 'timeline', "SELECT match_id FROM match_summary", "SELECT match_id FROM match_keys")
+    match_ids = crawlstate.pending_ids(conn, 'timeline')
+    print(f"[INFO] 수집 대상 timeline {len(match_ids)}개 {crawlstate.summary(conn, 'timeline')}")
+
+    def handle(idx, match_id, timeline_data):
+        if not timeline_data:
+            crawlstate.mark_failed(writer, 'timeline', match_id, "timeline 요청 실패")
             print(f"[{idx}/{len(match_ids)}] match_id {match_id} timeline 저장 실패")
+            return
+        try:
+            save_timeline_to_db(conn, timeline_data, writer)
+        except Exception as e:
+            crawlstate.mark_failed(writer, 'timeline', match_id, repr(e))
+            print(f"[{idx}/{len(match_ids)}] match_id {match_id} timeline 저장 실패: {e}")
+            return
+        crawlstate.mark_done(writer, 'timeline', match_id)
+        print(f"[{idx}/{len(match_ids)}] match_id {match_id} timeline 저장 완료")
+
+    crawler = AsyncCrawler(concurrency)
+    with WriterThread(db_path(conn), batch_size) as writer:
+        crawler.run(match_ids, lambda match_id: fetch_timeline_data(requester, match_id, archive), handle,
+                    key=match_region)
+
+def rebuild_timeline_tables(conn, payloads, batch_size=200):
+    """ API 호출 없이 아카이브의 timeline payload로 match_events를 다시 채운다 """
+    saved = 0
+    with BufferedWriter(conn, batch_size) as writer:
+        for timeline_data in payloads:
+            save_timeline_to_db(conn, timeline_data, writer)
+            saved += 1
+            if saved % 1000 == 0:
+                print(f"[INFO] {saved}개 timeline 처리")
+    print(f"[INFO] 재구축 완료: {saved}개 timeline")
+    return saved
+
+def timeline_columns(timelines):
+    """
+    timeline 여러 개의 이벤트를 match_id를 뺀 행 위치(1~17)마다 array('i') 하나로 이어 붙인다 (NULL은 -1).
+    문자열 컬럼(ENUM_COLUMNS)은 chunk 안에서 처음 나온 순서의 번호로 바꾸고 그 문자열은 values에 둔다.
+    반환: (match_ids, match별 이벤트 수, match별 match_frames 행, values, 컬럼 배열 17개).
+    프로세스 사이로는 행 튜플 대신 이 배열들만 pickle된다.
+    """
+    match_ids, counts, frames, values = [], array('i'), [], {}
+    columns = [array('i') for _ in range(EVENT_COLUMNS)]
+    for timeline_data in timelines:
+        match_id, rows, match_frames = timeline_parts(timeline_data)
+        match_ids.append(match_id)
+        counts.append(len(rows))
+        frames.append(match_frames)
+        if not rows:
+            continue
+        for position, column_values in enumerate(list(zip(*rows))[1:], 1):
+            if position in ENUM_COLUMNS:
+                columns[position - 1].extend([-1 if value is None else values.setdefault(value, len(values))
+                                              for value in column_values])
+            else:
+                columns[position - 1].extend([-1 if value is None else value for value in column_values])
+    return match_ids, counts, frames, list(values), columns
+
+def column_ops(match_ids, counts, frames, values, columns):
+    """
+    timeline_columns 결과를 match마다 timeline_ops와 같은 모양의 (match_id, ops)로 되돌린다. 행은 컬럼 배열의
+    match 구간을 zip해 만들고, 문자열 번호는 values에서 꺼낸다 (-1은 끝에 붙인 None). 실패한 match만 빠지도록
+    BufferedWriter에는 match 단위로 넣는다
+    """
+    lookup = values + [None]
+    start = 0
+    for match_id, count, match_frames in zip(match_ids, counts, frames):
+        end = start + count
+        parts = [column[start:end] for column in columns]
+        codes = set().union(*(parts[i - 1] for i in ENUM_COLUMNS))
+        codes.discard(-1)
+        for i in ENUM_COLUMNS:
+            parts[i - 1] = map(lookup.__getitem__, parts[i - 1])
+        yield match_id, {
+            INSERT_MATCH_KEY_SQL: [(match_id,)],
+            INSERT_ENUM_SQL: [(values[code],) for code in codes],
+            DELETE_EVENTS_SQL: [(match_id,)],
+            INSERT_EVENT_SQL: list(zip(repeat(match_id, count), *parts)),
+            LOG_EVENTS_SQL: [(match_id,)],
+            INSERT_FRAMES_SQL: match_frames,
+        }
+        start = end
+
+def parse_timeline_objects(objects):
+    """ 프로세스 풀 worker: 아카이브 파일들을 풀고 디코딩해 timeline_columns로. sqlite는 건드리지 않는다 """
+    return timeline_columns(decode_timeline(read_object(path, codec)) for path, codec in objects)
+
+def rebuild_timeline_tables_parallel(conn, archive, batch_size=200, workers=None, chunk=50):
+    """
+    rebuild_timeline_tables와 같은 결과를, 압축 해제/JSON 디코딩/이벤트 펼치기는 프로세스 풀에서
+    chunk개씩 나눠 하고 기록은 이 프로세스의 writer 하나가 match_id 순서대로 한다. worker는 chunk마다
+    컬럼 배열(timeline_columns)을 돌려주고, writer는 그 구간을 zip한 행으로 executemany한다.
+    앞서 나가는 chunk는 worker 수의 두 배까지만 두어 메모리를 묶어 둔다.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    objects = archive.object_paths('timeline')
+    chunks = [objects[i:i + chunk] for i in range(0, len(objects), chunk)]
+    saved = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, BufferedWriter(conn, batch_size) as writer:
+        window = workers * 2
+        futures = [pool.submit(parse_timeline_objects, part) for part in chunks[:window]]
+        for i in range(len(chunks)):
+            parsed = futures[i].result()
+            futures[i] = None
+            if i + window < len(chunks):
+                futures.append(pool.submit(parse_timeline_objects, chunks[i + window]))
+            for match_id, ops in column_ops(*parsed):
+                writer.write(match_id, ops)
+            saved += len(parsed[0])
+            if saved // 1000 != (saved - len(parsed[0])) // 1000:
+                print(f"[INFO] {saved}개 timeline 처리")
+    print(f"[INFO] 재구축 완료: {saved}개 timeline, {time.perf_counter() - started:.1f}초")
+    return saved
+
+def benchmark(n_matches=2000, events_per_frame=40, n_frames=30, workers=None):
+    """ 합성 timeline 아카이브를 순차(rebuild_timeline_tables)와 프로세스 풀로 재구축하는 처리량을 비교한다 """
+    import random
+    import tempfile
+
+    def synthetic_timeline(idx):
+        frames = []
+        for f in range(n_frames):
+            events = []
+            for k in range(events_per_frame):
+                event_type = random.choice(['WARD_PLACED', 'ITEM_PURCHASED', 'CHAMPION_KILL', 'ELITE_MONSTER_KILL'])
+                event = {'type': event_type, 'timestamp': f * 60000 + k * 1000, 'participantId': random.randint(1, 10)}
+                if event_type == 'CHAMPION_KILL':
+                    event.update(killerId=random.randint(1, 10), victimId=random.randint(1, 10),
+                                 assistingParticipantIds=random.sample(range(1, 11), 3))
+                elif event_type == 'ELITE_MONSTER_KILL':
+                    event.update(killerTeamId=random.choice([100, 200]), monsterType='DRAGON',
+                                 monsterSubType='FIRE_DRAGON')
+                elif event_type == 'WARD_PLACED':
+                    event.update(creatorId=random.randint(1, 10), wardType='YELLOW_TRINKET')
+                else:
+                    event.update(itemId=random.randint(1000, 7000))
+                events.append(event)
+            participant_frames = {str(p): {'participantId': p, 'totalGold': f * 400, 'xp': f * 500, 'level': 1,
+                                           'minionsKilled': f * 7, 'position': {'x': p * 100, 'y': f * 100}}
+                                  for p in range(1, 11)}
+            frames.append({'timestamp': f * 60000, 'events': events, 'participantFrames': participant_frames})
+        return {'metadata': {'matchId': f"KR_{idx}"}, 'info': {'frameInterval': 60000, 'frames': frames}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PayloadArchive(os.path.join(tmp, 'archive'))
+        for i in range(n_matches):
+            archive.put('timeline', f"KR_{i}", json.dumps(synthetic_timeline(i)).encode())
+
+        conn = create_connection_and_table(os.path.join(tmp, 'serial.db'))
+        started = time.perf_counter()
+        rebuild_timeline_tables(conn, archive.iter_payloads('timeline', decode_timeline))
+        serial = n_matches / (time.perf_counter() - started)
+        conn.close()
+
+        conn = create_connection_and_table(os.path.join(tmp, 'parallel.db'))
+        started = time.perf_counter()
+        rebuild_timeline_tables_parallel(conn, archive, workers=workers)
+        parallel = n_matches / (time.perf_counter() - started)
+        conn.close()
+        archive.close()
+
+    print(f"[BENCH] {n_matches} timeline x {n_frames * events_per_frame} events, CPU {os.cpu_count()}개")
+    print(f"[BENCH] 순차: {serial:.0f} timeline/s, 프로세스 풀: {parallel:.0f} timeline/s")
 
 def main():
     api_key = ''
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark()
+        return
     conn = create_connection_and_table()
-    process_all_timelines(api_key, conn)
+    if len(sys.argv) > 1 and sys.argv[1] == '--rebuild':
+        # --serial: 예전처럼 한 프로세스에서 차례로 (디버깅용)
+        if '--serial' in sys.argv:
+            rebuild_timeline_tables(conn, PayloadArchive().iter_payloads('timeline', decode_timeline))
+        else:
+            rebuild_timeline_tables_parallel(conn, PayloadArchive())
+    else:
+        process_all_timelines(api_key, conn)
     conn.close()
 
 if __name__ == "__main__":
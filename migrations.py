@@ -0,0 +1,831 @@
+import sys
+
+from db import DB_NAME, connect
+
+def _version(match_id):
+    """ match_id의 game_version (match_summary가 먼저 기록된다) """
+    return f"COALESCE((SELECT game_version FROM match_summary WHERE match_id = {match_id}), '')"
+
+def _ban_slots(row, source=''):
+    """ match_bans 행의 ban1~ban10을 (match_id, champion_id) 세로 행으로. source: 트리거 밖에서 쓸 FROM 절 """
+    return ' UNION ALL '.join(
+        f"SELECT {row}.match_id AS match_id, {row}.ban{i} AS champion_id{source}" for i in range(1, 11)
+    )
+
+def _add_pick(row):
+    return f'''
+            INSERT INTO champion_pick_counts (champion_id, game_version, individual_position, champion_name, picks, wins)
+            VALUES ({row}.champion_id, {_version(f'{row}.match_id')}, COALESCE({row}.individual_position, ''),
+                    {row}.champion_name, 1, {row}.win)
+            ON CONFLICT (champion_id, game_version, individual_position) DO UPDATE SET
+                champion_name = excluded.champion_name, picks = picks + 1, wins = wins + excluded.wins;'''
+
+def _remove_pick(row):
+    return f'''
+            UPDATE champion_pick_counts SET picks = picks - 1, wins = wins - {row}.win
+            WHERE champion_id = {row}.champion_id AND game_version = {_version(f'{row}.match_id')}
+              AND individual_position = COALESCE({row}.individual_position, '');'''
+
+def _add_bans(row):
+    # INSERT ... SELECT에 ON CONFLICT를 붙일 때는 WHERE가 있어야 파싱이 모호하지 않다
+    return f'''
+            INSERT INTO champion_ban_counts (champion_id, game_version, bans)
+            SELECT champion_id, {_version(f'{row}.match_id')}, 1 FROM ({_ban_slots(row)})
+            WHERE champion_id > 0
+            ON CONFLICT (champion_id, game_version) DO UPDATE SET bans = bans + 1;'''
+
+def _remove_bans(row):
+    return f'''
+            UPDATE champion_ban_counts
+            SET bans = bans - (SELECT COUNT(*) FROM ({_ban_slots(row)}) s WHERE s.champion_id = champion_ban_counts.champion_id)
+            WHERE game_version = {_version(f'{row}.match_id')}
+              AND champion_id IN (SELECT champion_id FROM ({_ban_slots(row)}));'''
+
+def _count_match(row, delta):
+    return f'''
+            INSERT INTO champion_match_counts (game_version, matches)
+            VALUES ({_version(f'{row}.match_id')}, {delta})
+            ON CONFLICT (game_version) DO UPDATE SET matches = matches + excluded.matches;'''
+
+def _move_match(match_id, old_version, new_version):
+    """
+    match 하나의 픽/승/밴/match 수를 old_version 칸에서 new_version 칸으로 옮긴다 (match_summary 트리거).
+    upsert는 match_summary를 먼저 쓰므로, 그 뒤의 participants/bans 트리거가 새 버전 칸에서 OLD 행을 빼게 된다
+    """
+    participants = f"FROM match_participants p WHERE p.match_id = {match_id}"
+    same_pick = ("p.champion_id = champion_pick_counts.champion_id"
+                 " AND COALESCE(p.individual_position, '') = champion_pick_counts.individual_position")
+    bans = _ban_slots('b', f' FROM match_bans b WHERE b.match_id = {match_id}')
+    return f'''
+            UPDATE champion_pick_counts
+            SET picks = picks - (SELECT COUNT(*) {participants} AND {same_pick}),
+                wins = wins - (SELECT SUM(p.win) {participants} AND {same_pick})
+            WHERE game_version = {old_version}
+              AND (champion_id, individual_position) IN
+                  (SELECT p.champion_id, COALESCE(p.individual_position, '') {participants});
+            INSERT INTO champion_pick_counts (champion_id, game_version, individual_position, champion_name, picks, wins)
+            SELECT p.champion_id, {new_version}, COALESCE(p.individual_position, ''),
+                   MAX(p.champion_name), COUNT(*), SUM(p.win)
+            {participants}
+            GROUP BY 1, 2, 3
+            ON CONFLICT (champion_id, game_version, individual_position) DO UPDATE SET
+                champion_name = excluded.champion_name, picks = picks + excluded.picks, wins = wins + excluded.wins;
+            UPDATE champion_ban_counts
+            SET bans = bans - (SELECT COUNT(*) FROM ({bans}) s WHERE s.champion_id = champion_ban_counts.champion_id)
+            WHERE game_version = {old_version} AND champion_id IN (SELECT champion_id FROM ({bans}));
+            INSERT INTO champion_ban_counts (champion_id, game_version, bans)
+            SELECT champion_id, {new_version}, COUNT(*) FROM ({bans})
+            WHERE champion_id > 0
+            GROUP BY 1, 2
+            ON CONFLICT (champion_id, game_version) DO UPDATE SET bans = bans + excluded.bans;
+            UPDATE champion_match_counts SET matches = matches - 1
+            WHERE game_version = {old_version} AND EXISTS (SELECT 1 FROM match_bans b WHERE b.match_id = {match_id});
+            INSERT INTO champion_match_counts (game_version, matches)
+            SELECT {new_version}, 1 FROM match_bans b WHERE b.match_id = {match_id}
+            ON CONFLICT (game_version) DO UPDATE SET matches = matches + excluded.matches;'''
+
+def _log_change(table, match_id):
+    """ table에서 match_id의 행이 바뀌었다고 match_changes에 적는다. seq는 테이블마다 1씩 늘어난다 """
+    return f'''
+            INSERT INTO match_changes (table_name, match_id, seq)
+            VALUES ('{table}', {match_id},
+                    (SELECT COALESCE(MAX(seq), 0) + 1 FROM match_changes WHERE table_name = '{table}'))
+            ON CONFLICT (table_name, match_id) DO UPDATE SET seq = excluded.seq;'''
+
+def _change_triggers(table, match_id='{row}.match_id'):
+    """ table의 INSERT/UPDATE/DELETE마다 _log_change를 부르는 트리거 세 개. match_id: 행에서 match_id를 꺼내는 식 """
+    return [
+        f'''
+        CREATE TRIGGER {table}_changes_{op.lower()} AFTER {op} ON {table}
+        BEGIN
+            {_log_change(table, match_id.format(row=row))}
+        END
+        '''
+        for op, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+    ]
+
+# 카운터에서 챔피언별 픽/승/밴 수와 비율을 읽는다 (O(챔피언 수)). 필터는 "AND game_version = ?" 형태.
+# 밴 비율 = 밴 수 / 팀 수(match x 2). 한 팀은 같은 챔피언을 한 번만 밴할 수 있다.
+# ChampionAnalyzer.pick_ban_stats가 실행 시점에 쓴다. 마이그레이션의 뷰는 배포된 SQL을 그대로 적어 두므로
+# 이 쿼리를 바꿔도 지난 버전이 바뀌지 않는다 (뷰까지 바꾸려면 새 버전을 추가한다).
+PICK_BAN_STATS_SQL = '''
+        WITH picks AS (
+            SELECT champion_id, MAX(champion_name) AS champion_name, SUM(picks) AS picks, SUM(wins) AS wins
+            FROM champion_pick_counts WHERE 1 = 1 {pick_filter}
+            GROUP BY champion_id
+        ),
+        bans AS (
+            SELECT champion_id, SUM(bans) AS bans
+            FROM champion_ban_counts WHERE 1 = 1 {ban_filter}
+            GROUP BY champion_id
+        ),
+        totals AS (
+            SELECT (SELECT SUM(picks) FROM picks) AS players,
+                   (SELECT SUM(matches) FROM champion_match_counts WHERE 1 = 1 {ban_filter}) AS matches
+        )
+        SELECT p.champion_id,
+               p.champion_name,
+               p.picks AS "Pick Count",
+               p.wins AS "Win Count",
+               100.0 * p.picks / t.players AS "Pick Rate (%)",
+               100.0 * p.wins / p.picks AS "Win Rate (%)",
+               COALESCE(b.bans, 0) AS "Ban Count",
+               COALESCE(100.0 * b.bans / (2 * t.matches), 0) AS "Ban Rate (%)"
+        FROM picks p
+        CROSS JOIN totals t
+        LEFT JOIN bans b ON b.champion_id = p.champion_id
+        WHERE p.picks > 0
+        ORDER BY p.champion_id
+'''
+
+# (버전, 설명, SQL 목록) - 한 번 배포된 항목은 수정하지 말고 새 버전을 뒤에 추가한다
+MIGRATIONS = [
+    (1, "초기 스키마", [
+        '''
+        CREATE TABLE IF NOT EXISTS challenger_puuid (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            puuid TEXT UNIQUE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS challenger_matchid (
+            match_id TEXT PRIMARY KEY
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS match_summary(
+            match_id TEXT PRIMARY KEY,
+            game_mode TEXT,
+            game_version TEXT,
+            game_type TEXT,
+            map_id INTEGER,
+            queue_id INTEGER,
+            game_duration INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS match_participants(
+            match_id TEXT,
+            puuid TEXT,
+            riot_id_game_name TEXT,
+            champion_name TEXT,
+            champion_id INTEGER,
+            individual_position TEXT,
+            lane TEXT,
+            item0 INTEGER,
+            item1 INTEGER,
+            item2 INTEGER,
+            item3 INTEGER,
+            item4 INTEGER,
+            item5 INTEGER,
+            item6 INTEGER,
+            kills INTEGER,
+            deaths INTEGER,
+            assists INTEGER,
+            all_in_pings INTEGER,
+            assist_me_pings INTEGER,
+            basic_pings INTEGER,
+            command_pings INTEGER,
+            danger_pings INTEGER,
+            enemy_vision_pings INTEGER,
+            enemy_missing_pings INTEGER,
+            get_back_pings INTEGER,
+            hold_pings INTEGER,
+            need_vision_pings INTEGER,
+            retreat_pings INTEGER,
+            on_my_way_pings INTEGER,
+            push_pings INTEGER,
+            vision_cleared_pings INTEGER,
+            detector_wards_placed INTEGER,
+            wards_killed INTEGER,
+            ward_placed INTEGER,
+            vision_score INTEGER,
+            win INTEGER,
+            PRIMARY KEY (match_id, puuid)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS match_teams(
+            match_id TEXT,
+            team_id INTEGER,
+            win INTEGER,
+            feats_epic_monster_kill INTEGER,
+            feats_first_blood INTEGER,
+            feats_first_turret INTEGER,
+            champion_first INTEGER,
+            champion_kill INTEGER,
+            dragon_first INTEGER,
+            dragon_kill INTEGER,
+            horde_first INTEGER,
+            horde_kill INTEGER,
+            rift_herald_first INTEGER,
+            rift_herald_kill INTEGER,
+            atakhan_first INTEGER,
+            atakhan_kill INTEGER,
+            baron_first INTEGER,
+            baron_kill INTEGER,
+            tower_first INTEGER,
+            tower_kill INTEGER,
+            inhibitor_first INTEGER,
+            inhibitor_kill INTEGER,
+            PRIMARY KEY (match_id, team_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS match_bans(
+            match_id TEXT PRIMARY KEY,
+            ban1 INTEGER,
+            ban2 INTEGER,
+            ban3 INTEGER,
+            ban4 INTEGER,
+            ban5 INTEGER,
+            ban6 INTEGER,
+            ban7 INTEGER,
+            ban8 INTEGER,
+            ban9 INTEGER,
+            ban10 INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS match_events (
+            match_id TEXT,
+            timestamp INTEGER,
+            type TEXT,
+            actor_id INTEGER,
+            assisting_participant_ids TEXT,
+            victim_id INTEGER,
+            ward_type TEXT,
+            skill_slot INTEGER,
+            item_id INTEGER,
+            team_id INTEGER,
+            feat_type TEXT,
+            feat_value INTEGER,
+            lane_type TEXT,
+            monster_type TEXT,
+            monster_sub_type TEXT,
+            building_type TEXT,
+            tower_type TEXT,
+            winning_team INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS crawl_state (
+            stage TEXT,
+            match_id TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at INTEGER DEFAULT 0,
+            updated_at INTEGER,
+            PRIMARY KEY (stage, match_id)
+        )
+        ''',
+    ]),
+    (2, "match_events 기본키(event_id) 추가, 분석 쿼리용 인덱스", [
+        '''
+        CREATE TABLE match_events_v2 (
+            event_id INTEGER PRIMARY KEY,
+            match_id TEXT,
+            timestamp INTEGER,
+            type TEXT,
+            actor_id INTEGER,
+            assisting_participant_ids TEXT,
+            victim_id INTEGER,
+            ward_type TEXT,
+            skill_slot INTEGER,
+            item_id INTEGER,
+            team_id INTEGER,
+            feat_type TEXT,
+            feat_value INTEGER,
+            lane_type TEXT,
+            monster_type TEXT,
+            monster_sub_type TEXT,
+            building_type TEXT,
+            tower_type TEXT,
+            winning_team INTEGER
+        )
+        ''',
+        # match별로 모이도록 정렬해서 옮긴다
+        '''
+        INSERT INTO match_events_v2 (
+            match_id, timestamp, type, actor_id, assisting_participant_ids, victim_id,
+            ward_type, skill_slot, item_id, team_id, feat_type, feat_value,
+            lane_type, monster_type, monster_sub_type, building_type, tower_type, winning_team
+        )
+        SELECT match_id, timestamp, type, actor_id, assisting_participant_ids, victim_id,
+               ward_type, skill_slot, item_id, team_id, feat_type, feat_value,
+               lane_type, monster_type, monster_sub_type, building_type, tower_type, winning_team
+        FROM match_events
+        ORDER BY match_id, timestamp
+        ''',
+        "DROP TABLE match_events",
+        "ALTER TABLE match_events_v2 RENAME TO match_events",
+        # 분석기: WHERE type = ? ORDER BY match_id, timestamp
+        "CREATE INDEX IF NOT EXISTS idx_match_events_type_match_ts ON match_events (type, match_id, timestamp)",
+        # save_timeline_to_db: DELETE ... WHERE match_id = ?
+        "CREATE INDEX IF NOT EXISTS idx_match_events_match ON match_events (match_id, timestamp)",
+        # crawlstate.pending_ids
+        "CREATE INDEX IF NOT EXISTS idx_crawl_state_status ON crawl_state (stage, status, next_attempt_at)",
+    ]),
+    (3, "match_events 압축 저장: match_key 대리키, 문자열 사전, 어시스트 비트마스크, 호환 뷰", [
+        '''
+        CREATE TABLE match_keys (
+            match_key INTEGER PRIMARY KEY,
+            match_id TEXT UNIQUE
+        )
+        ''',
+        # type, ward_type, lane_type, monster_type, monster_sub_type, building_type, tower_type 공용 사전
+        '''
+        CREATE TABLE event_enums (
+            enum_id INTEGER PRIMARY KEY,
+            value TEXT UNIQUE
+        )
+        ''',
+        # 이벤트 종류마다 쓰는 컬럼만 값이 있고 나머지는 NULL(레코드 헤더 1바이트)로 남는다
+        '''
+        CREATE TABLE match_events_compact (
+            event_id INTEGER PRIMARY KEY,
+            match_key INTEGER,
+            timestamp INTEGER,
+            type_id INTEGER,
+            actor_id INTEGER,
+            assist_mask INTEGER,
+            victim_id INTEGER,
+            ward_type_id INTEGER,
+            skill_slot INTEGER,
+            item_id INTEGER,
+            team_id INTEGER,
+            feat_type INTEGER,
+            feat_value INTEGER,
+            lane_type_id INTEGER,
+            monster_type_id INTEGER,
+            monster_sub_type_id INTEGER,
+            building_type_id INTEGER,
+            tower_type_id INTEGER,
+            winning_team INTEGER
+        )
+        ''',
+        "INSERT INTO match_keys (match_id) SELECT DISTINCT match_id FROM match_events ORDER BY match_id",
+        '''
+        INSERT OR IGNORE INTO event_enums (value)
+        SELECT value FROM (
+            SELECT type AS value FROM match_events
+            UNION SELECT ward_type FROM match_events
+            UNION SELECT lane_type FROM match_events
+            UNION SELECT monster_type FROM match_events
+            UNION SELECT monster_sub_type FROM match_events
+            UNION SELECT building_type FROM match_events
+            UNION SELECT tower_type FROM match_events
+        )
+        WHERE value IS NOT NULL
+        ORDER BY value
+        ''',
+        '''
+        INSERT INTO match_events_compact (
+            event_id, match_key, timestamp, type_id, actor_id, assist_mask, victim_id,
+            ward_type_id, skill_slot, item_id, team_id, feat_type, feat_value,
+            lane_type_id, monster_type_id, monster_sub_type_id, building_type_id, tower_type_id, winning_team
+        )
+        SELECT e.event_id,
+               (SELECT match_key FROM match_keys WHERE match_id = e.match_id),
+               e.timestamp,
+               (SELECT enum_id FROM event_enums WHERE value = e.type),
+               e.actor_id,
+               (SELECT sum(1 << (value - 1)) FROM json_each('[' || e.assisting_participant_ids || ']')),
+               e.victim_id,
+               (SELECT enum_id FROM event_enums WHERE value = e.ward_type),
+               e.skill_slot,
+               e.item_id,
+               e.team_id,
+               CAST(e.feat_type AS INTEGER),
+               e.feat_value,
+               (SELECT enum_id FROM event_enums WHERE value = e.lane_type),
+               (SELECT enum_id FROM event_enums WHERE value = e.monster_type),
+               (SELECT enum_id FROM event_enums WHERE value = e.monster_sub_type),
+               (SELECT enum_id FROM event_enums WHERE value = e.building_type),
+               (SELECT enum_id FROM event_enums WHERE value = e.tower_type),
+               e.winning_team
+        FROM match_events e
+        ORDER BY e.event_id
+        ''',
+        "DROP TABLE match_events",
+        "CREATE INDEX idx_match_events_compact_type ON match_events_compact (type_id, match_key, timestamp)",
+        "CREATE INDEX idx_match_events_compact_match ON match_events_compact (match_key, timestamp)",
+        # 기존 분석 SQL이 그대로 동작하도록 예전 컬럼 이름/형태를 돌려주는 읽기 전용 뷰
+        '''
+        CREATE VIEW match_events AS
+        SELECT e.event_id,
+               k.match_id,
+               e.timestamp,
+               t.value AS type,
+               e.actor_id,
+               NULLIF(rtrim(
+                   CASE WHEN e.assist_mask & 1 THEN '1,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 2 THEN '2,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 4 THEN '3,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 8 THEN '4,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 16 THEN '5,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 32 THEN '6,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 64 THEN '7,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 128 THEN '8,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 256 THEN '9,' ELSE '' END ||
+                   CASE WHEN e.assist_mask & 512 THEN '10,' ELSE '' END,
+                   ','), '') AS assisting_participant_ids,
+               e.victim_id,
+               (SELECT value FROM event_enums WHERE enum_id = e.ward_type_id) AS ward_type,
+               e.skill_slot,
+               e.item_id,
+               e.team_id,
+               e.feat_type,
+               e.feat_value,
+               (SELECT value FROM event_enums WHERE enum_id = e.lane_type_id) AS lane_type,
+               (SELECT value FROM event_enums WHERE enum_id = e.monster_type_id) AS monster_type,
+               (SELECT value FROM event_enums WHERE enum_id = e.monster_sub_type_id) AS monster_sub_type,
+               (SELECT value FROM event_enums WHERE enum_id = e.building_type_id) AS building_type,
+               (SELECT value FROM event_enums WHERE enum_id = e.tower_type_id) AS tower_type,
+               e.winning_team
+        FROM match_events_compact e
+        JOIN match_keys k ON k.match_key = e.match_key
+        JOIN event_enums t ON t.enum_id = e.type_id
+        ''',
+    ]),
+    (4, "챔피언 픽/승/밴 카운터 테이블과 트리거 (수집 트랜잭션 안에서 증분 갱신)", [
+        # game_version/position이 없으면 ''로 둔다 (NULL은 기본키 충돌로 합쳐지지 않는다)
+        '''
+        CREATE TABLE champion_pick_counts (
+            champion_id INTEGER,
+            game_version TEXT,
+            individual_position TEXT,
+            champion_name TEXT,
+            picks INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (champion_id, game_version, individual_position)
+        )
+        ''',
+        # ban1~ban10 중 championId > 0 인 슬롯만 센다 (-1/0은 밴 없음)
+        '''
+        CREATE TABLE champion_ban_counts (
+            champion_id INTEGER,
+            game_version TEXT,
+            bans INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (champion_id, game_version)
+        )
+        ''',
+        # 밴 비율의 분모: match_bans 행(=match) 수
+        '''
+        CREATE TABLE champion_match_counts (
+            game_version TEXT PRIMARY KEY,
+            matches INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        f'''
+        INSERT INTO champion_pick_counts (champion_id, game_version, individual_position, champion_name, picks, wins)
+        SELECT p.champion_id, {_version('p.match_id')}, COALESCE(p.individual_position, ''),
+               MAX(p.champion_name), COUNT(*), SUM(p.win)
+        FROM match_participants p
+        GROUP BY 1, 2, 3
+        ''',
+        f'''
+        INSERT INTO champion_ban_counts (champion_id, game_version, bans)
+        SELECT s.champion_id, {_version('s.match_id')}, COUNT(*)
+        FROM ({_ban_slots('match_bans', ' FROM match_bans')}) s
+        WHERE s.champion_id > 0
+        GROUP BY 1, 2
+        ''',
+        f'''
+        INSERT INTO champion_match_counts (game_version, matches)
+        SELECT {_version('b.match_id')}, COUNT(*) FROM match_bans b GROUP BY 1
+        ''',
+        f'''
+        CREATE TRIGGER champion_pick_counts_insert AFTER INSERT ON match_participants
+        BEGIN
+            {_add_pick('NEW')}
+        END
+        ''',
+        # upsert(ON CONFLICT DO UPDATE)로 다시 수집된 행은 OLD를 빼고 NEW를 더한다
+        f'''
+        CREATE TRIGGER champion_pick_counts_update
+        AFTER UPDATE OF champion_id, champion_name, individual_position, win ON match_participants
+        BEGIN
+            {_remove_pick('OLD')}
+            {_add_pick('NEW')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER champion_pick_counts_delete AFTER DELETE ON match_participants
+        BEGIN
+            {_remove_pick('OLD')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER champion_ban_counts_insert AFTER INSERT ON match_bans
+        BEGIN
+            {_add_bans('NEW')}
+            {_count_match('NEW', 1)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER champion_ban_counts_update AFTER UPDATE ON match_bans
+        BEGIN
+            {_remove_bans('OLD')}
+            {_add_bans('NEW')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER champion_ban_counts_delete AFTER DELETE ON match_bans
+        BEGIN
+            {_remove_bans('OLD')}
+            {_count_match('OLD', -1)}
+        END
+        ''',
+        # 예전에 ChampionAnalyzer가 통째로 다시 쓰던 결과 테이블 자리를 카운터 위의 뷰가 대신한다
+        "DROP TABLE IF EXISTS champion_pick_ban_stats",
+        '''
+        CREATE VIEW champion_pick_ban_stats AS
+        WITH picks AS (
+            SELECT champion_id, MAX(champion_name) AS champion_name, SUM(picks) AS picks, SUM(wins) AS wins
+            FROM champion_pick_counts
+            GROUP BY champion_id
+        ),
+        bans AS (
+            SELECT champion_id, SUM(bans) AS bans
+            FROM champion_ban_counts
+            GROUP BY champion_id
+        ),
+        totals AS (
+            SELECT (SELECT SUM(picks) FROM picks) AS players,
+                   (SELECT SUM(matches) FROM champion_match_counts) AS matches
+        )
+        SELECT p.champion_id,
+               p.champion_name,
+               p.picks AS "Pick Count",
+               p.wins AS "Win Count",
+               100.0 * p.picks / t.players AS "Pick Rate (%)",
+               100.0 * p.wins / p.picks AS "Win Rate (%)",
+               COALESCE(b.bans, 0) AS "Ban Count",
+               COALESCE(100.0 * b.bans / t.matches, 0) AS "Ban Rate (%)"
+        FROM picks p
+        CROSS JOIN totals t
+        LEFT JOIN bans b ON b.champion_id = p.champion_id
+        WHERE p.picks > 0
+        ORDER BY p.champion_id
+        ''',
+    ]),
+    (5, "champion_pick_ban_stats 밴 비율 분모를 팀 수(match x 2)로", [
+        "DROP VIEW champion_pick_ban_stats",
+        '''
+        CREATE VIEW champion_pick_ban_stats AS
+        WITH picks AS (
+            SELECT champion_id, MAX(champion_name) AS champion_name, SUM(picks) AS picks, SUM(wins) AS wins
+            FROM champion_pick_counts
+            GROUP BY champion_id
+        ),
+        bans AS (
+            SELECT champion_id, SUM(bans) AS bans
+            FROM champion_ban_counts
+            GROUP BY champion_id
+        ),
+        totals AS (
+            SELECT (SELECT SUM(picks) FROM picks) AS players,
+                   (SELECT SUM(matches) FROM champion_match_counts) AS matches
+        )
+        SELECT p.champion_id,
+               p.champion_name,
+               p.picks AS "Pick Count",
+               p.wins AS "Win Count",
+               100.0 * p.picks / t.players AS "Pick Rate (%)",
+               100.0 * p.wins / p.picks AS "Win Rate (%)",
+               COALESCE(b.bans, 0) AS "Ban Count",
+               COALESCE(100.0 * b.bans / (2 * t.matches), 0) AS "Ban Rate (%)"
+        FROM picks p
+        CROSS JOIN totals t
+        LEFT JOIN bans b ON b.champion_id = p.champion_id
+        WHERE p.picks > 0
+        ORDER BY p.champion_id
+        ''',
+    ]),
+    # 기존 행은 NULL로 남는다 (원본 아카이브에서 match.py --rebuild로 채울 수 있다)
+    (6, "match_summary.game_creation (columnar export의 날짜 파티션)", [
+        "ALTER TABLE match_summary ADD COLUMN game_creation INTEGER",
+    ]),
+    # 지금까지는 KR 챌린저만 모았다
+    (7, "challenger_puuid.platform (지역별 수집)", [
+        "ALTER TABLE challenger_puuid ADD COLUMN platform TEXT NOT NULL DEFAULT 'KR'",
+    ]),
+    (8, "crawl_state 우선순위 (pipeline.py 작업 큐)", [
+        "ALTER TABLE crawl_state ADD COLUMN priority INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX idx_crawl_state_runnable ON crawl_state (status, next_attempt_at)",
+    ]),
+    (9, "challenger_puuid.last_seen_at (match ID 증분 조회 high-water mark)", [
+        "ALTER TABLE challenger_puuid ADD COLUMN last_seen_at INTEGER",
+    ]),
+    # 이미 받은 timeline의 프레임은 원본 아카이브에서 matchtime.py --rebuild로 채운다
+    (10, "match_frames: participantFrames를 match마다 int32 BLOB 하나로 (frames.py)", [
+        '''
+        CREATE TABLE match_frames (
+            match_key INTEGER PRIMARY KEY,
+            n_frames INTEGER,
+            frame_interval INTEGER,
+            data BLOB
+        )
+        ''',
+    ]),
+    # v4 트리거는 match_summary의 현재 game_version으로 칸을 찾아서, 버전이 바뀐 upsert가 OLD 행을 새 버전 칸에서 뺐다.
+    # 버전이 바뀌면 match_summary 트리거가 그 match의 카운트를 먼저 옮기고, 이미 어긋난 카운터는 원본에서 다시 센다
+    (11, "match_summary game_version 변경 시 챔피언 카운터를 버전 칸 사이로 옮기는 트리거, 카운터 재계산", [
+        f'''
+        CREATE TRIGGER champion_counts_version_update
+        AFTER UPDATE OF game_version ON match_summary
+        WHEN COALESCE(OLD.game_version, '') <> COALESCE(NEW.game_version, '')
+        BEGIN
+            {_move_match('NEW.match_id', "COALESCE(OLD.game_version, '')", "COALESCE(NEW.game_version, '')")}
+        END
+        ''',
+        # match_summary보다 먼저 들어온 participants/bans는 '' 칸에 세어져 있다
+        f'''
+        CREATE TRIGGER champion_counts_version_insert
+        AFTER INSERT ON match_summary
+        WHEN COALESCE(NEW.game_version, '') <> ''
+        BEGIN
+            {_move_match('NEW.match_id', "''", 'NEW.game_version')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER champion_counts_version_delete
+        AFTER DELETE ON match_summary
+        WHEN COALESCE(OLD.game_version, '') <> ''
+        BEGIN
+            {_move_match('OLD.match_id', 'OLD.game_version', "''")}
+        END
+        ''',
+        "DELETE FROM champion_pick_counts",
+        "DELETE FROM champion_ban_counts",
+        "DELETE FROM champion_match_counts",
+        f'''
+        INSERT INTO champion_pick_counts (champion_id, game_version, individual_position, champion_name, picks, wins)
+        SELECT p.champion_id, {_version('p.match_id')}, COALESCE(p.individual_position, ''),
+               MAX(p.champion_name), COUNT(*), SUM(p.win)
+        FROM match_participants p
+        GROUP BY 1, 2, 3
+        ''',
+        f'''
+        INSERT INTO champion_ban_counts (champion_id, game_version, bans)
+        SELECT s.champion_id, {_version('s.match_id')}, COUNT(*)
+        FROM ({_ban_slots('match_bans', ' FROM match_bans')}) s
+        WHERE s.champion_id > 0
+        GROUP BY 1, 2
+        ''',
+        f'''
+        INSERT INTO champion_match_counts (game_version, matches)
+        SELECT {_version('b.match_id')}, COUNT(*) FROM match_bans b GROUP BY 1
+        ''',
+    ]),
+    # 다시 수집한 match(upsert, timeline 재저장)는 rowid가 그대로라 행 수/MAX(rowid)로는 변화를 알 수 없다.
+    # columnar export는 테이블마다 마지막으로 내보낸 seq 이후에 바뀐 match만, resultcache는 테이블별 MAX(seq)를 본다.
+    # match_events_compact는 match마다 행이 수백 개라 행 트리거가 timeline 기록을 40% 넘게 늦춰서,
+    # matchtime.LOG_EVENTS_SQL이 timeline마다 한 번 적는다
+    (12, "match_changes: 테이블/match별 마지막 변경 순번 (트리거)", [
+        '''
+        CREATE TABLE match_changes (
+            table_name TEXT,
+            match_id TEXT,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (table_name, match_id)
+        )
+        ''',
+        "CREATE INDEX idx_match_changes_seq ON match_changes (table_name, seq)",
+        *_change_triggers('match_summary'),
+        *_change_triggers('match_participants'),
+        *_change_triggers('match_teams'),
+        *_change_triggers('match_bans'),
+        *_change_triggers('match_frames', '(SELECT match_id FROM match_keys WHERE match_key = {row}.match_key)'),
+    ]),
+]
+
+# EXPLAIN QUERY PLAN으로 인덱스 사용을 확인할 쿼리 (분석기/수집기에서 실제로 쓰는 형태)
+INDEXED_QUERIES = {
+    'FeatAnalyzer.load_events': '''
+        SELECT k.match_id, e.team_id, e.feat_type, e.feat_value, e.timestamp
+        FROM match_events_compact e
+        JOIN match_keys k ON k.match_key = e.match_key
+        WHERE e.type_id = (SELECT enum_id FROM event_enums WHERE value = 'FEAT_UPDATE')
+        ORDER BY e.match_key, e.timestamp ASC
+    ''',
+    'EpicMonsterAnalyzer.sub_type_winrates': '''
+        SELECT e.monster_sub_type, SUM(t.win) AS wins, COUNT(*) AS total
+        FROM match_events e
+        JOIN match_teams t ON t.match_id = e.match_id AND t.team_id = e.team_id
+        WHERE e.type = 'ELITE_MONSTER_KILL' AND e.monster_type = 'DRAGON'
+        GROUP BY e.monster_sub_type
+    ''',
+    'save_timeline_to_db (DELETE)': '''
+        SELECT event_id FROM match_events_compact
+        WHERE match_key = (SELECT match_key FROM match_keys WHERE match_id = 'KR_1')
+    ''',
+    'match_teams join': "SELECT win FROM match_teams WHERE match_id = 'KR_1' AND team_id = 100",
+    'crawlstate.pending_ids': '''
+        SELECT match_id FROM crawl_state
+        WHERE stage = 'match' AND status = 'pending'
+    ''',
+    'columnar.changed_matches': '''
+        SELECT match_id FROM match_changes
+        WHERE table_name = 'match_participants' AND seq > 10 AND seq <= 20
+    ''',
+    'crawlstate.runnable_jobs': '''
+        SELECT stage, match_id, priority FROM crawl_state
+        WHERE status = 'pending' OR (status = 'failed' AND attempts < 5 AND next_attempt_at <= 0)
+    ''',
+}
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, until=None):
+    """ 현재 user_version 이후의 마이그레이션을 (until 버전까지) 버전마다 한 트랜잭션으로 적용한다 """
+    version = schema_version(conn)
+    for target, description, statements in MIGRATIONS:
+        if target <= version or (until is not None and target > until):
+            continue
+        conn.execute("BEGIN")
+        try:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"[MIGRATE] v{target}: {description}")
+    return schema_version(conn)
+
+def query_plan(conn, sql):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+# 임시 정렬을 허용하는 쿼리와 그 단계. sub_type_winrates는 뷰가 사전에서 꺼낸 문자열로 묶는 집계라
+# 인덱스 순서로 읽을 수 없다. 정렬되는 행은 조건을 통과한 용 처치(match당 몇 개)뿐이고 그룹은 용 종류 수만큼이다
+TEMP_BTREE_ALLOWED = {
+    'EpicMonsterAnalyzer.sub_type_winrates': 'USE TEMP B-TREE FOR GROUP BY',
+}
+
+def check_query_plans(conn):
+    """ 인덱스 없이 테이블 전체를 스캔하거나 임시 정렬하는 쿼리가 있으면 AssertionError (TEMP_BTREE_ALLOWED 제외) """
+    for name, sql in INDEXED_QUERIES.items():
+        plan = query_plan(conn, sql)
+        for step in plan:
+            full_scan = step.startswith('SCAN') and 'INDEX' not in step
+            temp_sort = 'TEMP B-TREE' in step and step != TEMP_BTREE_ALLOWED.get(name)
+            assert not full_scan and not temp_sort, f"{name}: {plan}"
+        print(f"[PLAN] {name}: {' / '.join(plan)}")
+
+def storage_report(db_name=DB_NAME):
+    """ DB 복사본을 v2(문자열 행)와 v3(압축)로 만들어 VACUUM 후 파일 크기와 분석 쿼리 스캔 시간을 비교한다 """
+    import os
+    import sqlite3
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.db')
+        src = sqlite3.connect(db_name)
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+
+        conn = connect(path)
+        if schema_version(conn) >= 3:
+            print("[INFO] 이미 v3 이상인 DB라 비교할 이전 형태가 없습니다.")
+            conn.close()
+            return
+
+        for until in (2, 3):
+            migrate(conn, until)
+            conn.execute("VACUUM")
+            size = os.path.getsize(path)
+            print(f"[REPORT] v{until}: {size / 1024 / 1024:.1f} MB")
+            # v2에는 압축 테이블이 없으므로 두 버전 모두에 있는 match_events(v3부터 뷰) 이름으로 읽는다
+            queries = {
+                'FEAT_UPDATE': '''
+                    SELECT match_id, team_id, feat_type, feat_value, timestamp FROM match_events
+                    WHERE type = 'FEAT_UPDATE' ORDER BY match_id, timestamp
+                ''',
+                'EpicMonsterAnalyzer.sub_type_winrates': INDEXED_QUERIES['EpicMonsterAnalyzer.sub_type_winrates'],
+            }
+            for name, sql in queries.items():
+                started = time.perf_counter()
+                rows = len(conn.execute(sql).fetchall())
+                print(f"[REPORT]   {name}: {rows}행, {time.perf_counter() - started:.3f}초")
+            started = time.perf_counter()
+            rows = len(conn.execute("SELECT * FROM match_events").fetchall())
+            print(f"[REPORT]   전체 스캔: {rows}행, {time.perf_counter() - started:.3f}초")
+        conn.close()
+
+if __name__ == "__main__":
+    db_name = sys.argv[1] if len(sys.argv) > 1 else DB_NAME
+    if '--report' in sys.argv:
+        storage_report(db_name)
+    else:
+        conn = connect(db_name)
+        print(f"[INFO] 스키마 버전 v{migrate(conn)}")
+        check_query_plans(conn)
+        conn.close()
@@ -1,63 +1,114 @@
-import sqlite3
 import pandas as pd
 import matplotlib.pyplot as plt
 
+import columnar
+from chunks import read_chunks
+from db import connect
+from resultcache import cached
+
+PING_COLUMNS = [
+    'all_in_pings', 'assist_me_pings', 'basic_pings', 'command_pings', 'danger_pings',
+    'enemy_missing_pings', 'enemy_vision_pings', 'get_back_pings', 'hold_pings',
+    'need_vision_pings', 'on_my_way_pings', 'push_pings', 'vision_cleared_pings'
+]
+
+PING_BINS = [0, 10, 20, 30, 40, 50, 100, 9999]  # 핑 사용량 구간
+PING_LABELS = ['0-10', '10-20', '20-30', '30-40', '40-50', '50-100', '100+']
+
+PARTICIPANT_PING_COLUMNS = ['match_id', 'puuid', 'win', *PING_COLUMNS]
+
+PARTICIPANT_PINGS_SQL = f"""
+SELECT {', '.join(PARTICIPANT_PING_COLUMNS)}
+FROM match_participants
+"""
+
 class PingAnalyzer:
-    def __init__(self, db_path):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path, chunksize=None, parquet_root=None, result_cache=None):
+        """
+        chunksize를 주면 match_participants를 chunksize행씩 읽어 부분 집계를 더한다 (결과는 같다).
+        parquet_root를 주면 SQLite 대신 columnar.export로 내보낸 Parquet에서 필요한 컬럼만 읽는다.
+        result_cache(resultcache.ResultCache)를 주면 match_participants가 그대로인 동안 ping_stats()를 다시 계산하지 않는다.
+        """
+        self.conn = connect(db_path, readonly=True)
+        self.chunksize = chunksize
+        self.parquet_root = parquet_root
+        self.result_cache = result_cache
 
     def load_match_participants(self):
-        query = """
-        SELECT match_id, puuid, win,
-               all_in_pings, assist_me_pings, basic_pings, command_pings, danger_pings,
-               enemy_missing_pings, enemy_vision_pings, get_back_pings, hold_pings,
-               need_vision_pings, on_my_way_pings, push_pings, vision_cleared_pings
-        FROM match_participants
-        """
-        df = pd.read_sql_query(query, self.conn)
+        if self.parquet_root is not None:
+            return columnar.read_table('match_participants', PARTICIPANT_PING_COLUMNS, root=self.parquet_root)
+        df = pd.read_sql_query(PARTICIPANT_PINGS_SQL, self.conn)
         return df
 
+    def participant_chunks(self):
+        if self.parquet_root is not None:
+            return columnar.iter_batches('match_participants', PARTICIPANT_PING_COLUMNS, self.chunksize,
+                                         root=self.parquet_root)
+        return read_chunks(self.conn, PARTICIPANT_PINGS_SQL, chunksize=self.chunksize)
+
+    def ping_partials(self, df, ping_columns):
+        """ ping 종류별 합계와 총 ping 구간별 (승리 수, 인원). chunk끼리 더할 수 있다 """
+        total_pings = df[ping_columns].sum(axis=1)
+        ping_bin = pd.cut(total_pings, bins=PING_BINS, labels=PING_LABELS, right=False)
+        by_bin = df.groupby(ping_bin, observed=False)['win'].agg(['sum', 'count'])
+        return df[ping_columns].sum(), by_bin
+
+    def ping_stats(self, df=None, ping_columns=PING_COLUMNS):
+        """ (ping 종류별 사용량, 총 ping 구간별 승률 %). df를 주면 캐시 없이 그 df로 계산한다 """
+        if df is None:
+            return cached(self.result_cache, self.conn, 'ping.ping_stats', list(ping_columns), ['match_participants'],
+                          lambda: self.compute_ping_stats(None, ping_columns), self.parquet_root)
+        return self.compute_ping_stats(df, ping_columns)
+
+    def compute_ping_stats(self, df, ping_columns):
+        if df is None and self.chunksize is not None:
+            parts = [self.ping_partials(chunk, ping_columns) for chunk in self.participant_chunks()]
+        else:
+            if df is None:
+                df = self.load_match_participants()
+            parts = [self.ping_partials(df, ping_columns)]
+
+        totals, by_bin = parts[0]
+        for part_totals, part_by_bin in parts[1:]:
+            totals = totals + part_totals
+            by_bin = by_bin + part_by_bin
+
+        by_bin = by_bin[by_bin['count'] > 0]
+        return totals.sort_values(ascending=False), by_bin['sum'] / by_bin['count'] * 100
+
     def analyze_ping_usage(self):
         df = self.load_match_participants()
 
-        ping_columns = [
-            'all_in_pings', 'assist_me_pings', 'basic_pings', 'command_pings', 'danger_pings',
-            'enemy_missing_pings', 'enemy_vision_pings', 'get_back_pings', 'hold_pings',
-            'need_vision_pings', 'on_my_way_pings', 'push_pings', 'vision_cleared_pings'
-        ]
-
-        ping_usage = df[ping_columns].sum().sort_values(ascending=False)
-
-        plt.figure(figsize=(12,6))
-        ping_usage.plot(kind='bar', color='skyblue')
-        plt.title('Total Ping Usage by Type')
-        plt.xlabel('Ping Type')
-        plt.ylabel('Total Usage')
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_ping_usage(self.ping_stats(df)[0])
         plt.show()
 
-        return df, ping_columns
+        return df, PING_COLUMNS
 
     def analyze_ping_usage_vs_winrate(self, df, ping_columns):
-        df['total_pings'] = df[ping_columns].sum(axis=1)
-
-        bins = [0, 10, 20, 30, 40, 50, 100, 9999]  # 핑 사용량 구간
-        labels = ['0-10', '10-20', '20-30', '30-40', '40-50', '50-100', '100+']
-        df['ping_bin'] = pd.cut(df['total_pings'], bins=bins, labels=labels, right=False)
-
-        winrates = df.groupby('ping_bin')['win'].mean() * 100
-
-        plt.figure(figsize=(10,6))
-        winrates.plot(kind='bar', color='lightgreen')
-        plt.title('Ping Usage vs Win Rate')
-        plt.xlabel('Total Pings (per player)')
-        plt.ylabel('Win Rate (%)')
-        plt.ylim(0, 100)
-        plt.grid(True, linestyle='--', alpha=0.7)
-        plt.tight_layout()
+        plot_ping_winrates(self.ping_stats(df, ping_columns)[1])
         plt.show()
 
+# report.py가 프로세스 풀에서 집계 결과만 넘겨 그린다
+
+def plot_ping_usage(ping_usage):
+    plt.figure(figsize=(12,6))
+    ping_usage.plot(kind='bar', color='skyblue')
+    plt.title('Total Ping Usage by Type')
+    plt.xlabel('Ping Type')
+    plt.ylabel('Total Usage')
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+
+def plot_ping_winrates(winrates):
+    plt.figure(figsize=(10,6))
+    winrates.plot(kind='bar', color='lightgreen')
+    plt.title('Ping Usage vs Win Rate')
+    plt.xlabel('Total Pings (per player)')
+    plt.ylabel('Win Rate (%)')
+    plt.ylim(0, 100)
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+
 if __name__ == "__main__":
     analyzer = PingAnalyzer('riot_challenger.db')
 
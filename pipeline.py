@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import crawlstate
+import main as discovery
+from archive import PayloadArchive
+from db import DB_NAME, WriterThread, db_path
+from match import create_connection_and_table, fetch_match_data, save_match_to_db
+from matchtime import fetch_timeline_data, save_timeline_to_db
+from regions import DEFAULT_PLATFORMS, RegionalRequester
+
+# 우선순위가 같으면 timeline -> match -> ids 순서. 저장된 match의 timeline이 같은 우선순위로 바로 뒤따른다
+STAGES = ('timeline', 'match', 'ids')
+STAGE_RANK = {stage: rank for rank, stage in enumerate(STAGES)}
+
+class Pipeline:
+    """
+    puuid -> match ID(ids), match 상세(match), timeline 세 단계를 crawl_state 하나를 작업 큐로 삼아 함께 돌린다.
+    - ids 작업이 찾은 match ID는 바로 match 작업이 되고, 저장된 match는 바로 timeline 작업이 된다.
+    - 작업은 우선순위(최근일수록 큼, epoch 초 기준) 순으로 뽑히고, 모든 단계가 스레드 풀과 RegionalRequester의
+      지역별 제한을 함께 쓴다. 그래서 새로 찾은 match는 앞 단계가 다 끝나기를 기다리지 않고 몇 분 안에 저장된다.
+    - 큐 상태(pending/done/failed, 우선순위)는 데이터와 같은 writer 트랜잭션으로 커밋되므로 중단해도 이어서 돈다.
+    """
+    def __init__(self, api_key, conn, platforms=DEFAULT_PLATFORMS, concurrency=10, batch_size=200,
+                 requester=None, archive=None, report_every=10.0):
+        self.conn = conn
+        self.platforms = platforms
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.requester = requester or RegionalRequester(api_key)
+        self.archive = archive or PayloadArchive()
+        self.report_every = report_every
+        self.heap = []
+        self.known = set()
+        self.counts = {stage: {'done': 0, 'failed': 0, 'skipped': 0} for stage in STAGES}
+
+    def push(self, stage, key, priority):
+        self.known.add((stage, key))
+        heapq.heappush(self.heap, (-priority, STAGE_RANK[stage], key, stage))
+
+    def enqueue(self, writer, stage, key, priority):
+        """ 처음 보는 작업만 큐(메모리 힙 + crawl_state)에 넣는다 """
+        if (stage, key) in self.known:
+            return
+        crawlstate.enqueue(writer, stage, key, priority)
+        self.push(stage, key, priority)
+
+    def load(self):
+        """ 기존 단계별 테이블을 큐로 옮기고, 이번 실행의 ids 작업을 다시 넣은 뒤 실행할 작업을 힙에 올린다 """
+        conn = self.conn
+        crawlstate.seed(conn, 'match', "SELECT match_id FROM challenger_matchid", "SELECT match_id FROM match_summary")
+        crawlstate.seed(conn, 'timeline', "SELECT match_id FROM match_summary", "SELECT match_id FROM match_keys")
+
+        placeholders = ', '.join('?' * len(self.platforms))
+        self.puuids = {puuid: (platform, last_seen) for puuid, platform, last_seen in conn.execute(
+            f"SELECT puuid, platform, last_seen_at FROM challenger_puuid WHERE platform IN ({placeholders})",
+            self.platforms)}
+        self.now = now = int(time.time())
+        for puuid in self.puuids:
+            crawlstate.enqueue(conn, 'ids', puuid, now, reset=True)
+
+        self.known = set(conn.execute("SELECT stage, match_id FROM crawl_state"))
+        for stage, key, priority in crawlstate.runnable_jobs(conn):
+            if stage in STAGE_RANK and (stage != 'ids' or key in self.puuids):
+                heapq.heappush(self.heap, (-priority, STAGE_RANK[stage], key, stage))
+        print(f"[PIPELINE] 실행할 작업 {len(self.heap)}개 "
+              + ", ".join(f"{stage} {crawlstate.summary(conn, stage)}" for stage in STAGES))
+
+    def fetch(self, stage, key):
+        if stage == 'ids':
+            platform, last_seen = self.puuids[key]
+            return discovery.fetch_match_ids(self.requester, key, platform,
+                                             *discovery.discovery_window(last_seen, self.now))
+        if stage == 'match':
+            return fetch_match_data(self.requester, key, self.archive)
+        return fetch_timeline_data(self.requester, key, self.archive)
+
+    def handle(self, writer, stage, key, priority, payload):
+        if payload is None:
+            crawlstate.mark_failed(writer, stage, key, f"{stage} 요청 실패")
+            self.counts[stage]['failed'] += 1
+            return
+        try:
+            if stage == 'ids':
+                now = int(time.time())
+                # 응답은 최신 match부터 온다
+                for rank, match_id in enumerate(payload):
+                    if ('match', match_id) in self.known:
+                        continue
+                    writer.execute("INSERT OR IGNORE INTO challenger_matchid (match_id) VALUES (?)", (match_id,))
+                    self.enqueue(writer, 'match', match_id, now - rank)
+                # high-water mark는 찾은 ID들과 같은 writer 트랜잭션으로 올린다
+                writer.execute("UPDATE challenger_puuid SET last_seen_at = ? WHERE puuid = ?", (self.now, key))
+                saved = True
+            elif stage == 'match':
+                saved = save_match_to_db(None, payload, writer)
+                if saved:
+                    self.enqueue(writer, 'timeline', key, priority)
+            else:
+                save_timeline_to_db(None, payload, writer)
+                saved = True
+        except Exception as e:
+            crawlstate.mark_failed(writer, stage, key, repr(e))
+            self.counts[stage]['failed'] += 1
+            print(f"[ERROR] {stage} {key} 저장 실패: {e}")
+            return
+        if saved:
+            crawlstate.mark_done(writer, stage, key)
+            self.counts[stage]['done'] += 1
+        else:
+            crawlstate.mark_skipped(writer, stage, key)
+            self.counts[stage]['skipped'] += 1
+
+    def run(self):
+        self.load()
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        started = time.monotonic()
+        last_report = started
+        loop = asyncio.get_running_loop()
+        in_flight = {}
+
+        with WriterThread(db_path(self.conn), self.batch_size) as writer, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while self.heap or in_flight:
+                # 빈 자리만큼 우선순위가 가장 높은 작업을 꺼낸다. 완료 처리에서 새 작업이 들어오면 다음 차례에 바로 경쟁한다
+                while self.heap and len(in_flight) < self.concurrency:
+                    neg_priority, _, key, stage = heapq.heappop(self.heap)
+                    future = loop.run_in_executor(executor, self.fetch, stage, key)
+                    in_flight[future] = (stage, key, -neg_priority)
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    stage, key, priority = in_flight.pop(future)
+                    try:
+                        payload = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] {stage} {key} 요청 중 예외: {e}")
+                        payload = None
+                    self.handle(writer, stage, key, priority, payload)
+
+                if time.monotonic() - last_report >= self.report_every:
+                    print(f"[PIPELINE] {self.progress()}, 대기 {len(self.heap)}개, "
+                          f"{time.monotonic() - started:.1f}초")
+                    last_report = time.monotonic()
+
+        print(f"[PIPELINE] 종료: {self.progress()}, 요청 {self.requester.request_count}회, "
+              f"{time.monotonic() - started:.1f}초")
+        return self.counts
+
+    def progress(self):
+        return ", ".join(f"{stage} 완료 {c['done']} (실패 {c['failed']}, 건너뜀 {c['skipped']})"
+                         for stage, c in self.counts.items())
+
+def main():
+    api_key = ''
+    # python pipeline.py [--refresh] KR EUW1: --refresh면 먼저 챌린저 puuid 목록을 다시 받는다
+    platforms = [arg for arg in sys.argv[1:] if not arg.startswith('--')] or DEFAULT_PLATFORMS
+    conn = create_connection_and_table(DB_NAME)
+    pipeline = Pipeline(api_key, conn, platforms)
+    if '--refresh' in sys.argv:
+        discovery.fetch_and_store_challenger_puuids(api_key, conn, platforms, pipeline.requester)
+    pipeline.run()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
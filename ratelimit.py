@@ -0,0 +1,200 @@
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+
+from client import create_session
+
+# Riot 개발 키 기본 앱 제한: 1초 20회, 120초 100회
+DEFAULT_APP_LIMITS = "20:1,100:120"
+
+# 잠시 뒤 다시 보내면 성공할 수 있는 서버 오류
+RETRY_STATUSES = (500, 502, 503, 504)
+RETRY_BACKOFF = 0.5
+
+def parse_limits(header):
+    """ '20:1,100:120' -> [(20, 1), (100, 120)] """
+    limits = []
+    if not header:
+        return limits
+    for part in header.split(','):
+        count, window = part.strip().split(':')
+        limits.append((int(count), int(window)))
+    return limits
+
+def method_key(url):
+    """ URL에서 match ID, puuid 등 가변 경로를 지워 메서드 단위 키를 만든다 """
+    url = url.split('?', 1)[0]
+    url = re.sub(r'^https?://', '', url)
+    return re.sub(r'/(?:[A-Z0-9]+_\d+|[\w-]{40,})(?=/|$)', '/{}', url)
+
+class SlidingWindow:
+    def __init__(self, limit, window, margin=0.0):
+        self.limit = limit
+        self.window = window
+        self.span = window + margin
+        self.stamps = deque()
+
+    def _prune(self, now):
+        while self.stamps and self.stamps[0] <= now - self.span:
+            self.stamps.popleft()
+
+    def wait_time(self, now):
+        self._prune(now)
+        if len(self.stamps) < self.limit:
+            return 0.0
+        return self.stamps[-self.limit] + self.span - now
+
+    def record(self, now):
+        self.stamps.append(now)
+
+    def sync(self, count, now):
+        # 서버가 집계한 횟수가 더 많으면(다른 프로세스와 키 공유 등) 로컬 창을 채워 맞춘다
+        self._prune(now)
+        while len(self.stamps) < count:
+            self.stamps.append(now)
+
+class RateLimiter:
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS, margin=0.05,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.margin = margin
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.app_windows = self._build(parse_limits(app_limits))
+        self.method_windows = {}
+        self.blocked_until = 0.0
+
+    def _build(self, limits, old=None):
+        old = {(w.limit, w.window): w for w in (old or [])}
+        return [old.get(limit) or SlidingWindow(*limit, margin=self.margin) for limit in limits]
+
+    def _wait_time(self, method, now):
+        windows = self.app_windows + self.method_windows.get(method, [])
+        waits = [w.wait_time(now) for w in windows]
+        waits.append(self.blocked_until - now)
+        return max(waits)
+
+    def acquire(self, method=None):
+        """ 모든 제한 창에 여유가 생길 때까지 대기한 뒤 요청 1회를 기록한다 """
+        while True:
+            with self.lock:
+                now = self.clock()
+                wait = self._wait_time(method, now)
+                if wait <= 0:
+                    for w in self.app_windows + self.method_windows.get(method, []):
+                        w.record(now)
+                    return
+            self.sleep(wait)
+
+    def update(self, method, headers):
+        """ 응답 헤더의 제한값/현재 카운트로 로컬 창을 보정한다 """
+        with self.lock:
+            now = self.clock()
+            app_limits = parse_limits(headers.get('X-App-Rate-Limit'))
+            if app_limits:
+                self.app_windows = self._build(app_limits, self.app_windows)
+            method_limits = parse_limits(headers.get('X-Method-Rate-Limit'))
+            if method_limits:
+                self.method_windows[method] = self._build(method_limits, self.method_windows.get(method))
+
+            for windows, header in ((self.app_windows, 'X-App-Rate-Limit-Count'),
+                                    (self.method_windows.get(method, []), 'X-Method-Rate-Limit-Count')):
+                counts = dict((window, count) for count, window in parse_limits(headers.get(header)))
+                for w in windows:
+                    if w.window in counts:
+                        w.sync(counts[w.window], now)
+
+    def backoff(self, retry_after):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+
+class RateLimitedRequester:
+    def __init__(self, api_key, limiter=None, max_retries=3, session=None):
+        self.api_key = api_key
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.session = session or create_session(api_key)
+        self.request_count = 0
+
+    def get(self, url, method=None):
+        """ 429는 Retry-After만큼, 5xx/읽기 타임아웃은 지수 백오프 뒤 다시 보낸다. 재시도도 모두 제한 창에 기록된다 """
+        method = method or method_key(url)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(method)
+            try:
+                response = self.session.get(url)
+            except requests.exceptions.ReadTimeout:
+                self.request_count += 1
+                if attempt == self.max_retries:
+                    raise
+                print(f"[WARN] 읽기 타임아웃, 다시 요청합니다 ({attempt + 1}/{self.max_retries})")
+                self.limiter.sleep(RETRY_BACKOFF * 2 ** attempt)
+                continue
+            self.request_count += 1
+            self.limiter.update(method, response.headers)
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                print(f"[WARN] {response.status_code} 응답, 다시 요청합니다 ({attempt + 1}/{self.max_retries})")
+                self.limiter.sleep(RETRY_BACKOFF * 2 ** attempt)
+                continue
+
+            if response.status_code != 429:
+                return response
+
+            retry_after = float(response.headers.get('Retry-After', 2 ** attempt))
+            print(f"[WARN] 429 응답 ({response.headers.get('X-Rate-Limit-Type', 'unknown')}), {retry_after}초 대기...")
+            self.limiter.backoff(retry_after)
+
+        return response
+
+def benchmark(total=300, limits="20:1,100:10"):
+    """ 제한을 강제하는 로컬 스텁 서버에 요청을 보내 실측 처리량을 이론 상한과 비교한다 """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    server_limiter = RateLimiter(limits, margin=0.0)
+    server_windows = server_limiter.app_windows
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with server_limiter.lock:
+                now = time.monotonic()
+                wait = max(w.wait_time(now) for w in server_windows)
+                if wait <= 0:
+                    for w in server_windows:
+                        w.record(now)
+                counts = ",".join(f"{len(w.stamps)}:{w.window}" for w in server_windows)
+            self.send_response(200 if wait <= 0 else 429)
+            self.send_header('X-App-Rate-Limit', limits)
+            self.send_header('X-App-Rate-Limit-Count', counts)
+            if wait > 0:
+                self.send_header('Retry-After', str(max(1, int(wait + 0.999))))
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/lol/match/v5/matches/KR_1"
+
+    requester = RateLimitedRequester('', RateLimiter(limits))
+    started = time.monotonic()
+    ok = 0
+    for _ in range(total):
+        if requester.get(url).status_code == 200:
+            ok += 1
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    ceiling = min(count / window for count, window in parse_limits(limits))
+    print(f"[BENCH] {ok}/{total} 성공, 전체 요청 {requester.request_count}회, {elapsed:.1f}초")
+    print(f"[BENCH] 실측 {ok / elapsed:.2f} req/s, 이론 상한 {ceiling:.2f} req/s")
+
+if __name__ == "__main__":
+    benchmark()
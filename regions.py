@@ -0,0 +1,134 @@
+import threading
+from urllib.parse import urlsplit
+
+from client import create_session
+from ratelimit import RateLimitedRequester, RateLimiter
+
+# 플랫폼(league-v4 등 플랫폼 호스트) -> match-v5를 받는 지역 라우팅 호스트
+PLATFORM_REGIONS = {
+    'KR': 'asia',
+    'JP1': 'asia',
+    'NA1': 'americas',
+    'BR1': 'americas',
+    'LA1': 'americas',
+    'LA2': 'americas',
+    'EUW1': 'europe',
+    'EUN1': 'europe',
+    'TR1': 'europe',
+    'RU': 'europe',
+    'ME1': 'europe',
+    'OC1': 'sea',
+    'PH2': 'sea',
+    'SG2': 'sea',
+    'TH2': 'sea',
+    'TW2': 'sea',
+    'VN2': 'sea',
+}
+
+DEFAULT_PLATFORMS = ['KR']
+
+# 솔로 랭크. match ID 목록 요청에 넘겨서 다른 큐의 match는 아예 받지 않는다
+RANKED_SOLO_QUEUE = 420
+
+def platform_host(platform):
+    return f"https://{platform.lower()}.api.riotgames.com"
+
+def region_host(region):
+    return f"https://{region}.api.riotgames.com"
+
+def match_platform(match_id):
+    """ 'KR_7412345678' -> 'KR', 'EUW1_6912345678' -> 'EUW1' """
+    return match_id.split('_', 1)[0]
+
+def match_region(match_id):
+    return PLATFORM_REGIONS[match_platform(match_id)]
+
+def match_url(match_id, suffix=''):
+    return f"{region_host(match_region(match_id))}/lol/match/v5/matches/{match_id}{suffix}"
+
+class RegionalRequester:
+    """
+    Riot 제한은 라우팅 호스트(kr, euw1, asia, europe...)마다 따로 걸리므로 호스트마다 RateLimiter를 따로 둔다.
+    한 지역이 제한에 걸려 기다려도 다른 지역 요청은 막히지 않는다. 세션(호스트별 커넥션 풀)은 공유한다.
+    """
+    def __init__(self, api_key, app_limits=None, max_retries=3, session=None):
+        self.api_key = api_key
+        self.app_limits = app_limits
+        self.max_retries = max_retries
+        self.session = session or create_session(api_key)
+        self.requesters = {}
+        self.lock = threading.Lock()
+
+    def requester(self, host):
+        with self.lock:
+            if host not in self.requesters:
+                limiter = RateLimiter(self.app_limits) if self.app_limits else RateLimiter()
+                self.requesters[host] = RateLimitedRequester(self.api_key, limiter, self.max_retries, self.session)
+            return self.requesters[host]
+
+    def get(self, url, method=None):
+        return self.requester(urlsplit(url).netloc).get(url, method)
+
+    @property
+    def request_count(self):
+        return sum(requester.request_count for requester in self.requesters.values())
+
+def benchmark(regions=3, per_region=100, limits="20:1"):
+    """
+    지역마다 제한을 따로 강제하는 로컬 스텁 서버(포트 = 호스트)를 띄우고,
+    지역 수를 늘렸을 때 전체 처리량이 지역 수에 비례해 늘어나는지 본다.
+    """
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from crawler import AsyncCrawler
+    from ratelimit import parse_limits
+
+    def serve():
+        server_limiter = RateLimiter(limits, margin=0.0)
+
+        class StubHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server_limiter.lock:
+                    now = time.monotonic()
+                    wait = max(w.wait_time(now) for w in server_limiter.app_windows)
+                    if wait <= 0:
+                        for w in server_limiter.app_windows:
+                            w.record(now)
+                self.send_response(200 if wait <= 0 else 429)
+                self.send_header('X-App-Rate-Limit', limits)
+                if wait > 0:
+                    self.send_header('Retry-After', str(max(1, int(wait + 0.999))))
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    ceiling = min(count / window for count, window in parse_limits(limits))
+
+    for n in range(1, regions + 1):
+        # 앞 회차의 요청이 서버 제한 창에 남지 않도록 회차마다 서버를 새로 띄운다
+        servers = [serve() for _ in range(n)]
+        hosts = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+        requester = RegionalRequester('', limits)
+        items = [(host, i) for host in hosts for i in range(per_region)]
+
+        def fetch(item):
+            response = requester.get(f"{item[0]}/lol/match/v5/matches/KR_{item[1]}")
+            return response.json() if response.status_code == 200 else None
+
+        stats = AsyncCrawler(concurrency=5, report_every=60).run(items, fetch, lambda idx, item, payload: None,
+                                                                 key=lambda item: item[0])
+        print(f"[BENCH] 지역 {n}개: {stats.rate:.2f} req/s (지역당 상한 {ceiling:.0f} req/s, "
+              f"실패 {stats.failed}건, 요청 {requester.request_count}회)")
+        for server in servers:
+            server.shutdown()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # 화면 없이 파일로만 그린다. 분석 모듈이 pyplot을 import하기 전에 정해야 한다
+import matplotlib.pyplot as plt
+
+import elitemon
+import feat
+import feat2
+import ping
+from db import DB_NAME
+from resultcache import ResultCache
+
+REPORT_DIR = 'figures'
+FORMATS = ('png', 'svg')
+
+def collect_figures(db_name=DB_NAME, chunksize=None, result_cache=None):
+    """
+    분석기마다 데이터를 한 번씩만 읽어 figure별 (이름, plot 함수, 인자, 집계 시간) 목록을 만든다.
+    plot 함수에는 작은 집계 결과만 넘어가므로 프로세스 풀로 보내는 비용이 작다.
+    chunksize를 주면 큰 테이블을 chunk 단위 부분 집계로 읽는다.
+    result_cache를 주면 몬스터/ping 집계는 읽는 테이블이 바뀌지 않은 동안 캐시에서 읽는다.
+    """
+    figures = []
+
+    def add(name, plot, load):
+        started = time.perf_counter()
+        args = load()
+        elapsed = time.perf_counter() - started
+        if args is None:
+            print(f"[REPORT] {name}: 그릴 데이터가 없어 건너뜁니다.")
+            return
+        figures.append((name, plot, args, elapsed))
+
+    monsters = elitemon.EpicMonsterAnalyzer(db_name, result_cache, chunksize)
+    add('horde_kills_vs_winrate', elitemon.plot_horde_kills, lambda: (monsters.kill_count_winrates('HORDE'),))
+    add('dragon_kills_vs_winrate', elitemon.plot_dragon_kills, lambda: (monsters.kill_count_winrates('DRAGON'),))
+    add('dragon_type_vs_winrate', elitemon.plot_dragon_types, lambda: (monsters.sub_type_winrates('DRAGON'),))
+    add('objective_kills_vs_winrate', elitemon.plot_objectives,
+        lambda: (monsters.objective_winrates(elitemon.OBJECTIVE_MONSTERS),))
+
+    pings = ping.PingAnalyzer(db_name, chunksize, result_cache=result_cache)
+    ping_stats = []
+
+    def ping_usage():
+        # 두 ping figure는 match_participants를 한 번 읽은 집계를 나눠 쓴다
+        ping_stats[:] = pings.ping_stats()
+        return (ping_stats[0],)
+
+    add('ping_usage', ping.plot_ping_usage, ping_usage)
+    add('ping_usage_vs_winrate', ping.plot_ping_winrates, lambda: (ping_stats[1],))
+
+    # feat.py와 feat2.py는 같은 FEAT_UPDATE 이벤트를 쓰므로 한 번 읽어 나눠 쓴다 (chunk 모드에서는 각자 스트리밍)
+    feats = feat.FeatAnalyzer(db_name, chunksize)
+    events = feats.load_events() if chunksize is None else None
+
+    def completion_times():
+        both = feats.completion_times(events).dropna()
+        return (both,) if not both.empty else None
+
+    add('feat_completion_times', feat.plot_completion_times, completion_times)
+    add('feat_cumulative_win_rate', feat2.plot_cumulative_win_rates,
+        lambda: feat2.FeatAnalyzer(db_name, chunksize).cumulative_win_rates(events))
+    return figures
+
+def render(name, plot, args, out_dir=REPORT_DIR, formats=FORMATS):
+    """ figure 하나를 그려 out_dir/name.{png,svg}로 저장하고 걸린 시간을 돌려준다 """
+    started = time.perf_counter()
+    plot(*args)
+    fig = plt.gcf()
+    for fmt in formats:
+        fig.savefig(os.path.join(out_dir, f"{name}.{fmt}"))
+    plt.close(fig)
+    return time.perf_counter() - started
+
+def run_report(db_name=DB_NAME, out_dir=REPORT_DIR, formats=FORMATS, workers=None, chunksize=None, result_cache=None):
+    """ 모든 분석 figure를 headless로 out_dir에 저장하고 figure별 집계/렌더링 시간을 출력한다. workers=1이면 순차 실행 """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    figures = collect_figures(db_name, chunksize, result_cache)
+    load_time = time.perf_counter() - started
+
+    if workers == 1:
+        render_times = [render(name, plot, args, out_dir, formats) for name, plot, args, _ in figures]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render, name, plot, args, out_dir, formats) for name, plot, args, _ in figures]
+            render_times = [future.result() for future in futures]
+
+    for (name, _, _, query_time), render_time in zip(figures, render_times):
+        print(f"[REPORT] {name}: 집계 {query_time:.3f}초, 렌더링 {render_time:.3f}초")
+    print(f"[REPORT] figure {len(figures)}개 ({', '.join(formats)}) -> {out_dir}/, "
+          f"데이터 {load_time:.2f}초, 전체 {time.perf_counter() - started:.2f}초")
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_name = args[0] if len(args) > 0 else DB_NAME
+    out_dir = args[1] if len(args) > 1 else REPORT_DIR
+    # --chunksize=N: 메모리에 한 번에 올리는 행 수 상한
+    chunksize = next((int(arg.split('=', 1)[1]) for arg in sys.argv if arg.startswith('--chunksize=')), None)
+    # --cache: 분석 결과를 resultcache.CACHE_ROOT에 두고, DB가 그대로면 다음 실행은 집계를 건너뛴다
+    result_cache = ResultCache() if '--cache' in sys.argv else None
+    run_report(db_name, out_dir, workers=1 if '--serial' in sys.argv else None, chunksize=chunksize,
+               result_cache=result_cache)
+
+if __name__ == "__main__":
+    main()
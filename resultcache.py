@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+from db import DB_NAME, connect, db_path
+
+CACHE_ROOT = 'result_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 이 버전부터 match_changes(테이블별 변경 순번)가 있다
+CHANGES_VERSION = 12
+
+def fingerprint(conn, tables, parquet_root=None):
+    """
+    분석이 읽는 테이블마다 match_changes의 MAX(seq)와 스키마 버전. seq는 행이 추가/수정/삭제될 때마다
+    트리거(match_events_compact는 matchtime이 timeline마다)가 늘리므로, 같은 키를 upsert로 덮어쓰거나
+    지웠다 다시 넣어도 값이 바뀐다 (MAX(rowid)는 둘 다 그대로였다). 인덱스 끝만 보므로 1ms 안쪽이다.
+    v12 이전 DB는 변경을 알 수 없어 None (캐시하지 않는다).
+    parquet_root를 주면 그 Parquet export의 마지막 sync도 본다 (DB에 들어온 뒤 export 전후로 결과가 다르다).
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < CHANGES_VERSION:
+        return None
+    values = {'user_version': version}
+    for table in tables:
+        values[table] = conn.execute("SELECT MAX(seq) FROM match_changes WHERE table_name = ?",
+                                     (table,)).fetchone()[0]
+    if parquet_root is not None:
+        manifest = os.path.join(parquet_root, 'manifest.db')
+        exported = None
+        if os.path.exists(manifest):
+            manifest_conn = sqlite3.connect(manifest)
+            try:
+                exported = manifest_conn.execute("SELECT MAX(sync_id) FROM syncs").fetchone()[0]
+            except sqlite3.OperationalError:
+                # columnar.export가 다음에 처음부터 다시 쓸 이전 형식 manifest
+                exported = None
+            manifest_conn.close()
+        values['parquet'] = exported
+    return json.dumps(values, sort_keys=True)
+
+class ResultCache:
+    """
+    분석기 결과(DataFrame/Series/튜플)를 디스크에 pickle로 두는 캐시.
+    키는 (DB 파일, 분석 이름, 인자)이고, 분석이 읽는 테이블의 fingerprint가 저장할 때와 같을 때만 쓴다.
+    그래서 수집 뒤에는 새 행이 들어온 테이블을 읽는 분석만 다시 계산되고, 변화가 없으면 파일 하나를 읽고 끝난다.
+    root/index.db에 마지막 사용 시각을 두고 전체 크기가 max_bytes를 넘으면 오래 안 쓴 것부터 지운다 (LRU).
+    """
+    def __init__(self, root=CACHE_ROOT, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                name TEXT,
+                tables TEXT,
+                fingerprint TEXT,
+                size INTEGER,
+                last_used REAL
+            )
+        ''')
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def get_or_compute(self, conn, name, params, tables, compute, parquet_root=None):
+        """ fingerprint가 같은 결과가 있으면 읽어서, 없거나 오래됐으면 compute()로 만들어 저장한 뒤 돌려준다 """
+        key = hashlib.sha256(json.dumps([os.path.abspath(db_path(conn) or ''), name, params, parquet_root],
+                                        sort_keys=True, default=str).encode()).hexdigest()
+        current = fingerprint(conn, tables, parquet_root)
+        if current is None:
+            self.misses += 1
+            return compute()
+        with self.lock:
+            row = self.conn.execute("SELECT fingerprint FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] == current:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = None
+            else:
+                with self.lock:
+                    self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self.conn.commit()
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        value = compute()
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        with self.lock:
+            self.conn.execute('''
+                INSERT INTO results (key, name, tables, fingerprint, size, last_used) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    fingerprint = excluded.fingerprint, size = excluded.size, last_used = excluded.last_used
+            ''', (key, name, json.dumps(list(tables)), current, os.path.getsize(path), time.time()))
+            self.conn.commit()
+            self._evict()
+        return value
+
+    def _evict(self):
+        """ lock을 잡은 채로 부른다. 전체 크기가 max_bytes 이하가 될 때까지 last_used가 오래된 결과를 지운다 """
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+        self.conn.commit()
+
+    def _remove(self, key):
+        self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, tables=None):
+        """
+        tables 중 하나라도 읽는 결과를 지운다 (None이면 전부). fingerprint로 잡히지 않는 수정
+        (matchtime을 거치지 않고 match_events_compact를 직접 고친 경우 등)을 한 뒤에 쓴다
+        """
+        with self.lock:
+            for key, entry_tables in self.conn.execute("SELECT key, tables FROM results").fetchall():
+                if tables is None or set(json.loads(entry_tables)) & set(tables):
+                    self._remove(key)
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.conn.close()
+
+def cached(cache, conn, name, params, tables, compute, parquet_root=None):
+    """ 분석기 메서드에서 쓴다. cache가 None이면 캐시 없이 compute() """
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(conn, name, params, tables, compute, parquet_root)
+
+def benchmark(db_name=DB_NAME, root=CACHE_ROOT):
+    """ 세 분석기의 결과를 처음 계산(miss) / 같은 DB에서 다시(hit) / 이벤트만 추가된 뒤 다시 읽는 시간 """
+    import shutil
+    import tempfile
+
+    from champion import ChampionAnalyzer
+    from elitemon import OBJECTIVE_MONSTERS, EpicMonsterAnalyzer
+    from matchtime import LOG_EVENTS_SQL
+    from migrations import migrate
+    from ping import PingAnalyzer
+
+    def refresh(cache):
+        # report.py/대시보드가 한 번 새로 고칠 때 읽는 집계들
+        monsters = EpicMonsterAnalyzer(db_name, result_cache=cache)
+        champions = ChampionAnalyzer(db_name, result_cache=cache)
+        pings = PingAnalyzer(db_name, result_cache=cache)
+        started = time.perf_counter()
+        results = [
+            monsters.kill_count_winrates('HORDE'), monsters.kill_count_winrates('DRAGON'),
+            monsters.sub_type_winrates('DRAGON'), monsters.objective_winrates(OBJECTIVE_MONSTERS),
+            champions.pick_ban_stats(), champions.recount_pick_ban_stats(), *pings.ping_stats(),
+        ]
+        return time.perf_counter() - started, results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        shutil.copy(db_name, path)
+        db_name = path
+        # fingerprint가 보는 match_changes(v12)까지 올린다
+        conn = connect(db_name)
+        migrate(conn)
+        conn.close()
+        cache = ResultCache(os.path.join(tmp, root))
+
+        no_cache, expected = refresh(None)
+        cold, _ = refresh(cache)
+        warm, results = refresh(cache)
+        same = all(a.equals(b) for a, b in zip(expected, results))
+        print(f"[BENCH] 캐시 없음 {no_cache:.3f}초, 처음(miss) {cold:.3f}초, 같은 DB(hit) {warm * 1000:.1f}ms, "
+              f"결과 {'같음' if same else '다름'}")
+
+        # 새 timeline이 들어온 것처럼 이벤트 한 줄만 추가하면 이벤트를 읽는 분석만 다시 계산된다
+        conn = connect(db_name)
+        match_id = conn.execute('''
+            SELECT k.match_id FROM match_events_compact e JOIN match_keys k ON k.match_key = e.match_key
+            ORDER BY e.event_id DESC LIMIT 1
+        ''').fetchone()[0]
+        conn.execute('''
+            INSERT INTO match_events_compact (match_key, timestamp, type_id)
+            SELECT match_key, timestamp + 1, type_id FROM match_events_compact ORDER BY event_id DESC LIMIT 1
+        ''')
+        conn.execute(LOG_EVENTS_SQL, (match_id,))
+        conn.commit()
+        conn.close()
+        hits, misses = cache.hits, cache.misses
+        events, _ = refresh(cache)
+        print(f"[BENCH] 이벤트 추가 뒤: {events:.3f}초, 다시 계산 {cache.misses - misses}개 / 그대로 {cache.hits - hits}개")
+        cache.close()
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else DB_NAME)
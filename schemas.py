@@ -0,0 +1,251 @@
+import json
+import time
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Match-V5 match/timeline 응답 중 DB에 저장하는 필드만 정의한다. 나머지 필드는 디코딩하지 않고 건너뛴다.
+# msgspec이 없으면 decode_*는 표준 json의 dict를 돌려주고, match.py/matchtime.py의 dict 경로가 같은 행을 만든다.
+if msgspec is not None:
+    class Struct(msgspec.Struct, rename='camel', omit_defaults=True):
+        pass
+
+    class Metadata(Struct):
+        match_id: str
+
+    class Participant(Struct):
+        puuid: str | None = None
+        riot_id_game_name: str | None = None
+        champion_name: str | None = None
+        champion_id: int | None = None
+        individual_position: str | None = None
+        lane: str | None = None
+        item0: int | None = None
+        item1: int | None = None
+        item2: int | None = None
+        item3: int | None = None
+        item4: int | None = None
+        item5: int | None = None
+        item6: int | None = None
+        kills: int | None = None
+        deaths: int | None = None
+        assists: int | None = None
+        all_in_pings: int | None = None
+        assist_me_pings: int | None = None
+        basic_pings: int | None = None
+        command_pings: int | None = None
+        danger_pings: int | None = None
+        enemy_vision_pings: int | None = None
+        enemy_missing_pings: int | None = None
+        get_back_pings: int | None = None
+        hold_pings: int | None = None
+        need_vision_pings: int | None = None
+        retreat_pings: int | None = None
+        on_my_way_pings: int | None = None
+        push_pings: int | None = None
+        vision_cleared_pings: int | None = None
+        detector_wards_placed: int | None = None
+        wards_killed: int | None = None
+        wards_placed: int | None = None
+        vision_score: int | None = None
+        win: bool = False
+
+    class Ban(Struct):
+        champion_id: int = 0
+
+    class Feat(Struct):
+        feat_state: int = 0
+
+    class Feats(msgspec.Struct):
+        epic_monster_kill: Feat = msgspec.field(name='EPIC_MONSTER_KILL')
+        first_blood: Feat = msgspec.field(name='FIRST_BLOOD')
+        first_turret: Feat = msgspec.field(name='FIRST_TURRET')
+
+    class Objective(Struct):
+        first: bool = False
+        kills: int = 0
+
+    class Objectives(Struct):
+        champion: Objective
+        dragon: Objective
+        horde: Objective
+        rift_herald: Objective
+        atakhan: Objective
+        baron: Objective
+        tower: Objective
+        inhibitor: Objective
+
+    class Team(Struct):
+        team_id: int
+        win: bool
+        feats: Feats
+        objectives: Objectives
+        bans: list[Ban] = []
+
+    class MatchInfo(Struct):
+        participants: list[Participant]
+        teams: list[Team]
+        game_mode: str | None = None
+        game_version: str | None = None
+        game_type: str | None = None
+        map_id: int | None = None
+        queue_id: int | None = None
+        game_duration: int | None = None
+        game_creation: int | None = None
+
+    class Match(Struct):
+        metadata: Metadata
+        info: MatchInfo
+
+    class TimelineEvent(Struct):
+        type: str | None = None
+        timestamp: int | None = None
+        participant_id: int | None = None
+        killer_id: int | None = None
+        creator_id: int | None = None
+        assisting_participant_ids: list[int] | None = None
+        victim_id: int | None = None
+        ward_type: str | None = None
+        skill_slot: int | None = None
+        item_id: int | None = None
+        team_id: int | None = None
+        killer_team_id: int | None = None
+        feat_type: int | None = None
+        feat_value: int | None = None
+        lane_type: str | None = None
+        monster_type: str | None = None
+        monster_sub_type: str | None = None
+        building_type: str | None = None
+        tower_type: str | None = None
+        winning_team: int | None = None
+
+    class Position(Struct):
+        x: int = 0
+        y: int = 0
+
+    class ParticipantFrame(Struct):
+        total_gold: int = 0
+        current_gold: int = 0
+        xp: int = 0
+        level: int = 0
+        minions_killed: int = 0
+        jungle_minions_killed: int = 0
+        position: Position | None = None
+
+    class Frame(Struct):
+        timestamp: int | None = None
+        events: list[TimelineEvent] = []
+        participant_frames: dict[str, ParticipantFrame] = {}
+
+    class TimelineInfo(Struct):
+        frames: list[Frame] = []
+        frame_interval: int | None = None
+
+    class Timeline(Struct):
+        metadata: Metadata
+        info: TimelineInfo
+
+    _match_decoder = msgspec.json.Decoder(Match)
+    _timeline_decoder = msgspec.json.Decoder(Timeline)
+
+def decode_match(raw):
+    """ 응답 본문(bytes) -> Match (msgspec이 없으면 dict) """
+    if msgspec is None:
+        return json.loads(raw)
+    return _match_decoder.decode(raw)
+
+def decode_timeline(raw):
+    """ 응답 본문(bytes) -> Timeline (msgspec이 없으면 dict) """
+    if msgspec is None:
+        return json.loads(raw)
+    return _timeline_decoder.decode(raw)
+
+def benchmark(n_payloads=200, events_per_frame=40):
+    """ 합성 match/timeline 응답 하나당 디코딩 + 행 추출 시간: 표준 json, orjson(dict) vs msgspec Struct """
+    import random
+
+    import match
+    import matchtime
+    from archive import loads
+
+    if msgspec is None:
+        print("[BENCH] msgspec이 설치되어 있지 않아 표준 json 경로만 있습니다.")
+        return
+
+    def objective():
+        return {'first': random.random() < 0.5, 'kills': random.randint(0, 5)}
+
+    def synthetic_match(idx):
+        teams = [{
+            'teamId': team_id, 'win': team_id == 100,
+            'bans': [{'championId': random.randint(1, 160), 'pickTurn': turn} for turn in range(5)],
+            'feats': {name: {'featState': random.randint(0, 3)}
+                      for name in ('EPIC_MONSTER_KILL', 'FIRST_BLOOD', 'FIRST_TURRET')},
+            'objectives': {name: objective() for name in ('champion', 'dragon', 'horde', 'riftHerald',
+                                                          'atakhan', 'baron', 'tower', 'inhibitor')},
+        } for team_id in (100, 200)]
+        participants = []
+        for p in range(10):
+            participant = {column: random.randint(0, 30) for column in (
+                'item0', 'item1', 'item2', 'item3', 'item4', 'item5', 'item6', 'kills', 'deaths', 'assists',
+                'allInPings', 'assistMePings', 'basicPings', 'commandPings', 'dangerPings', 'enemyVisionPings',
+                'enemyMissingPings', 'getBackPings', 'holdPings', 'needVisionPings', 'retreatPings',
+                'onMyWayPings', 'pushPings', 'visionClearedPings', 'detectorWardsPlaced', 'wardsKilled',
+                'wardsPlaced', 'visionScore')}
+            # 실제 응답처럼 저장하지 않는 필드가 훨씬 많다
+            participant.update({f"unused{k}": random.randint(0, 1000) for k in range(100)})
+            participant.update(puuid=f"puuid-{idx}-{p}", riotIdGameName='name', championName='Ahri',
+                               championId=103, individualPosition='MIDDLE', lane='MIDDLE', win=p < 5,
+                               challenges={f"c{k}": random.random() for k in range(120)})
+            participants.append(participant)
+        return {'metadata': {'matchId': f"KR_{idx}", 'participants': [f"puuid-{idx}-{p}" for p in range(10)]},
+                'info': {'queueId': 420, 'gameMode': 'CLASSIC', 'gameVersion': '15.1.2.3', 'gameType': 'MATCHED_GAME',
+                         'mapId': 11, 'gameDuration': 1800, 'gameCreation': 1700000000000 + idx,
+                         'participants': participants, 'teams': teams}}
+
+    def synthetic_timeline(idx):
+        frames = []
+        for f in range(30):
+            events = []
+            for k in range(events_per_frame):
+                event_type = random.choice(['WARD_PLACED', 'ITEM_PURCHASED', 'CHAMPION_KILL', 'SKILL_LEVEL_UP'])
+                event = {'type': event_type, 'timestamp': f * 60000 + k * 1000, 'participantId': random.randint(1, 10)}
+                if event_type == 'CHAMPION_KILL':
+                    event.update(killerId=random.randint(1, 10), victimId=random.randint(1, 10), bounty=300,
+                                 assistingParticipantIds=random.sample(range(1, 11), 3),
+                                 position={'x': 100, 'y': 200}, victimDamageReceived=[{'basic': True}] * 5)
+                elif event_type == 'WARD_PLACED':
+                    event.update(creatorId=random.randint(1, 10), wardType='YELLOW_TRINKET')
+                elif event_type == 'SKILL_LEVEL_UP':
+                    event.update(skillSlot=random.randint(1, 4), levelUpType='NORMAL')
+                else:
+                    event.update(itemId=random.randint(1000, 7000))
+                events.append(event)
+            participant_frames = {str(p): {
+                'participantId': p, 'totalGold': f * 400, 'currentGold': 100, 'xp': f * 500, 'level': 1 + f // 3,
+                'minionsKilled': f * 7, 'jungleMinionsKilled': f, 'position': {'x': p * 100, 'y': f * 100},
+                'championStats': {f"s{k}": k for k in range(25)}, 'damageStats': {f"d{k}": k for k in range(12)},
+            } for p in range(1, 11)}
+            frames.append({'timestamp': f * 60000, 'events': events, 'participantFrames': participant_frames})
+        return {'metadata': {'matchId': f"KR_{idx}"}, 'info': {'frameInterval': 60000, 'frames': frames}}
+
+    for kind, make, decode, rows in (
+        ('match', synthetic_match, decode_match, match.match_rows),
+        ('timeline', synthetic_timeline, decode_timeline, lambda data: matchtime.timeline_ops(data)[1]),
+    ):
+        raws = [json.dumps(make(i)).encode() for i in range(n_payloads)]
+        results = {}
+        timings = []
+        # archive.loads는 orjson이 있으면 orjson, 없으면 표준 json이다
+        for name, loader in (('표준 json', json.loads), ('archive.loads', loads), ('msgspec', decode)):
+            started = time.perf_counter()
+            results[name] = [rows(loader(raw)) for raw in raws]
+            timings.append(f"{name} {(time.perf_counter() - started) / n_payloads * 1000:.2f} ms")
+        same = all(result == results['표준 json'] for result in results.values())
+        print(f"[BENCH] {kind} ({sum(map(len, raws)) // n_payloads // 1024} KB): {', '.join(timings)}, "
+              f"결과 {'같음' if same else '다름'}")
+
+if __name__ == "__main__":
+    benchmark()
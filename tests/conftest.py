@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# 저장소의 모듈들은 패키지가 아니라 최상위 스크립트라 루트를 경로에 넣는다
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect
+from migrations import migrate
+
+@pytest.fixture
+def conn(tmp_path):
+    """ 최신 스키마로 마이그레이션한 빈 DB """
+    conn = connect(str(tmp_path / 'test.db'))
+    migrate(conn)
+    yield conn
+    conn.close()
@@ -0,0 +1,46 @@
+""" 테스트용 Match-V5 match/timeline 응답 (DB에 저장하는 필드만, 값은 i로 정해진다) """
+
+OBJECTIVES = ('champion', 'dragon', 'horde', 'riftHerald', 'atakhan', 'baron', 'tower', 'inhibitor')
+
+def match(i, game_version='15.1.1.1', champion_offset=0, queue_id=420):
+    participants = []
+    for p in range(10):
+        participants.append({
+            'puuid': f"puuid-{i}-{p}", 'riotIdGameName': f"player{p}",
+            'championId': 1 + (i + p + champion_offset) % 40, 'championName': f"Champion{1 + (i + p + champion_offset) % 40}",
+            'individualPosition': ('TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY')[p % 5], 'lane': 'TOP',
+            'kills': p, 'deaths': 10 - p, 'assists': i % 7, 'basicPings': (i * p) % 30, 'dangerPings': p,
+            'visionScore': 20 + p, 'wardsPlaced': p, 'win': p < 5,
+        })
+    teams = [{
+        'teamId': team_id, 'win': team_id == 100,
+        'bans': [{'championId': 1 + (i * 3 + team_id // 100 * 5 + b) % 40} for b in range(5)],
+        'feats': {name: {'featState': 1} for name in ('EPIC_MONSTER_KILL', 'FIRST_BLOOD', 'FIRST_TURRET')},
+        'objectives': {name: {'first': team_id == 100, 'kills': k} for k, name in enumerate(OBJECTIVES)},
+    } for team_id in (100, 200)]
+    return {
+        'metadata': {'matchId': f"KR_{i}"},
+        'info': {'queueId': queue_id, 'gameMode': 'CLASSIC', 'gameVersion': game_version, 'gameType': 'MATCHED_GAME',
+                 'mapId': 11, 'gameDuration': 1800, 'gameCreation': 1700000000000 + i * 1000,
+                 'participants': participants, 'teams': teams},
+    }
+
+def timeline(i, n_frames=20):
+    frames = []
+    for f in range(n_frames):
+        events = [
+            {'type': 'WARD_PLACED', 'timestamp': f * 60000 + 1, 'creatorId': 1 + f % 10, 'wardType': 'YELLOW_TRINKET'},
+            {'type': 'CHAMPION_KILL', 'timestamp': f * 60000 + 2, 'killerId': 1 + (i + f) % 10, 'victimId': 1 + f % 10,
+             'assistingParticipantIds': [1 + (f + 1) % 10, 1 + (f + 2) % 10]},
+        ]
+        if f % 5 == 4:
+            events.append({'type': 'ELITE_MONSTER_KILL', 'timestamp': f * 60000 + 3, 'killerId': 1,
+                           'killerTeamId': (100, 200)[(i + f) % 2], 'monsterType': 'DRAGON', 'monsterSubType': 'FIRE_DRAGON'})
+        if f == 3:
+            events.append({'type': 'FEAT_UPDATE', 'timestamp': f * 60000 + 4, 'teamId': 100, 'featType': 0, 'featValue': 1})
+        frames.append({'timestamp': f * 60000, 'events': events, 'participantFrames': {str(p): {
+            'participantId': p, 'totalGold': 500 + f * 300 + p * 7 + i, 'currentGold': 100 + p, 'xp': f * 400 + p,
+            'level': 1 + f // 3, 'minionsKilled': f * 7, 'jungleMinionsKilled': f % 4,
+            'position': {'x': p * 100 + f, 'y': f * 100 + p},
+        } for p in range(1, 11)}})
+    return {'metadata': {'matchId': f"KR_{i}"}, 'info': {'frameInterval': 60000, 'frames': frames}}
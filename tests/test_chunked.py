@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+import feat2
+from champion import ChampionAnalyzer
+from db import db_path
+from elitemon import OBJECTIVE_MONSTERS, EpicMonsterAnalyzer
+from feat import FeatAnalyzer
+from match import save_match_to_db
+from matchtime import save_timeline_to_db
+from ping import PingAnalyzer
+
+import payloads
+
+# chunk가 match/행 경계와 어긋나도록 작게 잡는다
+CHUNKSIZE = 7
+
+def timeline(i):
+    """ match마다 feat 완료 여부와 용 종류/처치 수, 바론 처치가 다르다 """
+    timeline = payloads.timeline(i, 4 + i % 9)
+    frames = timeline['info']['frames']
+    for f, feat_type, feat_value in ((1, 1, 1), (2, 0, 3))[:i % 3]:
+        frames[f]['events'].append({'type': 'FEAT_UPDATE', 'timestamp': f * 60000 + 9, 'teamId': (100, 200)[i % 2],
+                                    'featType': feat_type, 'featValue': feat_value})
+    for frame in frames:
+        for event in frame['events']:
+            if event['type'] == 'ELITE_MONSTER_KILL' and i % 4 == 0:
+                event['monsterSubType'] = 'WATER_DRAGON'
+    if i % 5 == 0:
+        for monster_type in ('DRAGON', 'BARON_NASHOR'):
+            frames[-1]['events'].append({'type': 'ELITE_MONSTER_KILL', 'timestamp': len(frames) * 60000, 'killerId': 6,
+                                         'killerTeamId': 200, 'monsterType': monster_type,
+                                         'monsterSubType': 'EARTH_DRAGON' if monster_type == 'DRAGON' else None})
+    return timeline
+
+def fill(conn, n=40):
+    for i in range(n):
+        save_match_to_db(conn, payloads.match(i, champion_offset=i % 3))
+        # match 몇 개는 timeline이 없다
+        if i % 7 != 6:
+            save_timeline_to_db(conn, timeline(i))
+
+def test_champion_counts(conn):
+    fill(conn)
+    analyzer = ChampionAnalyzer(db_path(conn))
+    participants = analyzer.load_match_participants()
+    picks = analyzer.count_picks(len(participants))
+    pd.testing.assert_frame_equal(analyzer.count_picks(CHUNKSIZE), picks)
+    expected = participants.groupby('champion_id')['win'].agg(['size', 'sum'])
+    assert picks.set_index('champion_id')[['Pick Count', 'Win Count']].to_numpy().tolist() == expected.to_numpy().tolist()
+
+    bans = analyzer.load_match_bans()
+    ban_counts = analyzer.count_bans(len(bans))
+    pd.testing.assert_frame_equal(analyzer.count_bans(CHUNKSIZE), ban_counts)
+    expected = pd.Series(bans.drop(columns='match_id').to_numpy().ravel()).value_counts().sort_index()
+    assert ban_counts['Ban Count'].tolist() == expected.tolist()
+
+def test_feat_completion_times(conn):
+    fill(conn)
+    whole = FeatAnalyzer(db_path(conn)).completion_times()
+    assert whole.notna().any().all()
+    pd.testing.assert_frame_equal(FeatAnalyzer(db_path(conn), CHUNKSIZE).completion_times(), whole)
+
+    thresholds, rates = feat2.FeatAnalyzer(db_path(conn)).cumulative_win_rates()
+    chunked_thresholds, chunked_rates = feat2.FeatAnalyzer(db_path(conn), CHUNKSIZE).cumulative_win_rates()
+    np.testing.assert_array_equal(chunked_thresholds, thresholds)
+    np.testing.assert_allclose(chunked_rates, rates)
+
+def test_ping_stats(conn):
+    fill(conn)
+    usage, winrates = PingAnalyzer(db_path(conn)).ping_stats()
+    chunked_usage, chunked_winrates = PingAnalyzer(db_path(conn), CHUNKSIZE).ping_stats()
+    pd.testing.assert_series_equal(chunked_usage, usage)
+    pd.testing.assert_series_equal(chunked_winrates, winrates)
+
+def test_epic_monster_winrates(conn):
+    fill(conn)
+    whole, chunked = EpicMonsterAnalyzer(db_path(conn)), EpicMonsterAnalyzer(db_path(conn), chunksize=3)
+    for analyze in (lambda a: a.kill_count_winrates('DRAGON'), lambda a: a.sub_type_winrates('DRAGON'),
+                    lambda a: a.objective_winrates(OBJECTIVE_MONSTERS)):
+        expected = analyze(whole)
+        assert len(expected) > 1 or expected.index.tolist() == ['BARON_NASHOR']
+        pd.testing.assert_frame_equal(analyze(chunked), expected)
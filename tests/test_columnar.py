@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import columnar
+from db import connect, db_path
+from match import save_match_to_db
+from matchtime import save_timeline_to_db
+from migrations import migrate, schema_version
+
+import payloads
+
+KEYS = {'match_participants': ['match_id', 'puuid'], 'match_teams': ['match_id', 'team_id'],
+        'match_events': ['event_id']}
+
+def assert_same(conn, root):
+    """ 내보낸 Parquet이 SQLite의 모든 행과 같다 """
+    for table in columnar.EXPORT_TABLES:
+        key = KEYS.get(table, ['match_id'])
+        expected = pd.read_sql_query(f"SELECT * FROM {table}", conn).sort_values(key).reset_index(drop=True)
+        if expected.empty:
+            # 행이 하나도 없던 테이블은 디렉터리가 없다
+            assert not os.path.exists(os.path.join(root, table)), table
+            continue
+        actual = columnar.read_table(table, list(expected.columns), root=root)
+        actual = actual.sort_values(key).reset_index(drop=True)
+        assert expected.astype(str).equals(actual.astype(str)), table
+
+def test_incremental_export_follows_changes(conn, tmp_path):
+    root = str(tmp_path / 'parquet')
+    for i in range(6):
+        save_match_to_db(conn, payloads.match(i))
+    for i in range(3):
+        save_timeline_to_db(conn, payloads.timeline(i, 5))
+    columnar.export(db_path(conn), root)
+    assert_same(conn, root)
+
+    # 나중에 들어온 timeline, 패치/챔피언이 바뀐 재수집, 다시 받은 timeline, 지워진 행
+    save_timeline_to_db(conn, payloads.timeline(4, 6))
+    save_match_to_db(conn, payloads.match(1, game_version='15.2.1.1', champion_offset=3))
+    save_timeline_to_db(conn, payloads.timeline(2, 3))
+    conn.execute("DELETE FROM match_teams WHERE match_id = 'KR_5'")
+    conn.commit()
+    counts = columnar.export(db_path(conn), root)
+    assert_same(conn, root)
+    assert counts['match_events'][0] == 3
+    assert sorted(os.listdir(os.path.join(root, 'match_summary'))) == ['patch=15.1', 'patch=15.2']
+
+    # 바뀐 것이 없으면 아무것도 쓰지 않는다
+    assert all(matches == 0 for matches, _ in columnar.export(db_path(conn), root).values())
+
+def test_compact_merges_small_files(conn, tmp_path):
+    root = str(tmp_path / 'parquet')
+    for i in range(columnar.COMPACT_FILES + 2):
+        save_match_to_db(conn, payloads.match(i))
+        columnar.export(db_path(conn), root)
+    files = os.listdir(os.path.join(root, 'match_participants', 'patch=15.1'))
+    assert len([name for name in files if name.endswith('.parquet')]) <= columnar.COMPACT_FILES
+    assert_same(conn, root)
+    # 합친 파일로 옮겨진 match도 바뀌면 다시 쓴다
+    save_match_to_db(conn, payloads.match(0, champion_offset=5))
+    columnar.export(db_path(conn), root)
+    assert_same(conn, root)
+
+def test_export_leaves_old_schema_alone(tmp_path):
+    path = str(tmp_path / 'v11.db')
+    conn = connect(path)
+    migrate(conn, until=11)
+    save_match_to_db(conn, payloads.match(1))
+    conn.close()
+    root = str(tmp_path / 'parquet')
+    with pytest.raises(RuntimeError, match='v11'):
+        columnar.export(path, root)
+    # 원본은 마이그레이션되지 않고, 아무것도 내보내지 않는다
+    conn = connect(path)
+    assert schema_version(conn) == 11
+    conn.close()
+    assert not os.path.exists(root)
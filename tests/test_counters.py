@@ -0,0 +1,78 @@
+from db import connect
+from match import save_match_to_db
+from migrations import migrate
+
+import payloads
+
+# 카운터와 같은 칸(버전/포지션)으로 원본 테이블을 다시 센다. 0이 된 카운터 행은 빈 칸과 같다
+RECOUNT = {
+    'champion_pick_counts': '''
+        SELECT p.champion_id, COALESCE(s.game_version, ''), COALESCE(p.individual_position, ''),
+               COUNT(*), SUM(p.win)
+        FROM match_participants p LEFT JOIN match_summary s ON s.match_id = p.match_id
+        GROUP BY 1, 2, 3
+    ''',
+    'champion_ban_counts': '''
+        SELECT b.champion_id, COALESCE(s.game_version, ''), COUNT(*)
+        FROM (''' + ' UNION ALL '.join(f"SELECT match_id, ban{i} AS champion_id FROM match_bans"
+                                       for i in range(1, 11)) + ''') b
+        LEFT JOIN match_summary s ON s.match_id = b.match_id
+        WHERE b.champion_id > 0
+        GROUP BY 1, 2
+    ''',
+    'champion_match_counts': '''
+        SELECT COALESCE(s.game_version, ''), COUNT(*)
+        FROM match_bans b LEFT JOIN match_summary s ON s.match_id = b.match_id
+        GROUP BY 1
+    ''',
+}
+
+COUNTERS = {
+    'champion_pick_counts': '''
+        SELECT champion_id, game_version, individual_position, picks, wins FROM champion_pick_counts WHERE picks <> 0
+    ''',
+    'champion_ban_counts': "SELECT champion_id, game_version, bans FROM champion_ban_counts WHERE bans <> 0",
+    'champion_match_counts': "SELECT game_version, matches FROM champion_match_counts WHERE matches <> 0",
+}
+
+def counters_match_recount(conn):
+    return all(sorted(conn.execute(COUNTERS[table]).fetchall()) == sorted(conn.execute(sql).fetchall())
+               for table, sql in RECOUNT.items())
+
+def save(conn, matches, **kwargs):
+    for i in matches:
+        save_match_to_db(conn, payloads.match(i, **kwargs))
+
+def test_counters_follow_inserts(conn):
+    save(conn, range(30))
+    assert counters_match_recount(conn)
+
+def test_counters_follow_upserts(conn):
+    save(conn, range(30))
+    # 패치가 바뀐 재수집: match_summary가 먼저 바뀌므로 나머지 행의 OLD 값은 예전 버전 칸에서 빠져야 한다
+    save(conn, range(10), game_version='15.2.1.1')
+    assert counters_match_recount(conn)
+    # 같은 패치에서 챔피언/밴만 바뀐 재수집, 버전과 챔피언이 함께 바뀐 재수집
+    save(conn, range(10, 20), champion_offset=3)
+    save(conn, range(5, 15), game_version='15.3.1.1', champion_offset=7)
+    assert counters_match_recount(conn)
+    assert conn.execute("SELECT SUM(matches) FROM champion_match_counts").fetchone()[0] == 30
+
+def test_counters_follow_summary_delete(conn):
+    save(conn, range(10))
+    conn.execute("DELETE FROM match_summary WHERE match_id IN ('KR_1', 'KR_2')")
+    conn.commit()
+    assert counters_match_recount(conn)
+
+def test_upgrade_recounts_drifted_counters(tmp_path):
+    conn = connect(str(tmp_path / 'v10.db'))
+    migrate(conn, until=10)
+    save(conn, range(20))
+    save(conn, range(10), game_version='15.2.1.1')
+    # v10 트리거는 버전이 바뀐 upsert에서 어긋난다
+    assert not counters_match_recount(conn)
+    migrate(conn)
+    assert counters_match_recount(conn)
+    save(conn, range(5), game_version='15.3.1.1')
+    assert counters_match_recount(conn)
+    conn.close()
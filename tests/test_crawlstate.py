@@ -0,0 +1,53 @@
+import time
+
+import crawlstate
+from match import save_match_to_db
+
+import payloads
+
+def state(conn, stage, match_id):
+    return conn.execute("SELECT status, attempts, next_attempt_at FROM crawl_state WHERE stage = ? AND match_id = ?",
+                        (stage, match_id)).fetchone()
+
+def test_failure_backoff_counts_only_failures(conn, monkeypatch):
+    monkeypatch.setattr(time, 'time', lambda: 1000)
+    crawlstate.enqueue(conn, 'match', 'KR_1')
+    # 성공/건너뜀은 실패 횟수에 들어가지 않는다
+    crawlstate.mark_done(conn, 'match', 'KR_1')
+    crawlstate.mark_skipped(conn, 'match', 'KR_1')
+    assert state(conn, 'match', 'KR_1') == ('skipped', 0, 0)
+    for attempts, delay in ((1, 60), (2, 120), (3, 240)):
+        crawlstate.mark_failed(conn, 'match', 'KR_1', 'HTTP 500')
+        assert state(conn, 'match', 'KR_1') == ('failed', attempts, 1000 + delay)
+    # 행이 없던 ID의 첫 실패
+    crawlstate.mark_failed(conn, 'match', 'KR_2', 'HTTP 500')
+    assert state(conn, 'match', 'KR_2') == ('failed', 1, 1060)
+
+def test_resume_from_crawl_state(conn, monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    conn.execute("CREATE TABLE ids (match_id TEXT)")
+    conn.executemany("INSERT INTO ids VALUES (?)", [(f"KR_{i}",) for i in range(6)])
+    # 이미 저장된 match는 seed 때 done이 된다
+    save_match_to_db(conn, payloads.match(0))
+    assert crawlstate.seed(conn, 'match', "SELECT match_id FROM ids", "SELECT match_id FROM match_summary") == 6
+    assert crawlstate.pending_ids(conn, 'match') == ['KR_1', 'KR_2', 'KR_3', 'KR_4', 'KR_5']
+
+    # 중단 전 실행: KR_1은 저장, KR_2는 실패, KR_3은 네 번째 실패
+    crawlstate.mark_done(conn, 'match', 'KR_1')
+    crawlstate.mark_failed(conn, 'match', 'KR_2', 'HTTP 503')
+    conn.execute("UPDATE crawl_state SET attempts = 4 WHERE match_id = 'KR_3'")
+    crawlstate.mark_failed(conn, 'match', 'KR_3', 'HTTP 503')
+    crawlstate.enqueue(conn, 'timeline', 'KR_1', priority=1)
+
+    # 다시 시작: seed는 있던 행을 건드리지 않고, 재시도 대기 중이거나 제한을 넘긴 ID는 빠진다
+    conn.execute("INSERT INTO ids VALUES ('KR_6')")
+    assert crawlstate.seed(conn, 'match', "SELECT match_id FROM ids", "SELECT match_id FROM match_summary") == 1
+    assert crawlstate.pending_ids(conn, 'match') == ['KR_4', 'KR_5', 'KR_6']
+    assert sorted(crawlstate.runnable_jobs(conn)) == [
+        ('match', 'KR_4', 0), ('match', 'KR_5', 0), ('match', 'KR_6', 0), ('timeline', 'KR_1', 1)]
+
+    now[0] += 60
+    assert crawlstate.pending_ids(conn, 'match') == ['KR_2', 'KR_4', 'KR_5', 'KR_6']
+    assert ('match', 'KR_2', 0) in crawlstate.runnable_jobs(conn)
+    assert crawlstate.summary(conn, 'match') == {'done': 2, 'failed': 2, 'pending': 3}
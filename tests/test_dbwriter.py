@@ -0,0 +1,47 @@
+import time
+
+import crawlstate
+from dbwriter import BufferedWriter
+from matchtime import save_timeline_to_db
+
+import payloads
+
+def test_bad_row_fails_only_its_match(conn):
+    bad = payloads.timeline(2, 5)
+    # 바인딩할 수 없는 값이 이벤트 한 행에만 있다
+    bad['info']['frames'][4]['events'][0]['itemId'] = {'itemId': 3340}
+    started = int(time.time())
+    with BufferedWriter(conn, batch_size=10) as writer:
+        for timeline in (payloads.timeline(1, 5), bad, payloads.timeline(3, 5)):
+            match_id = timeline['metadata']['matchId']
+            save_timeline_to_db(conn, timeline, writer)
+            crawlstate.mark_done(writer, 'timeline', match_id)
+
+    assert [(key, stage) for key, stage, _ in writer.failed] == [('KR_2', 'timeline')]
+    saved = conn.execute("SELECT DISTINCT match_id FROM match_events ORDER BY match_id").fetchall()
+    assert saved == [('KR_1',), ('KR_3',)]
+    assert conn.execute("SELECT COUNT(*) FROM match_frames").fetchone()[0] == 2
+
+    # 같은 배치의 mark_done보다 나중에 기록되어 failed로 남고, 재시도 시각이 잡힌다
+    states = {match_id: (status, next_attempt_at, last_error) for match_id, status, next_attempt_at, last_error in
+              conn.execute("SELECT match_id, status, next_attempt_at, last_error FROM crawl_state")}
+    assert states['KR_1'][0] == states['KR_3'][0] == 'done'
+    status, next_attempt_at, last_error = states['KR_2']
+    assert status == 'failed' and next_attempt_at >= started + 60 and 'ProgrammingError' in last_error
+    assert crawlstate.pending_ids(conn, 'timeline') == []
+
+def test_merged_runs_keep_statement_order(conn):
+    conn.execute("CREATE TABLE t (k TEXT PRIMARY KEY, v INTEGER)")
+    insert = "INSERT INTO t (k, v) VALUES (?, ?)"
+    writer = BufferedWriter(conn, batch_size=10)
+    writer.write('a', {insert: [('a', 1)]})
+    writer.write('b', {insert: [('b', 2)]})
+    writer.execute("UPDATE t SET v = v * 10")
+    writer.write('c', {insert: [('c', 3)], "UPDATE t SET v = v + 1 WHERE k = ?": [('c',)]})
+    writer.write('d', {insert: [('d', 4)]})
+    # 앞뒤로 붙은 같은 INSERT만 하나로 묶인다
+    assert [(sql, len(rows)) for sql, rows in writer._runs(writer.entries)] == [
+        (insert, 2), ("UPDATE t SET v = v * 10", 1), (insert, 1), ("UPDATE t SET v = v + 1 WHERE k = ?", 1), (insert, 1)]
+    writer.flush()
+    assert conn.execute("SELECT k, v FROM t ORDER BY rowid").fetchall() == [('a', 10), ('b', 20), ('c', 4), ('d', 4)]
+    assert writer.rows_written == 6 and writer.failed == []
@@ -0,0 +1,60 @@
+import numpy as np
+
+import eventstore
+from db import db_path
+from feat import FeatAnalyzer
+from match import save_match_to_db
+from matchtime import save_timeline_to_db
+
+import payloads
+
+def timeline(i, n_frames=10):
+    """ 짝수 match는 블루팀이 두 모드 모두 feat를 두 번 완료한다 (payloads의 첫 FEAT_UPDATE는 previous 모드만 센다) """
+    timeline = payloads.timeline(i, n_frames)
+    if i % 2 == 0 and n_frames > 7:
+        for f, feat_type, feat_value in ((6, 1, 1), (7, 0, 3)):
+            timeline['info']['frames'][f]['events'].append({'type': 'FEAT_UPDATE', 'timestamp': f * 60000 + 9,
+                                                            'teamId': 100, 'featType': feat_type, 'featValue': feat_value})
+    return timeline
+
+def fill(conn):
+    for i in range(12):
+        save_match_to_db(conn, payloads.match(i))
+        # 프레임이 4개 미만이면 FEAT_UPDATE가 없다
+        save_timeline_to_db(conn, timeline(i, 3 if i % 3 == 1 else 10))
+
+def test_store_matches_database(conn, tmp_path):
+    fill(conn)
+    root = str(tmp_path / 'store')
+    # batch 경계에 match가 걸치도록 작게 읽는다
+    eventstore.build(db_path(conn), root, batch_rows=7)
+    store = eventstore.EventStore(root)
+    has_feats = [i for i in range(len(store)) if (store.events(i, ['type_id'])['type_id']
+                                                  == store.enum_id('FEAT_UPDATE')).any()]
+    assert store.matches_with('FEAT_UPDATE').tolist() == has_feats
+    assert len(has_feats) == 8
+
+    expected = FeatAnalyzer(db_path(conn)).completion_times()
+    actual = FeatAnalyzer(db_path(conn), store=store).completion_times()
+    completed = ['KR_0', 'KR_2', 'KR_6', 'KR_8']
+    assert expected['previous'].dropna().to_dict() == dict.fromkeys(completed, 6 * 60000 + 9)
+    assert expected['current'].dropna().to_dict() == dict.fromkeys(completed, 7 * 60000 + 9)
+    assert expected.equals(actual.astype(expected.dtypes))
+
+def test_resave_with_same_event_count_makes_store_stale(conn, tmp_path):
+    fill(conn)
+    root = str(tmp_path / 'store')
+    store = eventstore.open_store(db_path(conn), root)
+    assert not store.is_stale(conn)
+    # 마지막 match를 같은 이벤트 수로 다시 저장하면 COUNT(*)와 MAX(event_id)는 그대로다
+    resaved = timeline(11)
+    for frame in resaved['info']['frames']:
+        for event in frame['events']:
+            if event['type'] == 'ELITE_MONSTER_KILL':
+                event['monsterSubType'] = 'WATER_DRAGON'
+    save_timeline_to_db(conn, resaved)
+    assert store.is_stale(conn)
+    store = eventstore.open_store(db_path(conn), root)
+    assert not store.is_stale(conn)
+    water = store.enum_id('WATER_DRAGON')
+    assert (store.events(store.index('KR_11'), ['monster_sub_type_id'])['monster_sub_type_id'] == water).any()
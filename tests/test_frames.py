@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pytest
+
+import schemas
+from frames import PARTICIPANTS, diff_curve, frame_rows, load_field, struct_frame_rows
+from match import save_match_to_db
+from matchtime import save_timeline_to_db
+
+import payloads
+
+def total_gold(i, n_frames):
+    """ payloads.timeline(i)의 totalGold를 (프레임, 참가자) 배열로 """
+    return np.array([[500 + f * 300 + p * 7 + i for p in range(1, PARTICIPANTS + 1)] for f in range(n_frames)])
+
+def test_struct_frame_rows_match_dict_rows():
+    if schemas.msgspec is None:
+        pytest.skip("msgspec이 없으면 dict 경로만 있다")
+    timeline = payloads.timeline(3)
+    assert struct_frame_rows(schemas.decode_timeline(json.dumps(timeline).encode())) == frame_rows(timeline)
+
+def test_load_field_round_trip(conn):
+    for i, n_frames in ((1, 20), (2, 12)):
+        save_match_to_db(conn, payloads.match(i))
+        save_timeline_to_db(conn, payloads.timeline(i, n_frames))
+    # 같은 timeline을 다시 저장해도 match마다 한 행이다
+    save_timeline_to_db(conn, payloads.timeline(2, 12))
+
+    match_ids, offsets, values, blue_wins = load_field(conn, 'total_gold')
+    assert match_ids == ['KR_1', 'KR_2']
+    assert offsets.tolist() == [0, 20, 32]
+    np.testing.assert_array_equal(values, np.concatenate([total_gold(1, 20), total_gold(2, 12)]))
+    assert blue_wins.tolist() == [1.0, 1.0]
+
+def test_diff_curve(conn):
+    save_match_to_db(conn, payloads.match(1))
+    save_timeline_to_db(conn, payloads.timeline(1, 20))
+    # match_teams가 없는 match는 승리팀 기준 평균에서만 빠진다
+    save_timeline_to_db(conn, payloads.timeline(2, 10))
+
+    curve = diff_curve(conn, 'total_gold', max_minute=30)
+    # 블루(1~5) - 레드(6~10): 7 * (15 - 40)
+    assert curve['matches'].tolist() == [2] * 10 + [1] * 10 + [0] * 10
+    assert (curve['blue_minus_red'][:20] == -175).all()
+    assert (curve['winner_minus_loser'][:20] == -175).all()
+    assert curve['blue_minus_red'][20:].isna().all()
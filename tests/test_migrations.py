@@ -0,0 +1,51 @@
+from db import connect
+from migrations import MIGRATIONS, check_query_plans, migrate, schema_version
+
+LATEST = MIGRATIONS[-1][0]
+
+# 마이그레이션 도입 전(baseline) 수집기가 쓰던 match_events 행
+BASELINE_EVENTS = [
+    ('KR_2', 1000, 'WARD_PLACED', 3, None, None, 'YELLOW_TRINKET', None, None, None, None, None,
+     None, None, None, None, None, None),
+    ('KR_1', 2000, 'CHAMPION_KILL', 2, '1,3,4', 7, None, None, None, None, None, None,
+     None, None, None, None, None, None),
+    ('KR_1', 1000, 'FEAT_UPDATE', None, None, None, None, None, None, 100, '0', 1,
+     None, None, None, None, None, None),
+    ('KR_2', 3000, 'ELITE_MONSTER_KILL', 4, '5', None, None, None, None, 200, None, None,
+     None, 'DRAGON', 'FIRE_DRAGON', None, None, None),
+]
+
+def baseline_db(path):
+    """ user_version 0에 초기 스키마와 데이터가 있는 DB (마이그레이션이 생기기 전에 만든 DB) """
+    conn = connect(path)
+    for sql in MIGRATIONS[0][2]:
+        conn.execute(sql)
+    conn.executemany(f"INSERT INTO match_events VALUES ({', '.join('?' * 18)})", BASELINE_EVENTS)
+    conn.execute("INSERT INTO match_summary (match_id, game_version) VALUES ('KR_1', '15.1'), ('KR_2', '15.1')")
+    conn.execute("INSERT INTO match_teams (match_id, team_id, win) VALUES ('KR_2', 200, 1)")
+    conn.commit()
+    return conn
+
+def test_fresh_db_migrates_to_latest(conn):
+    assert schema_version(conn) == LATEST
+    # 다시 불러도 아무것도 하지 않는다
+    assert migrate(conn) == LATEST
+
+def test_query_plans_use_indexes(conn):
+    check_query_plans(conn)
+
+def test_baseline_db_upgrade_keeps_events(tmp_path):
+    conn = baseline_db(str(tmp_path / 'baseline.db'))
+    assert schema_version(conn) == 0
+    assert migrate(conn) == LATEST
+    check_query_plans(conn)
+
+    rows = conn.execute('''
+        SELECT match_id, timestamp, type, actor_id, assisting_participant_ids, victim_id, ward_type, team_id,
+               feat_type, feat_value, monster_type, monster_sub_type
+        FROM match_events ORDER BY match_id, timestamp
+    ''').fetchall()
+    expected = sorted((e[0], e[1], e[2], e[3], e[4], e[5], e[6], e[9],
+                       None if e[10] is None else int(e[10]), e[11], e[13], e[14]) for e in BASELINE_EVENTS)
+    assert rows == expected
+    assert conn.execute("SELECT match_id FROM match_keys ORDER BY match_key").fetchall() == [('KR_1',), ('KR_2',)]
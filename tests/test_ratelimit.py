@@ -0,0 +1,137 @@
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from client import create_session
+from ratelimit import RateLimitedRequester, RateLimiter
+
+@contextlib.contextmanager
+def stub_server(respond):
+    """ respond(요청 순번) -> (상태 코드, 헤더 dict, 응답 전 대기 초)를 돌려주는 로컬 HTTP 서버의 URL """
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            calls.append(self.path)
+            status, headers, delay = respond(len(calls))
+            time.sleep(delay)
+            try:
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+            except OSError:
+                # 클라이언트가 타임아웃으로 연결을 끊었다
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/lol/match/v5/matches/KR_1", calls
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_read_timeout_is_retried_through_limiter():
+    sleeps = []
+    limiter = RateLimiter(sleep=sleeps.append)
+    # 첫 응답만 읽기 타임아웃보다 늦다
+    with stub_server(lambda n: (200, {}, 1.0 if n == 1 else 0)) as (url, calls):
+        requester = RateLimitedRequester('', limiter, session=create_session('', timeout=(1, 0.3)))
+        response = requester.get(url)
+    assert response.status_code == 200
+    assert len(calls) == 2
+    # 두 요청 모두 제한 창에 기록됐고, 다시 보내기 전에 백오프했다
+    assert requester.request_count == 2
+    assert len(limiter.app_windows[0].stamps) == 2
+    assert sleeps == [0.5]
+
+class FakeClock:
+    """ RateLimiter에 clock/sleep으로 넣는 가짜 시계. sleep은 기다리지 않고 시각만 옮긴다 """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def limiter(clock, app_limits="20:1,100:120"):
+    return RateLimiter(app_limits, margin=0.0, clock=clock, sleep=clock.sleep)
+
+def test_app_windows_20_per_second_and_100_per_two_minutes():
+    clock = FakeClock()
+    rate = limiter(clock)
+    for _ in range(20):
+        rate.acquire()
+    assert clock.now == 0
+    rate.acquire()
+    assert clock.now == 1
+    # 초당 20회로 100회까지는 5초 (0~4초), 101번째는 첫 요청이 120초 창을 벗어날 때까지 기다린다
+    for _ in range(79):
+        rate.acquire()
+    assert clock.now == 4
+    rate.acquire()
+    assert clock.now == 120
+
+def test_method_windows_are_per_method():
+    clock = FakeClock()
+    rate = limiter(clock)
+    rate.update('match', {'X-Method-Rate-Limit': '5:10'})
+    for _ in range(5):
+        rate.acquire('match')
+    # 다른 메서드는 앱 제한만 본다
+    rate.acquire('timeline')
+    assert clock.now == 0
+    rate.acquire('match')
+    assert clock.now == 10
+
+def test_update_syncs_limits_and_counts_from_headers():
+    clock = FakeClock()
+    rate = limiter(clock)
+    rate.update('match', {
+        'X-App-Rate-Limit': '20:1,100:120', 'X-App-Rate-Limit-Count': '3:1,90:120',
+        'X-Method-Rate-Limit': '50:10', 'X-Method-Rate-Limit-Count': '50:10',
+    })
+    assert [len(w.stamps) for w in rate.app_windows] == [3, 90]
+    # 서버가 센 메서드 카운트가 이미 상한이다
+    rate.acquire('match')
+    assert clock.now == 10
+
+    clock = FakeClock()
+    rate = limiter(clock)
+    rate.update(None, {'X-App-Rate-Limit-Count': '3:1,90:120'})
+    for _ in range(10):
+        rate.acquire()
+    assert clock.now == 0
+    rate.acquire()
+    assert clock.now == 120
+
+    # 제한값이 바뀌면 창을 다시 만들고, 같은 창은 기록을 유지한다
+    kept = rate.app_windows[1]
+    rate.update(None, {'X-App-Rate-Limit': '10:1,100:120'})
+    assert [(w.limit, w.window) for w in rate.app_windows] == [(10, 1), (100, 120)]
+    assert rate.app_windows[1] is kept and len(kept.stamps) == 1
+
+def test_429_waits_for_retry_after():
+    clock = FakeClock()
+    headers = {'Retry-After': '7', 'X-Rate-Limit-Type': 'application',
+               'X-App-Rate-Limit': '20:1,100:120', 'X-App-Rate-Limit-Count': '1:1,1:120'}
+    with stub_server(lambda n: (429, headers, 0) if n == 1 else (200, {}, 0)) as (url, calls):
+        requester = RateLimitedRequester('', limiter(clock), session=create_session(''))
+        response = requester.get(url)
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert requester.request_count == 2
+    assert clock.sleeps == [7.0]
@@ -0,0 +1,40 @@
+import json
+
+from archive import PayloadArchive
+from db import connect
+from matchtime import rebuild_timeline_tables_parallel, save_timeline_to_db
+from migrations import migrate
+
+import payloads
+
+TABLES = {
+    'match_events': '''
+        SELECT match_id, timestamp, type, actor_id, assisting_participant_ids, victim_id, ward_type, skill_slot,
+               item_id, team_id, feat_type, feat_value, lane_type, monster_type, monster_sub_type, building_type,
+               tower_type, winning_team
+        FROM match_events ORDER BY match_id, timestamp, type
+    ''',
+    'match_frames': '''
+        SELECT k.match_id, f.n_frames, f.frame_interval, f.data
+        FROM match_frames f JOIN match_keys k ON k.match_key = f.match_key ORDER BY k.match_id
+    ''',
+    'match_changes': "SELECT match_id FROM match_changes WHERE table_name = 'match_events_compact' ORDER BY match_id",
+}
+
+def test_parallel_rebuild_matches_serial_saves(conn, tmp_path):
+    # 프레임이 없는 timeline과, NULL이 섞인 이벤트(대부분의 필드가 없다)를 함께 넣는다
+    timelines = [payloads.timeline(i, i % 6) for i in range(11)]
+    archive = PayloadArchive(str(tmp_path / 'archive'))
+    for timeline in timelines:
+        save_timeline_to_db(conn, timeline)
+        archive.put('timeline', timeline['metadata']['matchId'], json.dumps(timeline).encode())
+
+    rebuilt = connect(str(tmp_path / 'rebuilt.db'))
+    migrate(rebuilt)
+    # chunk가 match 여러 개를 담고, 마지막 chunk는 덜 찬다
+    assert rebuild_timeline_tables_parallel(rebuilt, archive, workers=2, chunk=3) == len(timelines)
+    for name, sql in TABLES.items():
+        assert rebuilt.execute(sql).fetchall() == conn.execute(sql).fetchall(), name
+    assert rebuilt.execute("SELECT COUNT(*) FROM match_events WHERE victim_id IS NULL").fetchone()[0] > 0
+    archive.close()
+    rebuilt.close()
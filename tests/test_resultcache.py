@@ -0,0 +1,64 @@
+import pandas as pd
+
+from champion import ChampionAnalyzer
+from db import db_path
+from elitemon import EpicMonsterAnalyzer
+from match import save_match_to_db
+from matchtime import save_timeline_to_db
+from resultcache import ResultCache
+
+import payloads
+
+def fill(conn, n=10):
+    for i in range(n):
+        save_match_to_db(conn, payloads.match(i))
+        save_timeline_to_db(conn, payloads.timeline(i, 10))
+
+def test_hit_until_tables_change(conn, tmp_path):
+    fill(conn)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    champions = ChampionAnalyzer(db_path(conn), result_cache=cache)
+    first = champions.pick_ban_stats()
+    assert champions.pick_ban_stats().equals(first)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 같은 키를 upsert로 덮어쓰면 rowid는 그대로지만 결과는 다시 계산된다
+    save_match_to_db(conn, payloads.match(9, champion_offset=5))
+    updated = champions.pick_ban_stats()
+    assert cache.misses == 2
+    assert not updated.equals(first)
+    recount = champions.recount_pick_ban_stats()
+    pd.testing.assert_frame_equal(updated[recount.columns], recount, check_dtype=False)
+    cache.close()
+
+def test_timeline_resave_invalidates_event_results(conn, tmp_path):
+    fill(conn)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    before = EpicMonsterAnalyzer(db_path(conn), result_cache=cache).sub_type_winrates('DRAGON')
+    # 마지막 match의 이벤트를 같은 수만큼 지웠다 다시 넣으면 MAX(rowid)도 그대로다 (용 종류만 다르다).
+    # 분석기는 인스턴스 안에서도 결과를 기억하므로 새로 고칠 때처럼 새로 만든다
+    timeline = payloads.timeline(9, 10)
+    for frame in timeline['info']['frames']:
+        for event in frame['events']:
+            if event['type'] == 'ELITE_MONSTER_KILL':
+                event['monsterSubType'] = 'WATER_DRAGON'
+    save_timeline_to_db(conn, timeline)
+    after = EpicMonsterAnalyzer(db_path(conn), result_cache=cache).sub_type_winrates('DRAGON')
+    assert cache.misses == 2
+    assert after.equals(EpicMonsterAnalyzer(db_path(conn)).sub_type_winrates('DRAGON'))
+    assert not after.equals(before)
+    cache.close()
+
+def test_evicts_least_recently_used(conn, tmp_path):
+    fill(conn, 3)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    for name in ('a', 'b', 'c'):
+        cache.get_or_compute(conn, name, {}, ['match_summary'], lambda: list(range(1000)))
+    size = cache.stats()['bytes'] // 3
+    # a를 다시 읽으면 b가 가장 오래 안 쓴 결과가 된다
+    cache.get_or_compute(conn, 'a', {}, ['match_summary'], lambda: None)
+    cache.max_bytes = 3 * size
+    cache.get_or_compute(conn, 'd', {}, ['match_summary'], lambda: list(range(1000)))
+    assert {row[0] for row in cache.conn.execute("SELECT name FROM results")} == {'a', 'c', 'd'}
+    assert cache.stats()['bytes'] <= 3 * size
+    cache.close()